@@ -0,0 +1,11 @@
+"""
+ASGI config for Custom GPT Demo
+Serves the async endpoints under /api/async/ without blocking a worker per request
+"""
+
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+application = get_asgi_application()
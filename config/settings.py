@@ -4,8 +4,11 @@ Simple POC without authentication
 """
 
 from pathlib import Path
+import importlib.util
+import copy
 import os
-from decouple import config
+import django
+from decouple import config, Csv
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -29,6 +32,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost so its timings cover the whole stack; removed unless METRICS_ENABLED
+    'health_chatbot.middleware.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -38,6 +43,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # After CORS, so preflights and 401s carry CORS headers
+    'health_chatbot.middleware.ApiKeyMiddleware',
 ]
 
 # CORS - Allow all for demo
@@ -73,9 +80,76 @@ DATABASES = {
         'PASSWORD': config('RDS_PASSWORD', default='postgres'),
         'HOST': config('RDS_HOSTNAME', default='localhost'),
         'PORT': config('RDS_PORT', default='5432'),
+        # Reuse each worker thread's connection across requests instead of
+        # paying a TCP+TLS+auth handshake per request; 0 closes after every request
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=600, cast=int),
+        # Ping a reused connection before its first query in each request
+        'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+        'OPTIONS': {
+            'connect_timeout': config('DB_CONNECT_TIMEOUT', default=5, cast=int),
+            # TCP keepalives so idle persistent connections survive NAT/LB timeouts
+            'keepalives': 1,
+            'keepalives_idle': config('DB_KEEPALIVES_IDLE', default=60, cast=int),
+            'keepalives_interval': 10,
+            'keepalives_count': 5,
+        },
     }
 }
 
+# Read replicas: comma-separated host[:port] list sharing the primary's
+# database name and credentials, exposed as aliases replica1, replica2, ...
+DATABASE_REPLICAS = config('DATABASE_REPLICAS', default='', cast=Csv())
+for _index, _replica in enumerate(DATABASE_REPLICAS, start=1):
+    _host, _, _port = _replica.partition(':')
+    DATABASES[f'replica{_index}'] = {
+        **copy.deepcopy(DATABASES['default']),
+        'HOST': _host,
+        'PORT': _port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['health_chatbot.routers.ReplicaRouter']
+
+# Seconds a user's reads stay on the primary after they write
+REPLICA_STICKY_SECONDS = config('REPLICA_STICKY_SECONDS', default=10, cast=int)
+# Cache alias holding those pins; with replicas it must be shared by every
+# worker (Redis, Memcached, database), or a worker that didn't see the write
+# reads from a lagging replica
+REPLICA_PIN_CACHE_ALIAS = config('REPLICA_PIN_CACHE_ALIAS', default='default')
+# Replicas further behind than this (seconds) are skipped
+REPLICA_MAX_LAG = config('REPLICA_MAX_LAG', default=5, cast=float)
+REPLICA_HEALTH_CHECK_INTERVAL = config('REPLICA_HEALTH_CHECK_INTERVAL', default=10, cast=int)
+
+# Connection pool (Django 5.1+ with psycopg 3 only). When DB_POOL_MAX_SIZE is
+# set, connections come from a shared per-process pool instead of being
+# persisted per thread.
+DB_POOL_MIN_SIZE = config('DB_POOL_MIN_SIZE', default=2, cast=int)
+DB_POOL_MAX_SIZE = config('DB_POOL_MAX_SIZE', default=0, cast=int)
+DB_POOL_TIMEOUT = config('DB_POOL_TIMEOUT', default=10, cast=int)
+if DB_POOL_MAX_SIZE and django.VERSION >= (5, 1) and importlib.util.find_spec('psycopg_pool'):
+    DATABASES['default']['CONN_MAX_AGE'] = 0  # persistent connections and pooling are exclusive
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': DB_POOL_MIN_SIZE,
+        'max_size': DB_POOL_MAX_SIZE,
+        'timeout': DB_POOL_TIMEOUT,
+    }
+
+# Connect once from each worker after it forks (gunicorn.conf.py), to check
+# the database and fill the connection pool before the first request
+DB_WARMUP = config('DB_WARMUP', default=True, cast=bool)
+
+# Cache (local memory by default; point CACHE_BACKEND/CACHE_LOCATION at a
+# shared backend such as Redis when running more than one worker process)
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='health-chatbot'),
+    }
+}
+
+# Read-only answers (summaries, chatbot nutrition/goal/medication replies)
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TTL = config('RESPONSE_CACHE_TTL', default=300, cast=int)
+
 AUTH_PASSWORD_VALIDATORS = []
 
 LANGUAGE_CODE = 'en-us'
@@ -111,6 +185,69 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Cursor pagination for /api/meals/ and /api/chat/history/
+API_PAGE_SIZE = config('API_PAGE_SIZE', default=50, cast=int)
+API_MAX_PAGE_SIZE = config('API_MAX_PAGE_SIZE', default=200, cast=int)
+
+# Largest batch accepted by POST /api/meals/bulk/
+MEAL_BULK_MAX_ITEMS = config('MEAL_BULK_MAX_ITEMS', default=500, cast=int)
+
+# Meal search/autocomplete result counts (capped at API_MAX_PAGE_SIZE), and
+# users whose meals each process indexes when not on PostgreSQL
+MEAL_SEARCH_LIMIT = config('MEAL_SEARCH_LIMIT', default=20, cast=int)
+MEAL_AUTOCOMPLETE_LIMIT = config('MEAL_AUTOCOMPLETE_LIMIT', default=10, cast=int)
+MEAL_SEARCH_INDEX_USERS = config('MEAL_SEARCH_INDEX_USERS', default=1000, cast=int)
+
+# Food catalog: the file `manage.py load_foods` loads by default, and the
+# number of results from GET /api/foods/ (capped at API_MAX_PAGE_SIZE)
+FOOD_CATALOG_PATH = config('FOOD_CATALOG_PATH', default=str(BASE_DIR / 'health_chatbot' / 'data' / 'foods.csv'))
+FOOD_SEARCH_LIMIT = config('FOOD_SEARCH_LIMIT', default=10, cast=int)
+
+# Longest ?from=&to= range accepted by GET /api/summary/
+SUMMARY_MAX_DAYS = config('SUMMARY_MAX_DAYS', default=1100, cast=int)
+
+# Rows fetched per server-side cursor round trip by GET /api/export/
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# Deferred chat history writes (POST /api/async/chat/): rows waiting for the
+# background writer, rows per INSERT, and seconds a request waits for queue
+# space before writing its row inline
+CHAT_WRITE_QUEUE_SIZE = config('CHAT_WRITE_QUEUE_SIZE', default=10000, cast=int)
+CHAT_WRITE_BATCH_SIZE = config('CHAT_WRITE_BATCH_SIZE', default=200, cast=int)
+CHAT_WRITE_PUT_TIMEOUT = config('CHAT_WRITE_PUT_TIMEOUT', default=0.5, cast=float)
+
+# Cache lifetime (seconds) for GET /api/openapi.yaml and /api/privacy/;
+# clients revalidate with If-None-Match afterwards
+STATIC_DOCUMENT_MAX_AGE = config('STATIC_DOCUMENT_MAX_AGE', default=86400, cast=int)
+
+# Request instrumentation: Server-Timing header and GET /api/metrics/
+METRICS_ENABLED = config('METRICS_ENABLED', default=False, cast=bool)
+# cProfile output for requests sent with "X-Profile: <PROFILE_TOKEN>" or
+# sampled at PROFILE_SAMPLE_RATE (0-1); profiling is off while PROFILE_DIR is empty
+PROFILE_DIR = config('PROFILE_DIR', default='')
+PROFILE_TOKEN = config('PROFILE_TOKEN', default='')
+PROFILE_SAMPLE_RATE = config('PROFILE_SAMPLE_RATE', default=0.0, cast=float)
+
 # Demo configuration
-DEMO_USER_ID = 1
 DEMO_USER_EMAIL = 'demo@biorhyme.health'
+
+# Seconds a resolved user profile stays cached per process, and how many
+# profiles (and API keys) each process keeps
+USER_CACHE_TTL = config('USER_CACHE_TTL', default=300, cast=int)
+USER_CACHE_SIZE = config('USER_CACHE_SIZE', default=10000, cast=int)
+# Cache alias holding the API key revocation counter, checked on every keyed
+# request; it must be shared by every worker for a revocation to reach them
+# all (health_chatbot.E002 when API_KEY_REQUIRED is set)
+API_KEY_CACHE_ALIAS = config('API_KEY_CACHE_ALIAS', default='default')
+
+# Chat follow-up context: kept per process for up to CONVERSATION_MAX_USERS
+# users (or in this cache alias, shared by workers), each state capped in size
+CONVERSATION_CACHE_ALIAS = config('CONVERSATION_CACHE_ALIAS', default='')
+CONVERSATION_TTL = config('CONVERSATION_TTL', default=900, cast=int)
+CONVERSATION_MAX_USERS = config('CONVERSATION_MAX_USERS', default=10000, cast=int)
+CONVERSATION_MAX_BYTES = config('CONVERSATION_MAX_BYTES', default=4096, cast=int)
+
+# Reject requests without an API key (instead of serving the demo user),
+# except for these path prefixes
+API_KEY_REQUIRED = config('API_KEY_REQUIRED', default=False, cast=bool)
+API_KEY_EXEMPT_PATHS = ['/api/health/', '/api/openapi.yaml', '/api/privacy/', '/api/metrics/', '/admin/']
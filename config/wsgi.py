@@ -8,3 +8,27 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+
+def warm_up_database():
+    """
+    Connect to the database once a worker has started, so a bad DSN or an
+    unreachable database shows up at boot and a connection pool is filled
+    before the first request. Call it after any fork (gunicorn.conf.py runs it
+    from post_worker_init); the connection is closed again because it belongs
+    to the calling thread, not the threads serving requests.
+    """
+    from django.conf import settings
+    from django.db import connection
+
+    if not settings.DB_WARMUP:
+        return
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except Exception:
+        # The database may not be up yet; requests will connect on demand
+        pass
+    finally:
+        # Returns it to the pool when pooling is on
+        connection.close()
@@ -0,0 +1,10 @@
+"""
+Gunicorn settings, read automatically when gunicorn starts in this directory
+"""
+
+
+def post_worker_init(worker):
+    """Check the database (and fill the connection pool) in each worker after it forks"""
+    from config.wsgi import warm_up_database
+
+    warm_up_database()
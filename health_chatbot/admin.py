@@ -1,8 +1,14 @@
 """
 Django Admin configuration
+Meal and medication edits go through the same rollup and cache invalidation
+path as the API, so summaries and chat answers reflect them at once.
 """
 from django.contrib import admin
-from .models import UserProfile, Meal, Medication, ChatMessage
+from django.db import transaction
+from . import rollups
+from .cache import invalidate, MEALS, MEDICATIONS
+from .models import UserProfile, ApiKey, Food, Meal, Medication, ChatMessage, DailyNutritionRollup
+from .serializers import MealSerializer, MedicationSerializer
 
 
 @admin.register(UserProfile)
@@ -11,6 +17,18 @@ class UserProfileAdmin(admin.ModelAdmin):
     search_fields = ['email', 'name']
 
 
+@admin.register(ApiKey)
+class ApiKeyAdmin(admin.ModelAdmin):
+    list_display = ['prefix', 'name', 'user', 'is_active', 'created_at']
+    list_filter = ['is_active']
+    search_fields = ['prefix', 'name', 'user__email']
+    readonly_fields = ['prefix', 'key_hash', 'user', 'created_at']
+
+    def has_add_permission(self, request):
+        # Keys are issued with `manage.py create_api_key`, which shows the key once
+        return False
+
+
 @admin.register(Meal)
 class MealAdmin(admin.ModelAdmin):
     list_display = ['meal_name', 'meal_time', 'calories', 'date', 'user']
@@ -18,6 +36,54 @@ class MealAdmin(admin.ModelAdmin):
     search_fields = ['meal_name', 'user__email']
     date_hierarchy = 'date'
 
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            snapshot = rollups.snapshot_meal(Meal.objects.select_for_update().get(pk=obj.pk)) if change else None
+            obj.save()
+            if snapshot is None:
+                rollups.record_meal(obj)
+            else:
+                rollups.update_meal(snapshot, obj)
+                if snapshot['user_id'] != obj.user_id:
+                    invalidate(snapshot['user_id'], MEALS)
+            invalidate(obj.user_id, MEALS)
+
+    def delete_model(self, request, obj):
+        MealSerializer.delete(obj)
+
+    def delete_queryset(self, request, queryset):
+        """The "delete selected" action: one rollup update per day, not per meal"""
+        with transaction.atomic():
+            meals = list(queryset.select_for_update())
+            rollups.forget_meals(meals)
+            for user_id in {meal.user_id for meal in meals}:
+                invalidate(user_id, MEALS)
+            queryset.delete()
+
+
+@admin.register(Food)
+class FoodAdmin(admin.ModelAdmin):
+    list_display = ['name', 'serving', 'calories', 'protein', 'carbs', 'fat']
+    search_fields = ['name']
+
+
+@admin.register(DailyNutritionRollup)
+class DailyNutritionRollupAdmin(admin.ModelAdmin):
+    list_display = ['date', 'user', 'meal_count', 'calories', 'protein']
+    list_filter = ['date']
+    search_fields = ['user__email']
+    date_hierarchy = 'date'
+
+    # Rollups are derived from meals; edit the meals instead
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 
 @admin.register(Medication)
 class MedicationAdmin(admin.ModelAdmin):
@@ -25,6 +91,23 @@ class MedicationAdmin(admin.ModelAdmin):
     list_filter = ['frequency', 'is_active']
     search_fields = ['drug_name', 'user__email']
 
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            previous_user_id = Medication.objects.get(pk=obj.pk).user_id if change else obj.user_id
+            obj.save()
+            if previous_user_id != obj.user_id:
+                invalidate(previous_user_id, MEDICATIONS)
+            invalidate(obj.user_id, MEDICATIONS)
+
+    def delete_model(self, request, obj):
+        MedicationSerializer.delete(obj)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            for user_id in set(queryset.values_list('user_id', flat=True)):
+                invalidate(user_id, MEDICATIONS)
+            queryset.delete()
+
 
 @admin.register(ChatMessage)
 class ChatMessageAdmin(admin.ModelAdmin):
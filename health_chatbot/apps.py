@@ -5,3 +5,11 @@ class HealthChatbotConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'health_chatbot'
     verbose_name = 'Health Chatbot Demo'
+
+    def ready(self):
+        from django.core import checks
+        from . import signals  # noqa: F401
+        from .checks import check_api_key_cache, check_pin_cache
+
+        checks.register(check_pin_cache, checks.Tags.caches)
+        checks.register(check_api_key_cache, checks.Tags.caches, checks.Tags.security)
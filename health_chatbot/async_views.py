@@ -0,0 +1,224 @@
+"""
+Async (ASGI) API views
+Served under /api/async/ with the same request/response contract as their
+synchronous counterparts in views.py; queries go through Django's async ORM
+"""
+import functools
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from rest_framework.decorators import api_view
+from rest_framework.renderers import JSONRenderer
+
+from .cache import aget_or_build, MEALS, PROFILE
+from .chatbot import HealthChatbot
+from .history import chat_writer
+from .models import Meal, ChatMessage
+from .pagination import InvalidCursor, get_page_size, apaginate_meals, apaginate_chat
+from .rollups import abucket_totals, anutrition_totals
+from .routers import pin_to_primary, read_only_view
+from .serializers import UserProfileSerializer
+from .users import aget_request_user
+from .views import (
+    CHAT_FORMATS, SUMMARY_PERIODS, _chat_payload, _summary_range, _summary_payload,
+    _wants_series, _series_params, _series_payload,
+    _meals_since, _meals_payload, _history_payload,
+)
+
+
+def _render(data, status=200):
+    """JSON response rendered exactly as DRF's Response would be"""
+    response = HttpResponse(
+        JSONRenderer().render(data), content_type='application/json', status=status)
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+def _handled_async(request, *args, **kwargs):
+    raise AssertionError('The async view answers its own methods')
+
+
+def async_api_view(methods):
+    """
+    Async counterpart of DRF's @api_view. Any other method (OPTIONS, HEAD,
+    405s) is answered by DRF itself, through a sync view with the async one's
+    name and docstring, so it gets exactly the synchronous views' response.
+    """
+    allow = ', '.join(sorted({'OPTIONS', *methods}))
+
+    def decorator(view):
+        drf_view = sync_to_async(api_view(methods)(functools.wraps(view)(_handled_async)))
+
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return await drf_view(request, *args, **kwargs)
+            response = await view(request, *args, **kwargs)
+            response['Allow'] = allow
+            return response
+        return wrapper
+    return decorator
+
+
+def _answer(user, user_message):
+    """Build the chatbot reply (the handlers use the sync ORM)"""
+    reply = HealthChatbot(user).process_message(user_message)
+    pin_to_primary(user.pk)
+    return reply
+
+
+@async_api_view(['POST'])
+async def chat(request):
+    """
+    POST /api/async/chat/
+    {
+        "message": "What did I eat today?",
+        "format": "markdown" | "structured"    (optional, default markdown)
+    }
+    Same as POST /api/chat/, but the history row is queued for the background
+    writer instead of being inserted before the response is sent
+    """
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError as e:
+            return _render({'detail': f'JSON parse error - {e}'}, status=400)
+    else:
+        data = request.POST
+
+    if not hasattr(data, 'get'):
+        data = {}
+    user_message = data.get('message', '')
+    user_message = user_message.strip() if isinstance(user_message, str) else ''
+    reply_format = data.get('format', 'markdown')
+
+    if not user_message:
+        return _render({
+            'error': 'Message is required'
+        }, status=400)
+
+    if reply_format not in CHAT_FORMATS:
+        return _render({
+            'error': f'format must be one of: {", ".join(CHAT_FORMATS)}'
+        }, status=400)
+
+    user = await aget_request_user(request)
+    reply = await sync_to_async(_answer)(user, user_message)
+
+    # Timestamped now, as the synchronous view's row would be; inserted later
+    chat_msg = ChatMessage(
+        user=user,
+        user_message=user_message,
+        bot_response=reply.markdown,
+        created_at=timezone.now()
+    )
+    if not chat_writer.offer(chat_msg):
+        # Queue full: wait for space off the event loop
+        await sync_to_async(chat_writer.submit)(chat_msg, settings.CHAT_WRITE_PUT_TIMEOUT)
+
+    return _render(_chat_payload(user_message, reply, reply_format, chat_msg.created_at))
+
+
+@async_api_view(['GET'])
+@read_only_view
+async def meals_list(request):
+    """
+    GET /api/async/meals/?days=7&page_size=50&cursor=...
+    List meals (newest first, paginated)
+    """
+    user = await aget_request_user(request)
+    date_from = _meals_since(request)
+    meals = Meal.objects.filter(user=user, date__gte=date_from)
+
+    try:
+        page, next_cursor = await apaginate_meals(
+            meals,
+            request.GET.get('cursor'),
+            get_page_size(request.GET.get('page_size'))
+        )
+    except InvalidCursor as e:
+        return _render({
+            'error': str(e)
+        }, status=400)
+
+    nutrition = await anutrition_totals(user, date_from)
+    return _render(_meals_payload(page, next_cursor, nutrition))
+
+
+async def _build_summary(user, period):
+    today, date_from = _summary_range(period)
+    nutrition = await anutrition_totals(user, date_from)
+    return _summary_payload(user, period, today, date_from, nutrition)
+
+
+@async_api_view(['GET'])
+@read_only_view
+async def summary(request):
+    """
+    GET /api/async/summary/?period=today|week|month
+    GET /api/async/summary/?from=YYYY-MM-DD&to=YYYY-MM-DD&granularity=day|week|month
+    Get nutrition summary for a period, or for a date range with a series
+    """
+    user = await aget_request_user(request)
+
+    if _wants_series(request):
+        try:
+            params = _series_params(request)
+        except ValueError as e:
+            return _render({
+                'error': str(e)
+            }, status=400)
+
+        async def build():
+            return _series_payload(user, *params, await abucket_totals(user, *params[1:]))
+
+        return _render(await aget_or_build(user, (MEALS, PROFILE), 'summary_series', params, build))
+
+    period = request.GET.get('period', 'today')
+
+    if period not in SUMMARY_PERIODS:
+        return _render(await _build_summary(user, period))
+
+    data = await aget_or_build(
+        user, (MEALS, PROFILE), 'summary', (period,),
+        lambda: _build_summary(user, period)
+    )
+    return _render(data)
+
+
+@async_api_view(['GET'])
+@read_only_view
+async def chat_history(request):
+    """
+    GET /api/async/chat/history/?limit=10&cursor=...
+    Get chat history (newest first, paginated)
+    """
+    user = await aget_request_user(request)
+    limit = get_page_size(request.GET.get('limit'), default=10)
+
+    try:
+        messages, next_cursor = await apaginate_chat(
+            ChatMessage.objects.filter(user=user),
+            request.GET.get('cursor'),
+            limit
+        )
+    except InvalidCursor as e:
+        return _render({
+            'error': str(e)
+        }, status=400)
+
+    return _render(_history_payload(messages, next_cursor))
+
+
+@async_api_view(['GET'])
+async def user_profile(request):
+    """
+    GET /api/async/profile/
+    Get user profile
+    """
+    user = await aget_request_user(request)
+    return _render(UserProfileSerializer(user).data)
@@ -0,0 +1,76 @@
+"""
+Shared helpers for the bench* management commands
+Latency summaries, call timing (optionally counting queries) and the common
+--output JSON report.
+"""
+import json
+import statistics
+import time
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarise(latencies, elapsed, queries=None):
+    """Latency stats in milliseconds plus throughput"""
+    ms = [latency * 1000 for latency in latencies]
+    result = {
+        'requests': len(ms),
+        'mean_ms': round(statistics.fmean(ms), 3),
+        'p50_ms': round(percentile(ms, 50), 3),
+        'p95_ms': round(percentile(ms, 95), 3),
+        'p99_ms': round(percentile(ms, 99), 3),
+        'throughput_rps': round(len(ms) / elapsed, 1) if elapsed else None,
+    }
+    if queries is not None:
+        result['queries_per_request'] = round(statistics.fmean(queries), 2)
+        result['max_queries'] = max(queries)
+    return result
+
+
+def summarise_us(latencies):
+    """Percentiles in microseconds, for calls too fast to show in milliseconds"""
+    us = [latency * 1e6 for latency in latencies]
+    return {
+        'lookups': len(us),
+        'p50_us': round(percentile(us, 50), 2),
+        'p99_us': round(percentile(us, 99), 2),
+    }
+
+
+def time_calls(func, inputs):
+    """Latency of ``func(value)`` for each value, in seconds"""
+    latencies = []
+    for value in inputs:
+        t0 = time.perf_counter()
+        func(value)
+        latencies.append(time.perf_counter() - t0)
+    return latencies
+
+
+def time_queries(func, latencies, queries):
+    """Call ``func()``, appending its latency and the number of queries it ran"""
+    with CaptureQueriesContext(connection) as captured:
+        t0 = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - t0)
+    queries.append(len(captured))
+
+
+def add_output_argument(parser):
+    parser.add_argument('--output', help='Write results as JSON to this file')
+
+
+def write_results(command, path, results):
+    """Write a command's results as JSON when --output was given"""
+    if not path:
+        return
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+    command.stdout.write(command.style.SUCCESS(f'✓ Wrote {path}'))
@@ -0,0 +1,151 @@
+"""
+Response cache for read-only answers
+Entries are keyed by (user, name, params, date) plus per-user generation
+counters. A write bumps the generation of the scope it touches ('meals',
+'medications' or 'profile'), so every entry built from that data is skipped
+from then on.
+"""
+import functools
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+from .routers import pin_to_primary
+
+
+MEALS = 'meals'
+MEDICATIONS = 'medications'
+PROFILE = 'profile'
+FOODS = 'foods'
+
+# The food catalog is shared by all users; its generation is kept under user 0
+CATALOG_USER = 0
+
+_KEY_PREFIX = 'health'
+
+_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+_stats_lock = threading.Lock()
+
+
+def _cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'RESPONSE_CACHE_TTL', 300)
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def _generation_key(user_id, scope):
+    return f'{_KEY_PREFIX}:gen:{scope}:{user_id}'
+
+
+def _generation_keys(user_id, scopes):
+    return [_generation_key(user_id, scope) for scope in scopes]
+
+
+def _entry_key(user, scopes, name, params, found):
+    """Entry key for today, given the generation counters found in the cache"""
+    generations = [found.get(key, 0) for key in _generation_keys(user.pk, scopes)]
+    today = timezone.now().date().isoformat()
+    return ':'.join(
+        [_KEY_PREFIX, 'resp', str(user.pk), name, today]
+        + [str(part) for part in params]
+        + [f'{scope}{gen}' for scope, gen in zip(scopes, generations)]
+    )
+
+
+def generation(user_id, scope):
+    """Current generation counter of a user's scope (changes on every write to it)"""
+    return _cache().get(_generation_key(user_id, scope), 0)
+
+
+def get_or_build(user, scopes, name, params, builder):
+    """
+    Return the cached value for (user, name, params, today) or build and store it.
+    ``scopes`` lists the data the value depends on; a write to any of them
+    invalidates the entry.
+    """
+    cache = _cache()
+    found = cache.get_many(_generation_keys(user.pk, scopes))
+    key = _entry_key(user, scopes, name, params, found)
+
+    value = cache.get(key)
+    if value is not None:
+        _count('hits')
+        return value
+
+    _count('misses')
+    value = builder()
+    cache.set(key, value, _timeout())
+    return value
+
+
+async def aget_or_build(user, scopes, name, params, builder):
+    """Async get_or_build; ``builder`` is a coroutine function"""
+    cache = _cache()
+    found = await cache.aget_many(_generation_keys(user.pk, scopes))
+    key = _entry_key(user, scopes, name, params, found)
+
+    value = await cache.aget(key)
+    if value is not None:
+        _count('hits')
+        return value
+
+    _count('misses')
+    value = await builder()
+    await cache.aset(key, value, _timeout())
+    return value
+
+
+def cached_response(scopes, name):
+    """
+    Decorator for HealthChatbot read handlers (cached as ChatReply objects).
+    Positional arguments become part of the cache key.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args):
+            return get_or_build(self.user, scopes, f'reply:{name}', args, lambda: method(self, *args))
+        return wrapper
+    return decorator
+
+
+def _bump(user_id, scopes):
+    cache = _cache()
+    for scope in scopes:
+        key = _generation_key(user_id, scope)
+        # Generations must outlive the entries they guard
+        if not cache.add(key, 1, None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, None)
+    _count('invalidations')
+
+
+def invalidate(user_id, *scopes):
+    """
+    Invalidate a user's cached answers for the given scopes.
+    Deferred until the surrounding transaction commits, so a concurrent read
+    can't re-cache the pre-write state under the new generation. The user's
+    reads are also pinned to the primary so they don't hit a lagging replica.
+    """
+    pin_to_primary(user_id)
+    transaction.on_commit(lambda: _bump(user_id, scopes))
+
+
+def cache_stats():
+    """Hit/miss/invalidation counters for this process"""
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = round(stats['hits'] / lookups, 3) if lookups else 0
+    return stats
@@ -2,11 +2,218 @@
 Simple chatbot logic for demo
 Analyzes user questions and queries database
 """
+import json
 import re
-from datetime import datetime, timedelta
-from django.db.models import Sum, Avg, Count
+from contextlib import nullcontext
+from datetime import date
+from django.db import transaction
 from django.utils import timezone
-from .models import Meal, Medication, UserProfile
+from .models import Food, Meal, Medication
+from .rollups import NUTRIENTS, nutrition_totals, daily_totals, record_meals
+from .cache import cached_response, generation, get_or_build, invalidate, MEALS, MEDICATIONS, PROFILE
+from .conversations import conversation_store
+from . import intents
+from .intents import classify
+from .dateranges import DateRange, parse_range
+from .metrics import record_intent, timed
+from .routers import replica_reads
+from .responses import ChatReply, Bold, Code
+from .search import search_meals
+from .foods import food_index, is_log_message, match_portions, meal_fields, usable_servings
+
+
+GOAL_STATUS_ICONS = {'met': "✅", 'close': "⚠️", 'behind': "❌"}
+
+CAPABILITIES = [
+    "Tracking your meals and nutrition",
+    "Managing medications",
+    "Monitoring your health goals",
+    "Viewing your progress",
+]
+
+EXAMPLE_QUESTIONS = [
+    "What did I eat today?",
+    "How much protein have I consumed this week?",
+    "Show me my medications",
+    "Am I meeting my goals?",
+]
+
+HELP_TOPICS = [
+    ("📊", "Nutrition Tracking", [
+        '"What did I eat today?"',
+        '"How many calories have I consumed this week?"',
+        '"Show me my protein intake"',
+    ]),
+    ("💊", "Medication Management", [
+        '"Show my medications"',
+        '"What medications am I taking?"',
+    ]),
+    ("🎯", "Goal Tracking", [
+        '"Am I meeting my goals?"',
+        '"Show my progress"',
+    ]),
+    ("📝", "Data Entry", [
+        '"Log 2 eggs and toast for breakfast"',
+        "Use the API endpoints to log medications",
+    ]),
+]
+
+MEAL_EXAMPLE = {
+    'meal_name': 'Chicken Salad',
+    'meal_time': 'lunch',
+    'calories': 350,
+    'protein': 30,
+    'carbs': 20,
+    'fat': 15,
+    'fiber': 5,
+}
+
+# Intents answered for a time window; their replies are kept for follow-ups
+WINDOWED_INTENTS = (intents.MEAL_QUERY, intents.NUTRITION_QUERY)
+
+# Message word -> nutrient, and the profile field holding its daily goal
+NUTRIENT_WORDS = {'calorie': 'calories', 'protein': 'protein', 'carb': 'carbs', 'fat': 'fat', 'fiber': 'fiber'}
+NUTRIENT_GOALS = {
+    'calories': 'daily_calorie_goal',
+    'protein': 'daily_protein_goal',
+    'carbs': 'daily_carbs_goal',
+    'fat': 'daily_fat_goal',
+    'fiber': 'daily_fiber_goal',
+}
+
+_NUTRIENT_PATTERN = re.compile('|'.join(NUTRIENT_WORDS))
+_FOLLOW_UP_PATTERN = re.compile(r'^\W*(?:and|also|what about|how about|what of)\b')
+
+# Words that end a searched-for food ("salmon this week")
+_TERM_END = 'today|yesterday|this|last|past|since|on|in|during|from|for'
+
+# "did I eat salmon", "I ate salmon with rice yesterday": the food eaten,
+# unless the words after the verb say something else ("ate too much")
+_EATEN_PATTERN = re.compile(
+    r"\b(?:eat|ate|eaten)\s+"
+    rf"(?!(?:{_TERM_END}|with|containing|including|at|before|after|when|too|so|enough|much|more|less|"
+    r"lots?|a\s+lot|anything|something|everything|nothing|well|lately|recently|healthy|out)\b)"
+    r"(?:some\s+|any\s+)?(?P<term>[a-z0-9][a-z0-9 '&-]*?)\s*"
+    rf"(?=$|[?.!,]|\s(?:{_TERM_END}|with)\b)"
+)
+
+# "meals with salmon", "what did I eat containing rice this week"
+_SEARCH_PATTERN = re.compile(
+    r"\b(?:with|containing|including)\s+(?:some\s+|any\s+)?(?P<term>[a-z0-9][a-z0-9 '&-]*?)\s*"
+    rf"(?=$|[?.!,]|\s(?:{_TERM_END})\b)"
+)
+_EATING_PATTERN = re.compile(r"\b(?:eat|ate|eaten)\b")
+
+# Meals listed for a search in chat
+CHAT_SEARCH_RESULTS = 10
+
+MEDICATION_EXAMPLE = {
+    'drug_name': 'Metformin',
+    'dosage': '500mg',
+    'frequency': 'twice_daily',
+}
+
+
+def _answer_range(intent, slots, date_range, today):
+    """
+    Date range a windowed intent's handler answers for: the one named in the
+    message, else today (None for other intents and for "list my meals").
+    Meals are logged on the day a message names, if it names a single one.
+    """
+    if intent == intents.LOG_MEAL:
+        return date_range if date_range is not None and date_range.days == 1 else None
+    if intent not in WINDOWED_INTENTS:
+        return None
+    if date_range is not None:
+        return date_range
+    if intent == intents.MEAL_QUERY and ('list' in slots or 'show' in slots):
+        return None
+    return DateRange(today, today, 'Today')
+
+
+def _meal_time_now():
+    """Meal time for a meal logged without one, from the local time of day"""
+    hour = timezone.localtime().hour
+    if hour < 11:
+        return 'breakfast'
+    if hour < 16:
+        return 'lunch'
+    if hour < 21:
+        return 'dinner'
+    return 'snack'
+
+
+def _names_catalog_food(message_lower):
+    """Does a log-shaped message name a catalog food? ("I had a headache" doesn't)"""
+    portions, _ = match_portions(message_lower, food_index())
+    return any(food_id is not None for _, food_id, _ in portions)
+
+
+def _search_term(message_lower, intent):
+    """
+    What a meal question searches for, or None: the food eaten ("did I eat
+    salmon" -> 'salmon'), else the one it was eaten with ("what did I eat with
+    salmon" -> 'salmon'). Only meal questions, and messages the classifier
+    can't place that ask what was eaten, search.
+    """
+    if intent not in (intents.MEAL_QUERY, intents.GENERAL_QUERY):
+        return None
+    match = _EATEN_PATTERN.search(message_lower)
+    if match is None and (intent == intents.MEAL_QUERY or _EATING_PATTERN.search(message_lower)):
+        match = _SEARCH_PATTERN.search(message_lower)
+    return match.group('term') if match else None
+
+
+def _stored_range(window):
+    """DateRange from its JSON form in a conversation state"""
+    if window is None:
+        return None
+    start, end, title = window
+    return DateRange(date.fromisoformat(start), date.fromisoformat(end), title)
+
+
+def _span(date_range):
+    if date_range.days == 1:
+        return f"on {date_range.start}"
+    return f"from {date_range.start} to {date_range.end}"
+
+
+def _context_total(data, nutrient):
+    """
+    A nutrient total from a stored reply as (total, days_logged), or None if
+    the reply doesn't carry that nutrient for its whole range
+    """
+    if data is None:
+        return None
+    if data['type'] == 'nutrition':
+        return data['totals'][nutrient], data['days_logged']
+
+    items = data.get('items')
+    if items is None or not all(nutrient in row for row in items):
+        return None
+    total = sum(row[nutrient] for row in items)
+    if data['type'] == 'meals' and 'date' in data:
+        return total, 1 if items else 0
+    if data['type'] == 'meal_days':
+        return total, len(items)
+    return None
+
+
+def _amount(value, unit):
+    return f"{value:.0f} kcal" if unit == "kcal" else f"{value:.1f}{unit}"
+
+
+def _nutrition_reply(totals, date_from, date_to, **fields):
+    """A 'nutrition' reply carrying a nutrition_totals() result as structured fields"""
+    return ChatReply(
+        'nutrition',
+        date_from=date_from,
+        date_to=date_to,
+        meal_count=totals['meals'] or 0,
+        days_logged=totals['days'] or 0,
+        totals={name: totals[name] or 0 for name in NUTRIENTS},
+        **fields
+    )
 
 
 class HealthChatbot:
@@ -17,345 +224,423 @@ class HealthChatbot:
 
     def process_message(self, message):
         """
-        Process user message and return response
+        Process user message and return a ChatReply
+        (``reply.markdown`` for the chat text, ``reply.as_dict()`` for its data)
         """
         message_lower = message.lower()
 
-        # Determine intent
-        if self._is_meal_query(message_lower):
-            return self._handle_meal_query(message_lower)
-        elif self._is_nutrition_query(message_lower):
-            return self._handle_nutrition_query(message_lower)
-        elif self._is_medication_query(message_lower):
-            return self._handle_medication_query(message_lower)
-        elif self._is_goal_query(message_lower):
-            return self._handle_goal_query(message_lower)
-        elif self._is_log_meal_intent(message_lower):
-            return self._handle_log_meal_intent(message)
-        elif self._is_add_medication_intent(message_lower):
-            return self._handle_add_medication_intent(message)
+        # Determine intent and date range (one pass over the message each)
+        intent, slots, tags = classify(message_lower)
+        if is_log_message(message_lower) and _names_catalog_food(message_lower):
+            # "I had eggs for breakfast" logs a meal rather than asking about meals
+            intent = intents.LOG_MEAL
+        today = timezone.now().date()
+        date_range = parse_range(message_lower, today)
+
+        store = conversation_store()
+        # Stored results are only reused while the user's meals are unchanged
+        meals_generation = generation(self.user.pk, MEALS)
+        previous = store.load(self.user.pk, meals_generation)
+        follow_up = False
+        if previous is not None:
+            intent, date_range, follow_up = self._follow_up(intent, date_range, tags, message_lower, previous)
+
+        # Searches cover all time unless the message names a range
+        search = None if follow_up else _search_term(message_lower, intent)
+        if search is not None:
+            intent = intents.MEAL_QUERY
         else:
-            return self._handle_general_query(message_lower)
-
-    # Intent detection methods
-    def _is_meal_query(self, message):
-        keywords = ['meal', 'ate', 'eaten', 'food', 'breakfast', 'lunch', 'dinner', 'snack']
-        return any(keyword in message for keyword in keywords)
-
-    def _is_nutrition_query(self, message):
-        keywords = ['calorie', 'protein', 'carb', 'fat', 'fiber', 'nutrition', 'nutrient']
-        return any(keyword in message for keyword in keywords)
+            date_range = _answer_range(intent, slots, date_range, today)
+        record_intent(intent)
+
+        with timed('chatbot'):
+            if follow_up:
+                reply = self._answer_from_context(intent, date_range, message_lower, previous)
+                if reply is not None:
+                    return reply
+
+            # Every intent handler but meal logging is read-only, so it can be answered from a replica
+            with replica_reads(self.user.pk) if intent != intents.LOG_MEAL else nullcontext():
+                reply = self._dispatch(intent, date_range, search, tags, message)
+
+        # Small talk keeps the context; any other question replaces it
+        if intent != intents.GENERAL_QUERY:
+            store.save(self.user.pk, intent, date_range,
+                       reply.as_dict() if intent in WINDOWED_INTENTS else None, meals_generation)
+        return reply
+
+    def _follow_up(self, intent, date_range, tags, message_lower, previous):
+        """
+        Carry the previous question over to a follow-up.
+        "and yesterday?" repeats the last meal/nutrition question for another
+        range; "what about protein?" asks about the last question's range.
+        Returns (intent, date_range, is_follow_up).
+        """
+        if previous['intent'] not in WINDOWED_INTENTS:
+            return intent, date_range, False
 
-    def _is_medication_query(self, message):
-        keywords = ['medication', 'medicine', 'drug', 'pill', 'taking']
-        return any(keyword in message for keyword in keywords)
+        if intent == intents.GENERAL_QUERY and date_range is not None and not tags & {'greeting', 'help'}:
+            return previous['intent'], date_range, True
 
-    def _is_goal_query(self, message):
-        keywords = ['goal', 'target', 'should', 'progress', 'meeting']
-        return any(keyword in message for keyword in keywords)
+        if intent in WINDOWED_INTENTS and _FOLLOW_UP_PATTERN.match(message_lower):
+            if date_range is None:
+                date_range = _stored_range(previous['window'])
+            return intent, date_range, True
 
-    def _is_log_meal_intent(self, message):
-        keywords = ['log', 'add meal', 'record meal', 'ate', 'had']
-        return any(keyword in message for keyword in keywords) and any(word in message for word in ['calorie', 'kcal', 'protein'])
+        return intent, date_range, False
 
-    def _is_add_medication_intent(self, message):
-        keywords = ['add medication', 'new medication', 'start taking', 'prescribed']
-        return any(keyword in message for keyword in keywords)
+    def _answer_from_context(self, intent, date_range, message_lower, previous):
+        """
+        Answer a single-nutrient follow-up from the previous reply's data
+        (no query), or None when it doesn't hold the answer
+        """
+        stored = _stored_range(previous['window'])
+        if intent != intents.NUTRITION_QUERY or stored is None or stored[:2] != date_range[:2]:
+            return None
+        nutrients = {NUTRIENT_WORDS[word] for word in _NUTRIENT_PATTERN.findall(message_lower)}
+        if len(nutrients) != 1:
+            return None
+        nutrient = nutrients.pop()
+        found = _context_total(previous['data'], nutrient)
+        if found is None:
+            return None
+
+        total, days_logged = found
+        unit = "kcal" if nutrient == 'calories' else "g"
+        reply = ChatReply('nutrient', nutrient=nutrient, period=date_range.title, date_from=date_range.start,
+                          date_to=date_range.end, total=total, unit=unit)
+        reply.line(Bold(f"{nutrient.capitalize()} ({date_range.title})"), f": {_amount(total, unit)}")
+
+        if date_range.days > 1:
+            average = total / days_logged if days_logged else 0
+            reply.fields.update(days_logged=days_logged, avg_per_day=round(average, 1))
+            reply.line(f"• Avg per Logged Day: {_amount(average, unit)} ({days_logged} of {date_range.days} days)")
+        else:
+            goal = getattr(self.user, NUTRIENT_GOALS[nutrient])
+            percentage = (total / goal * 100) if goal > 0 else 0
+            reply.fields.update(goal=goal, percentage=round(percentage, 1))
+            reply.line(f"• {percentage:.0f}% of your daily goal ({_amount(goal, unit)})")
+        return reply
+
+    def _dispatch(self, intent, date_range, search, tags, message):
+        """Route a classified message to its handler"""
+        if intent == intents.MEAL_QUERY:
+            return self._handle_meal_query(date_range, search)
+        elif intent == intents.NUTRITION_QUERY:
+            return self._handle_nutrition_query(date_range)
+        elif intent == intents.MEDICATION_QUERY:
+            return self._handle_medication_query()
+        elif intent == intents.GOAL_QUERY:
+            return self._handle_goal_query()
+        elif intent == intents.LOG_MEAL:
+            return self._handle_log_meal_intent(message, date_range, tags)
+        elif intent == intents.ADD_MEDICATION:
+            return self._handle_add_medication_intent(message)
+        else:
+            return self._handle_general_query(tags)
 
     # Query handlers
-    def _handle_meal_query(self, message):
+    def _handle_meal_query(self, date_range, search=None):
         """Handle queries about meals"""
-        if 'today' in message:
-            return self._get_today_meals()
-        elif 'yesterday' in message:
-            return self._get_yesterday_meals()
-        elif 'week' in message or 'this week' in message:
-            return self._get_week_meals()
-        elif 'list' in message or 'show' in message:
+        if search is not None:
+            return self._search_meals(search, date_range)
+        elif date_range is None:
             return self._get_recent_meals()
+        elif date_range.days == 1:
+            return self._get_day_meals(date_range)
         else:
-            return self._get_today_meals()
+            return self._get_meal_days(date_range)
 
-    def _handle_nutrition_query(self, message):
+    def _handle_nutrition_query(self, date_range):
         """Handle queries about nutrition"""
-        if 'today' in message:
-            return self._get_today_nutrition()
-        elif 'yesterday' in message:
-            return self._get_yesterday_nutrition()
-        elif 'week' in message:
-            return self._get_week_nutrition()
-        elif 'month' in message:
-            return self._get_month_nutrition()
-        else:
-            return self._get_today_nutrition()
+        return self._get_nutrition(date_range)
 
-    def _handle_medication_query(self, message):
+    def _handle_medication_query(self):
         """Handle queries about medications"""
-        medications = Medication.objects.filter(user=self.user, is_active=True)
-
-        if not medications.exists():
-            return "You don't have any active medications recorded. Would you like to add one?"
-
-        response = f"You are currently taking {medications.count()} medication(s):\n\n"
-        for med in medications:
-            response += f"• **{med.drug_name}** - {med.dosage}, {med.get_frequency_display()}\n"
-            if med.notes:
-                response += f"  Notes: {med.notes}\n"
+        return self._get_active_medications()
 
-        return response
-
-    def _handle_goal_query(self, message):
+    def _handle_goal_query(self):
         """Handle queries about health goals"""
-        today = timezone.now().date()
-        meals_today = Meal.objects.filter(user=self.user, date=today)
-
-        totals = meals_today.aggregate(
-            total_calories=Sum('calories'),
-            total_protein=Sum('protein'),
-            total_carbs=Sum('carbs'),
-            total_fat=Sum('fat'),
-            total_fiber=Sum('fiber')
-        )
-
-        response = f"**Your Daily Goals vs Progress (Today)**\n\n"
-
-        goals = [
-            ('Calories', totals['total_calories'] or 0, self.user.daily_calorie_goal),
-            ('Protein', totals['total_protein'] or 0, self.user.daily_protein_goal),
-            ('Carbs', totals['total_carbs'] or 0, self.user.daily_carbs_goal),
-            ('Fat', totals['total_fat'] or 0, self.user.daily_fat_goal),
-            ('Fiber', totals['total_fiber'] or 0, self.user.daily_fiber_goal),
-        ]
-
-        for name, actual, goal in goals:
-            percentage = (actual / goal * 100) if goal > 0 else 0
-            status = "✅" if percentage >= 90 else "⚠️" if percentage >= 70 else "❌"
-            unit = "kcal" if name == "Calories" else "g"
-            response += f"{status} **{name}**: {actual:.1f}{unit} / {goal:.1f}{unit} ({percentage:.0f}%)\n"
-
-        return response
-
-    def _handle_log_meal_intent(self, message):
-        """Guide user to log a meal"""
-        return ("I can help you log a meal! Please use the meal logging endpoint:\n\n"
-                "**POST /api/meals/**\n"
-                "```json\n"
-                "{\n"
-                '  "meal_name": "Chicken Salad",\n'
-                '  "meal_time": "lunch",\n'
-                '  "calories": 350,\n'
-                '  "protein": 30,\n'
-                '  "carbs": 20,\n'
-                '  "fat": 15,\n'
-                '  "fiber": 5\n'
-                "}\n"
-                "```")
+        return self._get_goal_progress()
+
+    def _handle_log_meal_intent(self, message, date_range, tags):
+        """Log the catalog foods a message names ("log 2 eggs and toast"), or guide the user"""
+        portions, meal_time = match_portions(message.lower(), food_index())
+        if not portions or 'log_meal_macro' in tags:
+            return self._endpoint_guide(
+                'log_meal_help', "I can help you log a meal! Please use the meal logging endpoint:",
+                'POST /api/meals/', MEAL_EXAMPLE)
+
+        foods = Food.objects.in_bulk([food_id for _, food_id, _ in portions if food_id is not None])
+        unmatched = [phrase for servings, food_id, phrase in portions
+                     if food_id not in foods or not usable_servings(servings)]
+        if unmatched:
+            names = ', '.join(f'"{phrase}"' for phrase in unmatched)
+            reply = self._endpoint_guide(
+                'log_meal_help',
+                f"I couldn't find {names} in the food catalog. "
+                "Try another name, or log the meal with its macros:",
+                'POST /api/meals/', MEAL_EXAMPLE)
+            reply.fields['unmatched'] = unmatched
+            return reply
+
+        day = date_range.start if date_range is not None else timezone.now().date()
+        return self._log_foods(
+            [(servings, foods[food_id]) for servings, food_id, _ in portions],
+            meal_time or _meal_time_now(), day)
+
+    def _log_foods(self, portions, meal_time, day):
+        """Log (servings, Food) portions as meals, one per food"""
+        with transaction.atomic():
+            meals = Meal.objects.bulk_create([
+                Meal(user=self.user, meal_time=meal_time, date=day, **meal_fields(food, servings))
+                for servings, food in portions
+            ])
+            record_meals(meals)
+            invalidate(self.user.pk, MEALS)
+
+        totals = {name: round(sum(getattr(meal, name) for meal in meals), 1) for name in NUTRIENTS}
+        reply = ChatReply('meal_logged', date=day, meal_time=meal_time, totals=totals)
+        reply.heading(f"Logged {meal_time.capitalize()} ({day})")
+        for (servings, food), meal in zip(portions, meals):
+            reply.item(
+                {'meal_id': meal.pk, 'food_id': food.pk, 'meal_name': meal.meal_name, 'servings': servings,
+                 **{name: getattr(meal, name) for name in NUTRIENTS}},
+                f"• {servings:g} × {food.name} ({food.serving}): {meal.calories:.0f} kcal"
+            )
+        reply.line()
+        reply.line(Bold("Total"), f": {totals['calories']:.0f} kcal · Protein {totals['protein']:.1f}g, "
+                                  f"Carbs {totals['carbs']:.1f}g, Fat {totals['fat']:.1f}g")
+        return reply
 
     def _handle_add_medication_intent(self, message):
         """Guide user to add medication"""
-        return ("I can help you add a medication! Please use the medication endpoint:\n\n"
-                "**POST /api/medications/**\n"
-                "```json\n"
-                "{\n"
-                '  "drug_name": "Metformin",\n'
-                '  "dosage": "500mg",\n'
-                '  "frequency": "twice_daily"\n'
-                "}\n"
-                "```")
-
-    def _handle_general_query(self, message):
+        return self._endpoint_guide(
+            'add_medication_help', "I can help you add a medication! Please use the medication endpoint:",
+            'POST /api/medications/', MEDICATION_EXAMPLE)
+
+    def _endpoint_guide(self, kind, intro, endpoint, example):
+        """Point the user at an endpoint, with an example request body"""
+        return (ChatReply(kind, endpoint=endpoint, example=example)
+                .line(intro)
+                .line()
+                .line(Bold(endpoint))
+                .line(Code(json.dumps(example, indent=2), 'json')))
+
+    def _handle_general_query(self, tags):
         """Handle general queries"""
-        if any(word in message for word in ['hello', 'hi', 'hey']):
-            return f"Hello {self.user.name}! I'm your health assistant. I can help you track meals, medications, and monitor your nutrition goals. What would you like to know?"
-        elif 'help' in message:
+        if 'greeting' in tags:
+            return ChatReply('greeting', name=self.user.name).line(
+                f"Hello {self.user.name}! I'm your health assistant. I can help you track meals, medications, and monitor your nutrition goals. What would you like to know?")
+        elif 'help' in tags:
             return self._get_help_message()
         else:
-            return ("I can help you with:\n"
-                    "• Tracking your meals and nutrition\n"
-                    "• Managing medications\n"
-                    "• Monitoring your health goals\n"
-                    "• Viewing your progress\n\n"
-                    "Try asking me things like:\n"
-                    "- 'What did I eat today?'\n"
-                    "- 'How much protein have I consumed this week?'\n"
-                    "- 'Show me my medications'\n"
-                    "- 'Am I meeting my goals?'")
+            reply = ChatReply('capabilities', capabilities=CAPABILITIES, examples=EXAMPLE_QUESTIONS)
+            reply.line("I can help you with:")
+            for capability in CAPABILITIES:
+                reply.line(f"• {capability}")
+            reply.line().line("Try asking me things like:")
+            for example in EXAMPLE_QUESTIONS:
+                reply.line(f"- '{example}'")
+            return reply
 
     # Data retrieval methods
-    def _get_today_meals(self):
-        """Get today's meals"""
-        today = timezone.now().date()
-        meals = Meal.objects.filter(user=self.user, date=today)
+    def _get_day_meals(self, date_range):
+        """Get one day's meals"""
+        day = date_range.start
+        meals = list(Meal.objects.filter(user=self.user, date=day))
 
-        if not meals.exists():
-            return "You haven't logged any meals today yet. Would you like to add one?"
+        if not meals:
+            return ChatReply('meals', date=day, period=date_range.title, total_calories=0, items=[]).line(
+                f"You haven't logged any meals {_span(date_range)}. Would you like to add one?")
 
-        response = f"**Today's Meals ({today})**\n\n"
-        total_calories = 0
+        total_calories = sum(meal.calories for meal in meals)
+        reply = ChatReply('meals', date=day, period=date_range.title, total_calories=total_calories)
+        reply.heading(f"Meals: {date_range.title} ({day})")
 
         for meal in meals:
-            response += f"**{meal.get_meal_time_display()}**: {meal.meal_name}\n"
-            response += f"  • Calories: {meal.calories:.0f} kcal\n"
-            response += f"  • Protein: {meal.protein:.1f}g, Carbs: {meal.carbs:.1f}g, Fat: {meal.fat:.1f}g\n\n"
-            total_calories += meal.calories
-
-        response += f"**Total Calories Today**: {total_calories:.0f} kcal"
-        return response
-
-    def _get_yesterday_meals(self):
-        """Get yesterday's meals"""
-        yesterday = timezone.now().date() - timedelta(days=1)
-        meals = Meal.objects.filter(user=self.user, date=yesterday)
+            reply.item(
+                {'meal_time': meal.meal_time, 'meal_name': meal.meal_name, 'calories': meal.calories,
+                 'protein': meal.protein, 'carbs': meal.carbs, 'fat': meal.fat, 'fiber': meal.fiber},
+                Bold(meal.get_meal_time_display()), f": {meal.meal_name}"
+            )
+            reply.line(f"  • Calories: {meal.calories:.0f} kcal")
+            reply.line(f"  • Protein: {meal.protein:.1f}g, Carbs: {meal.carbs:.1f}g, Fat: {meal.fat:.1f}g")
+            reply.line()
+
+        return reply.line(Bold("Total Calories"), f": {total_calories:.0f} kcal")
+
+    def _get_meal_days(self, date_range):
+        """Get meals per day over a range"""
+        # One row per day, already grouped by the daily rollups
+        days = list(daily_totals(self.user, date_range.start, date_range.end))
+        fields = {'date_from': date_range.start, 'date_to': date_range.end, 'period': date_range.title}
+
+        if not days:
+            return ChatReply('meal_days', meal_count=0, days_logged=0, items=[], **fields).line(
+                f"You haven't logged any meals {_span(date_range)}.")
+
+        count = sum(day['meal_count'] for day in days)
+        reply = ChatReply('meal_days', meal_count=count, days_logged=len(days), **fields)
+        reply.heading(f"Meals: {date_range.title} ({date_range.start} to {date_range.end})")
+        reply.line(f"You logged {count} meal(s) on {len(days)} of {date_range.days} days.")
+        reply.line()
+
+        for i, day in enumerate(days):
+            row = {'date': day['date'], 'meal_count': day['meal_count'],
+                   **{name: day[name] for name in NUTRIENTS}}
+            if i < 5:  # Show last 5 days
+                reply.item(row, Bold(str(day['date'])), f": {day['meal_count']} meals, {day['calories']:.0f} kcal")
+            else:
+                reply.item(row)
+
+        return reply.line()
+
+    def _search_meals(self, term, date_range):
+        """Find meals by name or notes, over all time or a range"""
+        fields = {'query': term}
+        if date_range is None:
+            meals = search_meals(self.user, term, CHAT_SEARCH_RESULTS)
+            within = ""
+        else:
+            meals = search_meals(self.user, term, CHAT_SEARCH_RESULTS, date_range.start, date_range.end)
+            fields.update(period=date_range.title, date_from=date_range.start, date_to=date_range.end)
+            within = f" {_span(date_range)}"
 
-        if not meals.exists():
-            return f"You didn't log any meals on {yesterday}."
+        reply = ChatReply('meal_search', items=[], **fields)
+        if not meals:
+            return reply.line(f'I couldn\'t find any meals matching "{term}"{within}.')
 
-        response = f"**Yesterday's Meals ({yesterday})**\n\n"
+        reply.heading(f'Meals matching "{term}"' + (f" ({date_range.title})" if date_range else ""))
         for meal in meals:
-            response += f"**{meal.get_meal_time_display()}**: {meal.meal_name} ({meal.calories:.0f} kcal)\n"
-
-        return response
+            reply.item(
+                {'date': meal.date, 'meal_time': meal.meal_time, 'meal_name': meal.meal_name,
+                 'calories': meal.calories},
+                f"• {meal.date} - {meal.meal_name} ({meal.calories:.0f} kcal)"
+            )
 
-    def _get_week_meals(self):
-        """Get this week's meals"""
-        week_ago = timezone.now().date() - timedelta(days=7)
-        meals = Meal.objects.filter(user=self.user, date__gte=week_ago)
-
-        if not meals.exists():
-            return "You haven't logged any meals in the past week."
-
-        count = meals.count()
-        response = f"**This Week's Summary**\n\n"
-        response += f"You logged {count} meal(s) in the past 7 days.\n\n"
-
-        # Group by date
-        dates = meals.values_list('date', flat=True).distinct().order_by('-date')
-        for date in dates[:5]:  # Show last 5 days
-            day_meals = meals.filter(date=date)
-            day_cals = sum(m.calories for m in day_meals)
-            response += f"**{date}**: {day_meals.count()} meals, {day_cals:.0f} kcal\n"
-
-        return response
+        return reply.line()
 
     def _get_recent_meals(self):
         """Get recent meals"""
-        meals = Meal.objects.filter(user=self.user)[:10]
+        meals = list(Meal.objects.filter(user=self.user)[:10])
 
-        if not meals.exists():
-            return "You haven't logged any meals yet."
+        reply = ChatReply('meals', items=[])
+        if not meals:
+            return reply.line("You haven't logged any meals yet.")
 
-        response = "**Your Recent Meals**\n\n"
+        reply.heading("Your Recent Meals")
         for meal in meals:
-            response += f"• {meal.date} - {meal.meal_name} ({meal.calories:.0f} kcal)\n"
+            reply.item(
+                {'date': meal.date, 'meal_name': meal.meal_name, 'calories': meal.calories},
+                f"• {meal.date} - {meal.meal_name} ({meal.calories:.0f} kcal)"
+            )
+
+        return reply.line()
+
+    def _totals(self, date_from, date_to):
+        """nutrition_totals() for a range, from the response cache when possible"""
+        return get_or_build(self.user, (MEALS,), 'nutrition_totals', (date_from, date_to),
+                            lambda: nutrition_totals(self.user, date_from, date_to))
+
+    def _get_nutrition(self, date_range):
+        """Get nutrition totals (and per-logged-day averages) for a range"""
+        totals = self._totals(date_range.start, date_range.end)
+        days_logged = totals['days'] or 0
+        fields = {'period': date_range.title, 'days': date_range.days}
+        if date_range.days > 1:
+            averages = {name: round((totals[name] or 0) / days_logged, 1) if days_logged else 0
+                        for name in NUTRIENTS}
+            fields.update(averages=averages, avg_calories=averages['calories'])
+        reply = _nutrition_reply(totals, date_range.start, date_range.end, **fields)
+
+        if not totals['meals']:
+            return reply.line(f"No meals logged {_span(date_range)}.")
+
+        if date_range.days == 1:
+            return (reply
+                    .heading(f"Nutrition Summary: {date_range.title} ({date_range.start})")
+                    .line("• ", Bold("Calories"), f": {totals['calories']:.0f} kcal")
+                    .line("• ", Bold("Protein"), f": {totals['protein']:.1f}g")
+                    .line("• ", Bold("Carbs"), f": {totals['carbs']:.1f}g")
+                    .line("• ", Bold("Fat"), f": {totals['fat']:.1f}g")
+                    .line("• ", Bold("Fiber"), f": {totals['fiber']:.1f}g")
+                    .line())
+
+        return (reply
+                .heading(f"Nutrition Summary: {date_range.title} ({date_range.start} to {date_range.end})")
+                .line("• ", Bold("Total Calories"), f": {totals['calories']:.0f} kcal")
+                .line("• ", Bold("Avg per Logged Day"), f": {averages['calories']:.0f} kcal")
+                .line("• ", Bold("Total Protein"), f": {totals['protein']:.1f}g")
+                .line("• ", Bold("Total Carbs"), f": {totals['carbs']:.1f}g")
+                .line("• ", Bold("Total Fat"), f": {totals['fat']:.1f}g")
+                .line("• ", Bold("Total Fiber"), f": {totals['fiber']:.1f}g")
+                .line(f"Logged on {days_logged} of {date_range.days} days.")
+                .line())
+
+    @cached_response((MEDICATIONS,), 'active_medications')
+    def _get_active_medications(self):
+        """Get active medications"""
+        medications = list(Medication.objects.filter(user=self.user, is_active=True))
+
+        if not medications:
+            return ChatReply('medications', count=0, items=[]).line(
+                "You don't have any active medications recorded. Would you like to add one?")
+
+        reply = ChatReply('medications', count=len(medications))
+        reply.line(f"You are currently taking {len(medications)} medication(s):")
+        reply.line()
+        for med in medications:
+            reply.item(
+                {'drug_name': med.drug_name, 'dosage': med.dosage,
+                 'frequency': med.frequency, 'notes': med.notes},
+                "• ", Bold(med.drug_name), f" - {med.dosage}, {med.get_frequency_display()}"
+            )
+            if med.notes:
+                reply.line(f"  Notes: {med.notes}")
 
-        return response
+        return reply.line()
 
-    def _get_today_nutrition(self):
-        """Get today's nutrition totals"""
+    @cached_response((MEALS, PROFILE), 'goal_progress')
+    def _get_goal_progress(self):
+        """Get today's progress against goals"""
         today = timezone.now().date()
-        meals = Meal.objects.filter(user=self.user, date=today)
-
-        if not meals.exists():
-            return "You haven't logged any meals today yet."
-
-        totals = meals.aggregate(
-            calories=Sum('calories'),
-            protein=Sum('protein'),
-            carbs=Sum('carbs'),
-            fat=Sum('fat'),
-            fiber=Sum('fiber')
-        )
-
-        response = f"**Today's Nutrition Summary**\n\n"
-        response += f"• **Calories**: {totals['calories']:.0f} kcal\n"
-        response += f"• **Protein**: {totals['protein']:.1f}g\n"
-        response += f"• **Carbs**: {totals['carbs']:.1f}g\n"
-        response += f"• **Fat**: {totals['fat']:.1f}g\n"
-        response += f"• **Fiber**: {totals['fiber']:.1f}g\n"
-
-        return response
-
-    def _get_yesterday_nutrition(self):
-        """Get yesterday's nutrition"""
-        yesterday = timezone.now().date() - timedelta(days=1)
-        meals = Meal.objects.filter(user=self.user, date=yesterday)
-
-        if not meals.exists():
-            return f"No meals logged for {yesterday}."
-
-        totals = meals.aggregate(
-            calories=Sum('calories'),
-            protein=Sum('protein')
-        )
-
-        return f"**Yesterday ({yesterday})**\n• Calories: {totals['calories']:.0f} kcal\n• Protein: {totals['protein']:.1f}g"
-
-    def _get_week_nutrition(self):
-        """Get week's nutrition"""
-        week_ago = timezone.now().date() - timedelta(days=7)
-        meals = Meal.objects.filter(user=self.user, date__gte=week_ago)
-
-        if not meals.exists():
-            return "No meals logged this week."
+        totals = nutrition_totals(self.user, today, today)
 
-        totals = meals.aggregate(
-            calories=Sum('calories'),
-            protein=Sum('protein'),
-            carbs=Sum('carbs'),
-            fat=Sum('fat'),
-            fiber=Sum('fiber')
-        )
+        reply = ChatReply('goals', date=today)
+        reply.heading("Your Daily Goals vs Progress (Today)")
 
-        avg_calories = totals['calories'] / 7 if totals['calories'] else 0
-
-        response = f"**This Week's Nutrition**\n\n"
-        response += f"• **Total Calories**: {totals['calories']:.0f} kcal\n"
-        response += f"• **Avg per Day**: {avg_calories:.0f} kcal\n"
-        response += f"• **Total Protein**: {totals['protein']:.1f}g\n"
-        response += f"• **Total Carbs**: {totals['carbs']:.1f}g\n"
-
-        return response
-
-    def _get_month_nutrition(self):
-        """Get month's nutrition"""
-        month_ago = timezone.now().date() - timedelta(days=30)
-        meals = Meal.objects.filter(user=self.user, date__gte=month_ago)
-
-        if not meals.exists():
-            return "No meals logged this month."
-
-        totals = meals.aggregate(
-            calories=Sum('calories'),
-            protein=Sum('protein')
-        )
-
-        avg_calories = totals['calories'] / 30 if totals['calories'] else 0
+        goals = [
+            ('Calories', totals['calories'] or 0, self.user.daily_calorie_goal),
+            ('Protein', totals['protein'] or 0, self.user.daily_protein_goal),
+            ('Carbs', totals['carbs'] or 0, self.user.daily_carbs_goal),
+            ('Fat', totals['fat'] or 0, self.user.daily_fat_goal),
+            ('Fiber', totals['fiber'] or 0, self.user.daily_fiber_goal),
+        ]
 
-        response = f"**This Month's Nutrition**\n\n"
-        response += f"• **Total Calories**: {totals['calories']:.0f} kcal\n"
-        response += f"• **Avg per Day**: {avg_calories:.0f} kcal\n"
-        response += f"• **Total Protein**: {totals['protein']:.1f}g\n"
+        for name, actual, goal in goals:
+            percentage = (actual / goal * 100) if goal > 0 else 0
+            status = "met" if percentage >= 90 else "close" if percentage >= 70 else "behind"
+            unit = "kcal" if name == "Calories" else "g"
+            reply.item(
+                {'nutrient': name.lower(), 'actual': actual, 'goal': goal, 'unit': unit,
+                 'percentage': round(percentage, 1), 'status': status},
+                f"{GOAL_STATUS_ICONS[status]} ", Bold(name),
+                f": {actual:.1f}{unit} / {goal:.1f}{unit} ({percentage:.0f}%)"
+            )
 
-        return response
+        return reply.line()
 
     def _get_help_message(self):
         """Get help message"""
-        return """**I can help you with:**
-
-📊 **Nutrition Tracking**
-- "What did I eat today?"
-- "How many calories have I consumed this week?"
-- "Show me my protein intake"
-
-💊 **Medication Management**
-- "Show my medications"
-- "What medications am I taking?"
-
-🎯 **Goal Tracking**
-- "Am I meeting my goals?"
-- "Show my progress"
-
-📝 **Data Entry**
-- Use the API endpoints to log meals and medications
-
-Just ask me in plain English and I'll help you track your health!"""
+        reply = ChatReply('help', topics=[
+            {'topic': topic, 'examples': [example.strip('"') for example in examples]}
+            for _, topic, examples in HELP_TOPICS
+        ])
+        reply.heading("I can help you with:")
+        for icon, topic, examples in HELP_TOPICS:
+            reply.line(f"{icon} ", Bold(topic))
+            for example in examples:
+                reply.line(f"- {example}")
+            reply.line()
+        return reply.line("Just ask me in plain English and I'll help you track your health!")
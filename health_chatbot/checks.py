@@ -0,0 +1,50 @@
+"""
+System checks
+Caches that must be shared by every worker process (primary pins, API key
+revocations) are rejected when they are per-process.
+"""
+from django.conf import settings
+from django.core import checks
+
+from .routers import replica_aliases
+
+
+# Cache backends whose entries one worker process can't see from another
+_PER_PROCESS_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def _per_process(alias):
+    return settings.CACHES.get(alias, {}).get('BACKEND') in _PER_PROCESS_CACHES
+
+
+def check_pin_cache(app_configs, **kwargs):
+    """With replicas, pins must live in a cache every worker shares"""
+    alias = settings.REPLICA_PIN_CACHE_ALIAS
+    if not replica_aliases() or not _per_process(alias):
+        return []
+    return [checks.Error(
+        f"REPLICA_PIN_CACHE_ALIAS ('{alias}') uses a per-process cache, so a user who "
+        "writes through one worker can read a lagging replica through another.",
+        hint='Point CACHE_BACKEND/CACHE_LOCATION (or the REPLICA_PIN_CACHE_ALIAS cache) at '
+             'Redis, Memcached or the database cache, or silence health_chatbot.E001 when '
+             'running a single worker process.',
+        id='health_chatbot.E001',
+    )]
+
+
+def check_api_key_cache(app_configs, **kwargs):
+    """With API keys required, revocations must be counted in a cache every worker shares"""
+    alias = settings.API_KEY_CACHE_ALIAS
+    if not settings.API_KEY_REQUIRED or not _per_process(alias):
+        return []
+    return [checks.Error(
+        f"API_KEY_CACHE_ALIAS ('{alias}') uses a per-process cache, so a revoked API key "
+        "keeps working in other workers for up to USER_CACHE_TTL seconds.",
+        hint='Point CACHE_BACKEND/CACHE_LOCATION (or the API_KEY_CACHE_ALIAS cache) at '
+             'Redis, Memcached or the database cache, or silence health_chatbot.E002 when '
+             'running a single worker process.',
+        id='health_chatbot.E002',
+    )]
@@ -0,0 +1,114 @@
+"""
+Conversation context for chatbot follow-ups
+Per user, the last answered intent, its time window and its result data, so
+"what about protein?" or "and yesterday?" can build on the previous question.
+States are stored as compact JSON capped at CONVERSATION_MAX_BYTES, in a
+bounded in-process LRU or, with CONVERSATION_CACHE_ALIAS set, in a Django
+cache shared by all workers. Each state records the user's meals generation
+(cache.MEALS) its data was read under; loading it under another generation
+drops the data, so no worker answers from meals read before a write.
+"""
+import json
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .users import LRUCache
+
+
+def encode_state(intent, window, data, generation=0):
+    """
+    Serialise a state, shedding result rows (then the whole result) until it
+    fits in CONVERSATION_MAX_BYTES
+    """
+    state = {'intent': intent, 'window': window, 'data': data, 'generation': generation}
+    raw = _dumps(state)
+    if len(raw) > settings.CONVERSATION_MAX_BYTES and data and 'items' in data:
+        state['data'] = {key: value for key, value in data.items() if key != 'items'}
+        raw = _dumps(state)
+    if len(raw) > settings.CONVERSATION_MAX_BYTES:
+        state['data'] = None
+        raw = _dumps(state)
+    return raw
+
+
+def _dumps(state):
+    return json.dumps(state, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+
+
+class ConversationStore:
+    """Load/save encoded states by user id; subclasses provide storage"""
+
+    def load(self, user_id, generation=0):
+        """The user's state, without its data if the meals have changed since it was saved"""
+        raw = self._get(user_id)
+        if raw is None:
+            return None
+        state = json.loads(raw)
+        if state.get('generation', 0) != generation:
+            state.update(data=None, generation=generation)
+        return state
+
+    def save(self, user_id, intent, window, data, generation=0):
+        self._set(user_id, encode_state(intent, window, data, generation))
+
+    def forget(self, user_id):
+        self._delete(user_id)
+
+
+class MemoryConversationStore(ConversationStore):
+    """Per-process store holding at most ``max_users`` states"""
+
+    def __init__(self, max_users, ttl):
+        self.states = LRUCache(max_users)
+        self.ttl = ttl
+
+    def _get(self, user_id):
+        return self.states.get(user_id)
+
+    def _set(self, user_id, raw):
+        self.states.set(user_id, raw, self.ttl)
+
+    def _delete(self, user_id):
+        self.states.pop(user_id)
+
+
+class CacheConversationStore(ConversationStore):
+    """Store in a Django cache, shared by every worker using it"""
+
+    def __init__(self, alias, ttl):
+        self.alias = alias
+        self.ttl = ttl
+
+    def _key(self, user_id):
+        return f'health:conv:{user_id}'
+
+    def _get(self, user_id):
+        return caches[self.alias].get(self._key(user_id))
+
+    def _set(self, user_id, raw):
+        caches[self.alias].set(self._key(user_id), raw, self.ttl)
+
+    def _delete(self, user_id):
+        caches[self.alias].delete(self._key(user_id))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def conversation_store():
+    """The configured store (created on first use)"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if settings.CONVERSATION_CACHE_ALIAS:
+                    _store = CacheConversationStore(
+                        settings.CONVERSATION_CACHE_ALIAS, settings.CONVERSATION_TTL)
+                else:
+                    _store = MemoryConversationStore(
+                        settings.CONVERSATION_MAX_USERS, settings.CONVERSATION_TTL)
+    return _store
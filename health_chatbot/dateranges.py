@@ -0,0 +1,203 @@
+"""
+Date range extraction for chatbot messages
+Turns phrases such as "today", "last 3 days", "past 2 weeks", "since Monday",
+"March 2nd" or "3 days ago" into an exact, inclusive date range. Every
+phrase is part of one regex compiled at import time, so a message is
+scanned once whatever it contains.
+"""
+import re
+from collections import namedtuple
+from datetime import date, timedelta
+
+
+MONTHS = {
+    'january': 1, 'february': 2, 'march': 3, 'april': 4, 'may': 5, 'june': 6,
+    'july': 7, 'august': 8, 'september': 9, 'october': 10, 'november': 11, 'december': 12,
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'jun': 6, 'jul': 7, 'aug': 8,
+    'sep': 9, 'sept': 9, 'oct': 10, 'nov': 11, 'dec': 12,
+}
+
+WEEKDAYS = {
+    'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3,
+    'friday': 4, 'saturday': 5, 'sunday': 6,
+}
+
+NUMBER_WORDS = {
+    'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6,
+    'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10, 'eleven': 11, 'twelve': 12,
+}
+
+# Rolling windows named by a single word (the chatbot's original vocabulary)
+WINDOW_DAYS = {'week': 7, 'month': 30}
+
+_MONTH_NAMES = [name.capitalize() for name in
+                ('january', 'february', 'march', 'april', 'may', 'june', 'july',
+                 'august', 'september', 'october', 'november', 'december')]
+
+
+class DateRange(namedtuple('DateRange', ['start', 'end', 'title'])):
+    """Inclusive date range and the title it is shown under"""
+    __slots__ = ()
+
+    @property
+    def days(self):
+        return (self.end - self.start).days + 1
+
+
+def _alternation(words):
+    # Longest first, so 'sept' wins over 'sep'
+    return '|'.join(sorted(words, key=len, reverse=True))
+
+
+_NUMBER = r'\d{1,4}|' + _alternation(NUMBER_WORDS)
+_ORDINAL = r'(?:st|nd|rd|th)?'
+
+
+def _day_pattern(prefix):
+    """A single day ("monday", "last monday", "march 2nd", "2 march", "2024-03-02", "yesterday")"""
+    months = _alternation(MONTHS)
+    return (
+        rf'(?P<{prefix}iso>\d{{4}}-\d{{2}}-\d{{2}})'
+        rf'|(?P<{prefix}month>{months})\.?\s+(?P<{prefix}day>\d{{1,2}}){_ORDINAL}\b'
+        rf'(?:,?\s+(?P<{prefix}year>\d{{4}}))?'
+        rf'|(?P<{prefix}day2>\d{{1,2}}){_ORDINAL}\s+(?:of\s+)?(?P<{prefix}month2>{months})\b'
+        rf'(?:,?\s+(?P<{prefix}year2>\d{{4}}))?'
+        rf'|(?:(?P<{prefix}last>last)\s+)?(?P<{prefix}weekday>{_alternation(WEEKDAYS)})\b'
+        rf'|(?P<{prefix}named>today|yesterday)\b'
+    )
+
+
+_PATTERN = re.compile(
+    r'\b(?:'
+    rf'since\s+(?:{_day_pattern("since_")})'
+    rf'|(?:last|past|previous|prior)\s+(?:(?P<count>{_NUMBER})\s+)?(?P<unit>day|week|month)s?\b'
+    rf'|(?P<ago>{_NUMBER})\s+(?P<ago_unit>day|week|month)s?\s+ago\b'
+    rf'|{_day_pattern("")}'
+    r'|(?:this\s+)?(?P<window>week|month)\b'
+    r')'
+)
+
+
+# Words one of the phrases above must contain. Messages without any skip the
+# regex (most chat messages name no date at all); the others are searched
+# from just before the first one.
+_TRIGGER_WORDS = frozenset(
+    ['since', 'last', 'past', 'previous', 'prior', 'ago', 'today', 'yesterday',
+     'week', 'weeks', 'month', 'months']
+    + list(MONTHS) + list(WEEKDAYS)
+)
+_WORD_BREAKS = str.maketrans({char: ' ' for char in '.,;:!?\'"()[]/'})
+
+# Longest lead-in before a trigger word that a phrase can start with
+# ("this week", "twelve months ago")
+_LEAD_IN = len('twelve months ')
+
+
+def _search_start(message):
+    """Where a date phrase can start at the earliest, or -1 if there is none"""
+    words = message.translate(_WORD_BREAKS)
+    for word in words.split():
+        if word in _TRIGGER_WORDS or word[0].isdigit():
+            # translate() keeps offsets, so this is the word's (first) position
+            return max(0, words.find(word) - _LEAD_IN)
+    return -1
+
+
+def _number(text):
+    return NUMBER_WORDS[text] if text in NUMBER_WORDS else int(text)
+
+
+def _shift_months(day, months):
+    """Same day of the month ``months`` away, clamped to the month's last day"""
+    month_index = day.year * 12 + day.month - 1 + months
+    year, month = divmod(month_index, 12)
+    month += 1
+    next_month = date(year + month // 12, month % 12 + 1, 1)
+    return date(year, month, min(day.day, (next_month - timedelta(days=1)).day))
+
+
+def _back(today, count, unit):
+    """The day ``count`` units before today"""
+    if unit == 'month':
+        return _shift_months(today, -count)
+    return today - timedelta(days=count * (7 if unit == 'week' else 1))
+
+
+def _plural(count, unit):
+    return f'{count} {unit.capitalize()}' + ('' if count == 1 else 's')
+
+
+def _resolve_day(match, prefix, today):
+    """(day, title) for a _day_pattern match; raises ValueError for impossible dates"""
+    group = match.group
+    if group(prefix + 'iso'):
+        day = date.fromisoformat(group(prefix + 'iso'))
+        return day, day.isoformat()
+
+    if group(prefix + 'named'):
+        if group(prefix + 'named') == 'today':
+            return today, 'Today'
+        return today - timedelta(days=1), 'Yesterday'
+
+    if group(prefix + 'weekday'):
+        weekday = WEEKDAYS[group(prefix + 'weekday')]
+        back = (today.weekday() - weekday) % 7
+        if group(prefix + 'last') and back == 0:
+            back = 7
+        name = group(prefix + 'weekday').capitalize()
+        return today - timedelta(days=back), f'Last {name}' if group(prefix + 'last') else name
+
+    month_name = group(prefix + 'month') or group(prefix + 'month2')
+    month = MONTHS[month_name]
+    day_number = int(group(prefix + 'day') or group(prefix + 'day2'))
+    year = group(prefix + 'year') or group(prefix + 'year2')
+    if year:
+        day = date(int(year), month, day_number)
+        return day, f'{_MONTH_NAMES[month - 1]} {day_number}, {year}'
+    # Without a year, the most recent such date
+    day = date(today.year, month, day_number)
+    if day > today:
+        day = date(today.year - 1, month, day_number)
+    return day, f'{_MONTH_NAMES[month - 1]} {day_number}'
+
+
+def parse_range(message, today):
+    """
+    The first date range named in a lowercased message, or None.
+    Ranges are inclusive and never end after ``today``.
+    """
+    start = _search_start(message)
+    if start < 0:
+        return None
+    match = _PATTERN.search(message, start)
+    if match is None:
+        return None
+
+    group = match.group
+    try:
+        if group('unit'):
+            count = _number(group('count')) if group('count') else 1
+            unit = group('unit')
+            title = f'Past {unit.capitalize()}' if count == 1 else f'Past {_plural(count, unit)}'
+            return DateRange(_back(today, count, unit) + timedelta(days=1), today, title)
+
+        if group('ago'):
+            count = _number(group('ago'))
+            day = _back(today, count, group('ago_unit'))
+            return DateRange(day, day, f'{_plural(count, group("ago_unit"))} Ago')
+
+        if group('window'):
+            days = WINDOW_DAYS[group('window')]
+            return DateRange(today - timedelta(days=days - 1), today, f'This {group("window").capitalize()}')
+
+        if match.group(0).startswith('since'):
+            day, title = _resolve_day(match, 'since_', today)
+            return DateRange(min(day, today), today, f'Since {title}')
+
+        day, title = _resolve_day(match, '', today)
+        if day > today:
+            return None
+        return DateRange(day, day, title)
+    except ValueError:
+        # "February 30th" and the like
+        return None
@@ -0,0 +1,146 @@
+"""
+Static documents (OpenAPI spec, privacy policy)
+Each document is read and rendered once per process and served from memory
+with a strong ETag, 304 handling and pre-compressed gzip/brotli variants.
+With DEBUG on, the source file's mtime is checked per request and the
+document re-rendered when it changes.
+"""
+import gzip
+import hashlib
+import os
+import threading
+
+import markdown
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+
+PRIVACY_TEMPLATE = (
+    '<html><head><style>body{{max-width:800px;margin:40px auto;font-family:system-ui;'
+    'line-height:1.6;padding:0 20px}}h1{{color:#2563eb}}h2{{color:#4b5563;margin-top:2em}}'
+    'code{{background:#f3f4f6;padding:2px 6px;border-radius:3px}}</style></head>'
+    '<body>{html}</body></html>'
+)
+
+
+def render_privacy(raw):
+    return PRIVACY_TEMPLATE.format(html=markdown.markdown(raw.decode('utf-8'))).encode('utf-8')
+
+
+def _accepts(accept_encoding, coding):
+    """Does an Accept-Encoding header allow this coding (q > 0)?"""
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        if name.strip().lower() not in (coding, '*'):
+            continue
+        params = params.strip().replace(' ', '')
+        if params.startswith('q='):
+            try:
+                return float(params[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+class StaticDocument:
+    """A file rendered once and served from memory"""
+
+    def __init__(self, filename, content_type, render=None):
+        self.filename = filename
+        self.content_type = content_type
+        self.render = render
+        self._variants = None
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        return os.path.join(settings.BASE_DIR, self.filename)
+
+    def _load(self):
+        """Render the document; returns {coding: (body, etag)} or None if missing"""
+        try:
+            with open(self.path, 'rb') as f:
+                mtime = os.fstat(f.fileno()).st_mtime
+                body = f.read()
+        except FileNotFoundError:
+            return None, None
+
+        if self.render is not None:
+            body = self.render(body)
+
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        # Strong ETags must differ between encodings of the same content
+        variants = {
+            'identity': (body, f'"{digest}"'),
+            'gzip': (gzip.compress(body, 9, mtime=0), f'"{digest}-gz"'),
+        }
+        if brotli is not None:
+            variants['br'] = (brotli.compress(body, quality=11), f'"{digest}-br"')
+        return variants, mtime
+
+    def variants(self):
+        if self._variants is not None and not settings.DEBUG:
+            return self._variants
+
+        with self._lock:
+            if self._variants is None or (settings.DEBUG and self._changed()):
+                self._variants, self._mtime = self._load()
+            return self._variants
+
+    def _changed(self):
+        try:
+            return os.stat(self.path).st_mtime != self._mtime
+        except FileNotFoundError:
+            return self._mtime is not None
+
+    def response(self, request):
+        """Serve the best encoding for the request, or a 304; None if the file is missing"""
+        variants = self.variants()
+        if variants is None:
+            return None
+
+        accept_encoding = request.headers.get('Accept-Encoding', '')
+        coding = 'identity'
+        if 'br' in variants and _accepts(accept_encoding, 'br'):
+            coding = 'br'
+        elif _accepts(accept_encoding, 'gzip'):
+            coding = 'gzip'
+        body, etag = variants[coding]
+
+        if self._matches(request.headers.get('If-None-Match', ''), variants):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(body, content_type=self.content_type)
+            if coding != 'identity':
+                response['Content-Encoding'] = coding
+            response['Content-Length'] = len(body)
+
+        response['ETag'] = etag
+        if settings.DEBUG:
+            response['Cache-Control'] = 'no-cache'
+        else:
+            response['Cache-Control'] = f'public, max-age={settings.STATIC_DOCUMENT_MAX_AGE}'
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
+
+    @staticmethod
+    def _matches(if_none_match, variants):
+        """Weak comparison, per If-None-Match; any encoding's ETag counts"""
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == '*':
+            return True
+        tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+        return any(etag in tags for _, etag in variants.values())
+
+
+OPENAPI_SPEC = StaticDocument('openapi.yaml', 'application/x-yaml')
+PRIVACY_POLICY = StaticDocument('PRIVACY.md', 'text/html; charset=utf-8', render=render_privacy)
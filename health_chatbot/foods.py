@@ -0,0 +1,376 @@
+"""
+Food catalog: loading, name lookup and macros for logged portions
+Lookups go through an in-process index of the catalog's names (built on
+first use and rebuilt when the catalog changes), so they never query the
+database: words map to the foods containing them, the last word of a
+query also matches as a prefix, and misspelled words are corrected against
+the catalog's vocabulary with a trigram index.
+"""
+import csv
+import heapq
+import io
+import json
+import re
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+
+from django.db import connection, transaction
+
+from .cache import CATALOG_USER, FOODS, generation, invalidate
+from .dateranges import NUMBER_WORDS, WEEKDAYS
+from .models import Food
+from .rollups import NUTRIENTS
+from .search import TrigramIndex, normalise
+
+
+FOOD_COLUMNS = ['name', 'serving', *NUTRIENTS]
+
+# Fewest and most servings one meal can log
+MIN_SERVINGS = 0.01
+MAX_SERVINGS = 50
+
+# Vocabulary words a query's last word can expand to as a prefix
+_MAX_EXPANSIONS = 64
+
+# Close vocabulary words tried for a misspelled query word
+_MAX_CORRECTIONS = 3
+
+# Candidates checked per search, bounding queries whose words rarely occur together
+_MAX_SCAN = 5000
+
+
+def _stem(word):
+    """Singular form for matching ("eggs" -> 'egg', "berries" -> 'berry')"""
+    if len(word) <= 3 or not word.endswith('s') or word.endswith('ss'):
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith('oes'):
+        return word[:-2]
+    return word[:-1]
+
+
+def _words(text):
+    return [_stem(word) for word in normalise(text).split()]
+
+
+class FoodIndex:
+    """
+    Name index over (food_id, name) pairs.
+
+    Foods are ranked shortest name first, so "egg" finds "Egg" before
+    "Egg white". ``search()`` returns food ids of names containing every
+    query word (misspellings corrected); with ``prefix=True`` the last
+    word may be the start of a word ("gre yog" -> "Greek yogurt").
+    """
+
+    def __init__(self, rows):
+        entries = sorted((' '.join(_words(name)), food_id) for food_id, name in rows)
+        entries.sort(key=lambda entry: len(entry[0]))
+
+        # Position = rank; names are padded so ' word ' checks whole words
+        self._ids = array('q', (food_id for _, food_id in entries))
+        self._names = [f' {key} ' for key, _ in entries]
+        self._exact = {}
+        for position, name in enumerate(self._names):
+            self._exact.setdefault(name, position)
+
+        postings = {}
+        for position, (key, _) in enumerate(entries):
+            for word in set(key.split()):
+                postings.setdefault(word, array('i')).append(position)
+        self._postings = postings
+        self._vocabulary = sorted(postings)
+
+        self._fuzzy = TrigramIndex()
+        for word in self._vocabulary:
+            self._fuzzy.add(word, word)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _expand(self, word, prefix):
+        """
+        (vocabulary words a query word stands for, substrings of a padded
+        name that show it contains one of them)
+        """
+        if prefix:
+            start = bisect_left(self._vocabulary, word)
+            end = bisect_right(self._vocabulary, word + '\uffff', start)
+            found = self._vocabulary[start:end]
+            if found:
+                return found, [f' {word}']
+        found = [word] if word in self._postings else self._fuzzy.search(word, _MAX_CORRECTIONS)
+        return found, [f' {w} ' for w in found]
+
+    def search(self, query, limit, prefix=True):
+        """Ids of the best ``limit`` foods for the query"""
+        return [self._ids[position] for position in self._positions(_words(query), limit, prefix)]
+
+    def match(self, phrase):
+        """Id of the food a phrase names ("eggs", "brown rice"), or None"""
+        food_id = self.exact(phrase)
+        if food_id is not None:
+            return food_id
+        found = self.search(phrase, 1, prefix=False)
+        return found[0] if found else None
+
+    def exact(self, phrase):
+        """Id of the food named exactly (up to plurals and punctuation) by a phrase, or None"""
+        position = self._exact.get(f' {" ".join(_words(phrase))} ')
+        return None if position is None else self._ids[position]
+
+    def _positions(self, words, limit, prefix):
+        if not words:
+            return []
+
+        groups = []
+        for i, word in enumerate(words):
+            expanded, needles = self._expand(word, prefix and i == len(words) - 1)
+            if not expanded:
+                return []
+            if len(expanded) > _MAX_EXPANSIONS:
+                size = float('inf')
+            else:
+                size = sum(len(self._postings[w]) for w in expanded)
+            groups.append((size, expanded, needles))
+
+        # Walk the rarest group's foods in rank order, keeping those that
+        # also contain a word of every other group
+        groups.sort(key=lambda group: group[0])
+        driver = groups[0][1]
+        if len(driver) > _MAX_EXPANSIONS:
+            # A short prefix: walk the words naming the most foods
+            driver = heapq.nlargest(_MAX_EXPANSIONS, driver, key=lambda w: len(self._postings[w]))
+        others = [needles for _, _, needles in groups[1:]]
+        positions = self._postings[driver[0]] if len(driver) == 1 else \
+            _unique(heapq.merge(*(self._postings[w] for w in driver)))
+
+        names = self._names
+        found = []
+        for scanned, position in enumerate(positions):
+            if scanned == _MAX_SCAN:
+                break
+            name = names[position]
+            # Plain loops: this is the hot path, and all()/any() generators cost more
+            for needles in others:
+                for needle in needles:
+                    if needle in name:
+                        break
+                else:
+                    break
+            else:
+                found.append(position)
+                if len(found) == limit:
+                    break
+        return found
+
+
+def _unique(positions):
+    last = None
+    for position in positions:
+        if position != last:
+            yield position
+            last = position
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def food_index():
+    """This process's catalog index, rebuilt when the catalog has changed"""
+    global _index
+    current = generation(CATALOG_USER, FOODS)
+    index = _index
+    if index is not None and index[0] == current:
+        return index[1]
+
+    with _index_lock:
+        if _index is None or _index[0] != current:
+            rows = Food.objects.values_list('id', 'name').iterator(chunk_size=10000)
+            _index = (current, FoodIndex(rows))
+        return _index[1]
+
+
+def search_foods(query, limit):
+    """Catalog foods for a query (autocomplete: the last word may be partial)"""
+    ids = food_index().search(query, limit)
+    foods = Food.objects.in_bulk(ids)
+    return [foods[food_id] for food_id in ids if food_id in foods]
+
+
+def catalog_changed():
+    """Make every process rebuild its index (after writes that bypass the ORM's signals)"""
+    invalidate(CATALOG_USER, FOODS)
+
+
+def meal_fields(food, servings):
+    """Meal name, macros and a note for ``servings`` servings of a food"""
+    return {
+        'meal_name': food.name,
+        **{name: round(getattr(food, name) * servings, 1) for name in NUTRIENTS},
+        'notes': f'{servings:g} × {food.serving}',
+    }
+
+
+# Chat phrases: "log 2 eggs and toast", "I had a bowl of oatmeal for breakfast"
+_LOG_LEAD_IN = re.compile(r'^\W*(?:please\s+)?(?:log|i\s+(?:just\s+)?(?:had|ate)|had|ate)\b\s*')
+_MEAL_TIME = re.compile(r'\b(?:for|at|with|as)?\s*(?:my\s+|a\s+)?(?P<meal_time>breakfast|lunch|dinner|snack)\b')
+_TIME_WORDS = re.compile(
+    r'\b(?:on\s+|last\s+)?(?:today|yesterday|tonight|this\s+(?:morning|afternoon|evening)|'
+    + '|'.join(WEEKDAYS) + r')\b'
+)
+_SEPARATORS = re.compile(r'\s*(,|&|\+|\band\b|\bplus\b|\bwith\b)\s*')
+_PORTION = re.compile(
+    r'^(?:(?P<count>\d+(?:\.\d+)?|\d+/\d+|half(?:\s+an?)?|' + '|'.join(NUMBER_WORDS) + r')\s+)?'
+    r'(?:(?:servings?|portions?|pieces?|slices?|cups?|bowls?|glass(?:es)?|handfuls?|plates?)\s+(?:of\s+)?)?'
+    r'(?:(?:some|the|my)\s+)?(?P<food>.+?)\W*$'
+)
+
+
+def _servings(count):
+    """Servings a count names ("2", "half a", "1/2"), or None if it names none ("1/0")"""
+    if count is None:
+        return 1.0
+    if count.startswith('half'):
+        return 0.5
+    if count in NUMBER_WORDS:
+        return float(NUMBER_WORDS[count])
+    if '/' in count:
+        numerator, denominator = count.split('/')
+        return int(numerator) / int(denominator) if int(denominator) else None
+    return float(count)
+
+
+def is_log_message(message_lower):
+    """Does the message start like a meal to log ("log ...", "I had ...")?"""
+    return _LOG_LEAD_IN.match(message_lower) is not None
+
+
+def _portion(text):
+    """
+    (servings, food phrase, portion as written) for "2 eggs", "a bowl of
+    oatmeal"; None if no food is named
+    """
+    match = _PORTION.match(text)
+    if match is None or not match.group('food'):
+        return None
+    return _servings(match.group('count')), match.group('food'), text[:match.end('food')]
+
+
+def usable_servings(servings):
+    """Can a meal log this many servings? (as FoodPortionSerializer allows)"""
+    return servings is not None and MIN_SERVINGS <= servings <= MAX_SERVINGS
+
+
+def match_portions(message_lower, index):
+    """
+    Foods named in a log message: ([(servings, food_id or None, portion), ...],
+    meal_time or None), each portion as written ("2 eggs"); servings is None
+    for an amount that isn't one ("1/0"). Parts split at "and", "with" or
+    commas are rejoined when together they name a food ("macaroni and cheese").
+    """
+    text = _LOG_LEAD_IN.sub('', message_lower, count=1)
+    meal_time = _MEAL_TIME.search(text)
+    if meal_time:
+        text = text[:meal_time.start()] + ' ' + text[meal_time.end():]
+    text = _TIME_WORDS.sub(' ', text)
+    # [part, separator, part, ...]
+    pieces = _SEPARATORS.split(text.strip())
+    parts = pieces[::2]
+
+    portions = []
+    i = 0
+    while i < len(parts):
+        for end in range(min(len(parts), i + 3), i + 1, -1):
+            portion = _portion(' '.join(pieces[2 * i:2 * end - 1]))
+            food_id = portion and index.exact(portion[1])
+            if food_id is not None:
+                portions.append((portion[0], food_id, portion[2]))
+                i = end
+                break
+        else:
+            portion = _portion(parts[i]) if parts[i] else None
+            if portion is not None:
+                portions.append((portion[0], index.match(portion[1]), portion[2]))
+            i += 1
+    return portions, meal_time.group('meal_time') if meal_time else None
+
+
+def read_catalog(path):
+    """
+    Rows (name, serving, calories, protein, carbs, fat, fiber) from a CSV
+    file with those columns or a JSON list of objects with those keys.
+    Raises ValueError naming the first invalid row.
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        if str(path).endswith('.json'):
+            records = json.load(f)
+        else:
+            records = csv.DictReader(f)
+        for number, record in enumerate(records, start=1):
+            try:
+                name = record['name'].strip()
+                if not name or len(name) > 200:
+                    raise ValueError('name must be 1-200 characters')
+                values = [float(record.get(column) or 0) for column in NUTRIENTS]
+                if any(value < 0 for value in values):
+                    raise ValueError('nutrients must not be negative')
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                raise ValueError(f'{path}: row {number}: {e}') from None
+            yield (name, (record.get('serving') or '1 serving').strip()[:100], *values)
+
+
+def _copy_upsert(rows):
+    """PostgreSQL: COPY into a temporary table, then one INSERT ... ON CONFLICT"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(rows)
+    buffer.seek(0)
+    columns = ', '.join(FOOD_COLUMNS)
+    updates = ', '.join(f'{column} = EXCLUDED.{column}' for column in FOOD_COLUMNS[1:])
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TEMPORARY TABLE foods_load '
+            '(name varchar(200), serving varchar(100), '
+            + ', '.join(f'{column} double precision' for column in NUTRIENTS)
+            + ') ON COMMIT DROP'
+        )
+        cursor.cursor.copy_expert(f'COPY foods_load ({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+        cursor.execute(
+            f'INSERT INTO foods ({columns}) SELECT {columns} FROM foods_load '
+            f'ON CONFLICT (name) DO UPDATE SET {updates}'
+        )
+
+
+def load_catalog(rows, batch_size, copy):
+    """
+    Insert or update foods by name, ``batch_size`` rows per statement.
+    Returns the number of distinct foods written.
+    """
+    # Later rows win, as they would in a sequence of upserts
+    foods = {row[0]: row for row in rows}
+    batch = []
+
+    def flush():
+        with transaction.atomic():
+            if copy:
+                _copy_upsert(batch)
+            else:
+                Food.objects.bulk_create(
+                    [Food(**dict(zip(FOOD_COLUMNS, row))) for row in batch],
+                    update_conflicts=True, unique_fields=['name'], update_fields=FOOD_COLUMNS[1:],
+                )
+        batch.clear()
+
+    for row in foods.values():
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    catalog_changed()
+    return len(foods)
@@ -0,0 +1,122 @@
+"""
+Deferred chat history writes
+Chat turns are queued in memory and inserted in batches by a background
+thread, so the history INSERT is off the chat response path
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection
+
+from .models import ChatMessage
+
+
+logger = logging.getLogger(__name__)
+
+# Attempts per batch before it is logged and dropped
+WRITE_ATTEMPTS = 3
+
+
+class ChatHistoryWriter:
+    """
+    Bounded queue of unsaved ChatMessage rows drained by one writer thread.
+    Each pass takes everything queued (up to CHAT_WRITE_BATCH_SIZE) and
+    writes it with a single bulk INSERT, so batches grow with load.
+    """
+
+    def __init__(self, max_queue, batch_size):
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.stats = {'written': 0, 'inline': 0, 'dropped': 0}
+        self._stats_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def offer(self, message):
+        """Queue a row without blocking; False when the queue is full"""
+        self._ensure_started()
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except queue.Full:
+            return False
+
+    def submit(self, message, timeout):
+        """
+        Queue a row, waiting up to ``timeout`` seconds for space (backpressure).
+        If the writer still can't keep up, the row is written inline rather
+        than dropped.
+        """
+        self._ensure_started()
+        try:
+            self.queue.put(message, timeout=timeout)
+        except queue.Full:
+            ChatMessage.objects.bulk_create([message])
+            self._count('inline', 1)
+
+    def close(self, timeout=10):
+        """Stop accepting work and wait for queued rows to be written"""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='chat-history-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        while True:
+            try:
+                batch = [self.queue.get(timeout=0.5)]
+            except queue.Empty:
+                if self._stopping.is_set():
+                    break
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write(batch)
+        connection.close()
+
+    def _write(self, batch):
+        for attempt in range(1, WRITE_ATTEMPTS + 1):
+            # Honour CONN_MAX_AGE / health checks as a request would
+            close_old_connections()
+            try:
+                ChatMessage.objects.bulk_create(batch)
+                self._count('written', len(batch))
+                return
+            except DatabaseError:
+                logger.exception('Chat history write failed (attempt %d)', attempt)
+                connection.close()
+                time.sleep(0.5 * attempt)
+        logger.error('Dropped %d chat history rows', len(batch))
+        self._count('dropped', len(batch))
+
+    def _count(self, name, n):
+        with self._stats_lock:
+            self.stats[name] += n
+
+    def snapshot(self):
+        """Queue depth and write counters for this process"""
+        with self._stats_lock:
+            return {'queued': self.queue.qsize(), **self.stats}
+
+
+chat_writer = ChatHistoryWriter(
+    max_queue=settings.CHAT_WRITE_QUEUE_SIZE,
+    batch_size=settings.CHAT_WRITE_BATCH_SIZE,
+)
@@ -0,0 +1,115 @@
+"""
+Intent classification for the chatbot
+All keyword tables are compiled into one regex at import time so a message
+is scanned once, no matter how many intents exist
+"""
+import re
+from collections import namedtuple
+
+
+# Intent keyword tables (substring matches, same as the original checks)
+MEAL_KEYWORDS = ['meal', 'ate', 'eaten', 'food', 'breakfast', 'lunch', 'dinner', 'snack']
+NUTRITION_KEYWORDS = ['calorie', 'protein', 'carb', 'fat', 'fiber', 'nutrition', 'nutrient']
+MEDICATION_KEYWORDS = ['medication', 'medicine', 'drug', 'pill', 'taking']
+GOAL_KEYWORDS = ['goal', 'target', 'should', 'progress', 'meeting']
+LOG_MEAL_KEYWORDS = ['log', 'add meal', 'record meal', 'ate', 'had']
+LOG_MEAL_MACRO_KEYWORDS = ['calorie', 'kcal', 'protein']
+ADD_MEDICATION_KEYWORDS = ['add medication', 'new medication', 'start taking', 'prescribed']
+GREETING_KEYWORDS = ['hello', 'hi', 'hey']
+HELP_KEYWORDS = ['help']
+
+# Slot keywords used by the handlers to pick a listing mode (date ranges are
+# extracted separately, by dateranges.parse_range)
+SLOT_KEYWORDS = ['list', 'show']
+
+# Intents in priority order (first match wins)
+MEAL_QUERY = 'meal_query'
+NUTRITION_QUERY = 'nutrition_query'
+MEDICATION_QUERY = 'medication_query'
+GOAL_QUERY = 'goal_query'
+LOG_MEAL = 'log_meal'
+ADD_MEDICATION = 'add_medication'
+GENERAL_QUERY = 'general_query'
+
+_TAG_TABLES = [
+    ('meal', MEAL_KEYWORDS),
+    ('nutrition', NUTRITION_KEYWORDS),
+    ('medication', MEDICATION_KEYWORDS),
+    ('goal', GOAL_KEYWORDS),
+    ('log_meal', LOG_MEAL_KEYWORDS),
+    ('log_meal_macro', LOG_MEAL_MACRO_KEYWORDS),
+    ('add_medication', ADD_MEDICATION_KEYWORDS),
+    ('greeting', GREETING_KEYWORDS),
+    ('help', HELP_KEYWORDS),
+]
+
+_INTENT_RULES = [
+    (MEAL_QUERY, {'meal'}),
+    (NUTRITION_QUERY, {'nutrition'}),
+    (MEDICATION_QUERY, {'medication'}),
+    (GOAL_QUERY, {'goal'}),
+    (LOG_MEAL, {'log_meal', 'log_meal_macro'}),
+    (ADD_MEDICATION, {'add_medication'}),
+]
+
+
+Classification = namedtuple('Classification', ['intent', 'slots', 'tags'])
+
+
+def _build_tag_table():
+    """
+    Map every keyword to the tags it implies.
+
+    The scanner reports only the longest keyword starting at each position,
+    so each keyword also carries the tags of any keyword that is a prefix of
+    it (e.g. 'add medication' also implies 'add').
+    """
+    direct = {}
+    for tag, keywords in _TAG_TABLES:
+        for keyword in keywords:
+            direct.setdefault(keyword, set()).add(tag)
+    for keyword in SLOT_KEYWORDS:
+        direct.setdefault(keyword, set()).add('slot:' + keyword)
+
+    table = {}
+    for keyword in direct:
+        tags = set()
+        for other, other_tags in direct.items():
+            if keyword.startswith(other):
+                tags |= other_tags
+        table[keyword] = frozenset(tags)
+    return table
+
+
+_KEYWORD_TAGS = _build_tag_table()
+
+# Zero-width lookahead so overlapping keywords are all seen in a single pass;
+# longest alternatives first so the longest keyword at each position wins.
+_KEYWORD_PATTERN = re.compile(
+    '(?=(' + '|'.join(
+        re.escape(keyword)
+        for keyword in sorted(_KEYWORD_TAGS, key=len, reverse=True)
+    ) + '))'
+)
+
+
+def classify(message):
+    """
+    Classify a lowercased message.
+
+    Returns a Classification with the winning intent, the set of matched
+    slot words ('list', 'show') and the full set of matched tags.
+    """
+    tags = set()
+    for match in _KEYWORD_PATTERN.finditer(message):
+        tags |= _KEYWORD_TAGS[match.group(1)]
+
+    slots = frozenset(tag[5:] for tag in tags if tag.startswith('slot:'))
+
+    intent = GENERAL_QUERY
+    for name, required in _INTENT_RULES:
+        if required <= tags:
+            intent = name
+            break
+
+    return Classification(intent, slots, frozenset(tags))
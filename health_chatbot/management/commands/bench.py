@@ -0,0 +1,442 @@
+"""
+Management command to benchmark every API endpoint
+Usage: python manage.py bench [--mode inproc|wsgi|asgi|both|all] [--requests 200]
+                              [--output bench.json] [--baseline baseline.json]
+"""
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from health_chatbot import synthetic
+from health_chatbot.benchmarking import add_output_argument, summarise, write_results
+from health_chatbot.cache import invalidate, MEALS, MEDICATIONS
+from health_chatbot.chatbot import HealthChatbot
+from health_chatbot.models import Meal, Medication
+from health_chatbot.users import get_demo_user
+
+
+CHAT_MESSAGES = [
+    'What did I eat today?',
+    'meals this week',
+    'How much protein have I consumed this week?',
+    'calories this month',
+    'Show me my medications',
+    'Am I meeting my goals?',
+    'hello',
+]
+
+
+class _PooledWSGIServer(WSGIServer):
+    """
+    WSGI server handling requests on a fixed set of worker threads, like
+    gunicorn's gthread workers, so each thread's persistent DB connection is
+    reused from one request to the next
+    """
+    request_queue_size = 1024
+
+    def __init__(self, address, handler_class, threads):
+        super().__init__(address, handler_class)
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=True)
+
+
+class _QuietHandler(WSGIRequestHandler):
+    # wsgiref writes headers and body separately; without TCP_NODELAY, Nagle's
+    # algorithm plus delayed ACKs add ~40ms+ to every larger response
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+
+def _simulate_db_latency(seconds):
+    """Delay every query, standing in for the network round trip to a remote database"""
+    def delay(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        # Fired on every reconnect of the same wrapper, so only add it once
+        if delay not in connection.execute_wrappers:
+            connection.execute_wrappers.append(delay)
+
+    connection_created.connect(install, weak=False)
+    for conn in connections.all(initialized_only=True):
+        install(None, conn)
+
+
+async def _asgi_request(app, method, path, body):
+    """Drive one request through the ASGI application; returns (latency, status, body)"""
+    path, _, query = path.partition('?')
+    payload = json.dumps(body).encode() if body is not None else b''
+    headers = [(b'host', b'localhost')]
+    if body is not None:
+        # Django only reads as much of the body as Content-Length announces
+        headers.append((b'content-type', b'application/json'))
+        headers.append((b'content-length', str(len(payload)).encode()))
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': method, 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'query_string': query.encode(), 'root_path': '', 'headers': headers,
+        'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+    }
+    pending = [{'type': 'http.request', 'body': payload, 'more_body': False}]
+    chunks = []
+    status = None
+
+    async def receive():
+        if pending:
+            return pending.pop()
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        elif message['type'] == 'http.response.body':
+            chunks.append(message.get('body', b''))
+
+    t0 = time.perf_counter()
+    await app(scope, receive, send)
+    return time.perf_counter() - t0, status, b''.join(chunks)
+
+
+def _expect_success(method, path, status, data=b''):
+    """Stop the run on an error response instead of timing it"""
+    if not 200 <= status < 300:
+        raise CommandError(f'{method} {path} returned {status}: {data[:200]!r}')
+
+
+def _created_meal_id(status, data):
+    if status != 201:
+        raise CommandError(f'POST /api/meals/ returned {status}, expected 201: {data[:200]!r}')
+    return json.loads(data)['meal']['id']
+
+
+class Command(BaseCommand):
+    help = 'Benchmark API endpoints in-process and over a real WSGI server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=['inproc', 'wsgi', 'asgi', 'both', 'all'], default='inproc',
+                            help="'both' runs inproc and wsgi; 'all' adds asgi")
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Measured requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=10,
+                            help='Unmeasured requests per endpoint before measuring')
+        parser.add_argument('--concurrency', type=int, default=1,
+                            help='Concurrent clients in wsgi and asgi modes')
+        parser.add_argument('--server-threads', type=int, default=32,
+                            help='Worker threads (and so DB connections) of the wsgi-mode server')
+        parser.add_argument('--endpoints', default='',
+                            help='Comma-separated endpoint names to run (default: all)')
+        parser.add_argument('--db-latency', type=float, default=0,
+                            help='Milliseconds added to every query, to simulate a remote database')
+        parser.add_argument('--dataset-days', type=int, default=0,
+                            help="Replace the demo user's data with this many days of synthetic history")
+        parser.add_argument('--meals-per-day', type=int, default=4)
+        parser.add_argument('--seed', type=int, default=42)
+        add_output_argument(parser)
+        parser.add_argument('--baseline', help='Compare against a previous JSON result')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed relative p95 slowdown before flagging a regression')
+
+    def handle(self, *args, **options):
+        user = get_demo_user()
+        if options['dataset_days']:
+            self._seed_dataset(user, options)
+        if options['db_latency']:
+            _simulate_db_latency(options['db_latency'] / 1000)
+
+        endpoints = self._endpoints(user)
+        if options['endpoints']:
+            wanted = set(options['endpoints'].split(','))
+            unknown = wanted - {name for name, *_ in endpoints}
+            if unknown:
+                raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+            endpoints = [endpoint for endpoint in endpoints if endpoint[0] in wanted]
+
+        report = {
+            'meta': {
+                'started_at': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'meals': Meal.objects.filter(user=user).count(),
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'db_latency_ms': options['db_latency'],
+                'server_threads': options['server_threads'],
+                'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+                'pool': bool(connection.settings_dict['OPTIONS'].get('pool')),
+            },
+            'results': {},
+        }
+
+        modes = {
+            'both': ['inproc', 'wsgi'],
+            'all': ['inproc', 'wsgi', 'asgi'],
+        }.get(options['mode'], [options['mode']])
+        for mode in modes:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{mode} mode'))
+            if mode == 'inproc':
+                results = self._run_inproc(user, endpoints, options)
+            elif mode == 'wsgi':
+                results = self._run_wsgi(endpoints, options)
+            else:
+                results = asyncio.run(self._run_asgi(endpoints, options))
+            for name, stats in results.items():
+                report['results'].setdefault(name, {})[mode] = stats
+                self._print_row(name, stats)
+
+        write_results(self, options['output'], report)
+
+        if options['baseline']:
+            self._compare(report, options['baseline'], options['tolerance'])
+
+    # Endpoint table: (name, method, path or callable, body)
+    def _endpoints(self, user):
+        meal = Meal.objects.filter(user=user).first()
+        medication = Medication.objects.filter(user=user).first()
+
+        endpoints = [
+            ('health_check', 'GET', '/api/health/', None),
+            ('openapi_spec', 'GET', '/api/openapi.yaml', None),
+            ('chat', 'POST', '/api/chat/', 'chat'),
+            ('async_chat', 'POST', '/api/async/chat/', 'chat'),
+            ('chat_history', 'GET', '/api/chat/history/?limit=20', None),
+            ('meals_list', 'GET', '/api/meals/?days=30', None),
+            ('meals_create_delete', 'POST', '/api/meals/', 'meal'),
+            ('medications_list', 'GET', '/api/medications/', None),
+            ('summary_today', 'GET', '/api/summary/?period=today', None),
+            ('summary_week', 'GET', '/api/summary/?period=week', None),
+            ('summary_month', 'GET', '/api/summary/?period=month', None),
+            ('user_profile', 'GET', '/api/profile/', None),
+            ('async_chat_history', 'GET', '/api/async/chat/history/?limit=20', None),
+            ('async_meals_list', 'GET', '/api/async/meals/?days=30', None),
+            ('async_summary_week', 'GET', '/api/async/summary/?period=week', None),
+            ('async_user_profile', 'GET', '/api/async/profile/', None),
+            ('privacy_policy', 'GET', '/api/privacy/', None),
+            ('process_message', 'CALL', None, 'chat'),
+        ]
+        if meal is not None:
+            endpoints.append(('meal_detail', 'GET', f'/api/meals/{meal.id}/', None))
+        if medication is not None:
+            endpoints.append(('medication_detail', 'GET', f'/api/medications/{medication.id}/', None))
+        return endpoints
+
+    def _body(self, kind, i):
+        if kind == 'chat':
+            return {'message': CHAT_MESSAGES[i % len(CHAT_MESSAGES)]}
+        if kind == 'meal':
+            return {'meal_name': 'Bench Meal', 'meal_time': 'snack', 'calories': 100, 'protein': 5}
+        return None
+
+    def _run_inproc(self, user, endpoints, options):
+        client = Client()
+        chatbot = HealthChatbot(user)
+        results = {}
+
+        for name, method, path, body_kind in endpoints:
+            latencies, queries = [], []
+            created = []
+            total = options['warmup'] + options['requests']
+            started = None
+
+            for i in range(total):
+                if i == options['warmup']:
+                    started = time.perf_counter()
+                body = self._body(body_kind, i)
+
+                with CaptureQueriesContext(connection) as captured:
+                    t0 = time.perf_counter()
+                    if method == 'CALL':
+                        chatbot.process_message(body['message'])
+                    elif method == 'POST':
+                        response = client.post(path, body, content_type='application/json')
+                    else:
+                        response = client.get(path)
+                        if getattr(response, 'streaming', False):
+                            b''.join(response.streaming_content)
+                    latency = time.perf_counter() - t0
+
+                if method != 'CALL':
+                    _expect_success(method, path, response.status_code,
+                                    b'' if getattr(response, 'streaming', False) else response.content)
+                if method == 'POST' and body_kind == 'meal':
+                    created.append(_created_meal_id(response.status_code, response.content))
+                if i >= options['warmup']:
+                    latencies.append(latency)
+                    queries.append(len(captured))
+
+            elapsed = time.perf_counter() - (started or time.perf_counter())
+            results[name] = summarise(latencies, elapsed, queries)
+
+            # Undo meal writes so each run sees the same dataset
+            for meal_id in created:
+                response = client.delete(f'/api/meals/{meal_id}/')
+                _expect_success('DELETE', f'/api/meals/{meal_id}/', response.status_code, response.content)
+
+        return results
+
+    def _run_wsgi(self, endpoints, options):
+        server = _PooledWSGIServer(('127.0.0.1', 0), _QuietHandler, options['server_threads'])
+        server.set_app(get_wsgi_application())
+        port = server.server_port
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        local = threading.local()
+
+        def send(method, path, body):
+            conn = getattr(local, 'conn', None)
+            if conn is None:
+                conn = local.conn = HTTPConnection('127.0.0.1', port)
+            headers = {}
+            payload = None
+            if body is not None:
+                payload = json.dumps(body)
+                headers['Content-Type'] = 'application/json'
+            t0 = time.perf_counter()
+            conn.request(method, path, body=payload, headers=headers)
+            response = conn.getresponse()
+            data = response.read()
+            latency = time.perf_counter() - t0
+            if response.getheader('Connection', '').lower() == 'close' or response.will_close:
+                conn.close()
+                local.conn = None
+            _expect_success(method, path, response.status, data)
+            return latency, response.status, data
+
+        results = {}
+        try:
+            for name, method, path, body_kind in endpoints:
+                if method == 'CALL':
+                    continue
+                for i in range(options['warmup']):
+                    self._wsgi_cleanup(send, body_kind, *send(method, path, self._body(body_kind, i)))
+
+                def one(i):
+                    latency, status, data = send(method, path, self._body(body_kind, i))
+                    self._wsgi_cleanup(send, body_kind, latency, status, data)
+                    return latency
+
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                    latencies = list(pool.map(one, range(options['requests'])))
+                elapsed = time.perf_counter() - started
+                results[name] = summarise(latencies, elapsed)
+        finally:
+            server.shutdown()
+            server.server_close()
+            connections.close_all()
+
+        return results
+
+    async def _run_asgi(self, endpoints, options):
+        """One event loop standing in for one ASGI worker process"""
+        app = get_asgi_application()
+        results = {}
+
+        async def request(method, path, body):
+            latency, status, data = await _asgi_request(app, method, path, body)
+            _expect_success(method, path, status, data)
+            return latency, status, data
+
+        async def cleanup(body_kind, status, data):
+            if body_kind == 'meal':
+                await request('DELETE', f'/api/meals/{_created_meal_id(status, data)}/', None)
+
+        for name, method, path, body_kind in endpoints:
+            if method == 'CALL':
+                continue
+            for i in range(options['warmup']):
+                _, status, data = await request(method, path, self._body(body_kind, i))
+                await cleanup(body_kind, status, data)
+
+            slots = asyncio.Semaphore(options['concurrency'])
+
+            async def one(i):
+                async with slots:
+                    latency, status, data = await request(method, path, self._body(body_kind, i))
+                    await cleanup(body_kind, status, data)
+                    return latency
+
+            started = time.perf_counter()
+            latencies = await asyncio.gather(*[one(i) for i in range(options['requests'])])
+            elapsed = time.perf_counter() - started
+            results[name] = summarise(latencies, elapsed)
+
+        return results
+
+    def _wsgi_cleanup(self, send, body_kind, latency, status, data):
+        if body_kind == 'meal':
+            send('DELETE', f'/api/meals/{_created_meal_id(status, data)}/', None)
+
+    def _seed_dataset(self, user, options):
+        self.stdout.write(f"Seeding {options['dataset_days']} days of synthetic history...")
+        synthetic.clear_user_data([user.id])
+        synthetic.generate_users(([user.id], 0, {
+            'seed': options['seed'],
+            'days': options['dataset_days'],
+            'meals_per_day': options['meals_per_day'],
+            'chats_per_day': 1,
+            'batch_size': 20000,
+            'copy': True,
+        }))
+        invalidate(user.id, MEALS, MEDICATIONS)
+
+    def _print_row(self, name, stats):
+        queries = f"  {stats['queries_per_request']:>5} q" if 'queries_per_request' in stats else ''
+        self.stdout.write(
+            f"  {name:<22} p50 {stats['p50_ms']:>8.2f}ms  p95 {stats['p95_ms']:>8.2f}ms  "
+            f"p99 {stats['p99_ms']:>8.2f}ms  {stats['throughput_rps']:>8} req/s{queries}"
+        )
+
+    def _compare(self, report, baseline_path, tolerance):
+        with open(baseline_path) as f:
+            baseline = json.load(f)['results']
+
+        regressions = []
+        for name, modes in report['results'].items():
+            for mode, stats in modes.items():
+                base = baseline.get(name, {}).get(mode)
+                if not base:
+                    continue
+                if stats['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+                    regressions.append(
+                        f"{name} [{mode}] p95 {base['p95_ms']:.2f}ms -> {stats['p95_ms']:.2f}ms"
+                    )
+                if stats.get('max_queries', 0) > base.get('max_queries', stats.get('max_queries', 0)):
+                    regressions.append(
+                        f"{name} [{mode}] queries {base['max_queries']} -> {stats['max_queries']}"
+                    )
+
+        if regressions:
+            for line in regressions:
+                self.stdout.write(self.style.ERROR(f'✗ {line}'))
+            raise CommandError(f'{len(regressions)} regression(s) against {baseline_path}')
+        self.stdout.write(self.style.SUCCESS(f'✓ No regressions against {baseline_path}'))
@@ -0,0 +1,106 @@
+"""
+Management command to measure chatbot conversation context
+Usage: python manage.py bench_conversations [--users 10000] [--iterations 200] [--output conversations.json]
+"""
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from health_chatbot.benchmarking import add_output_argument, summarise, time_queries, write_results
+from health_chatbot.cache import MEALS, generation
+from health_chatbot.chatbot import HealthChatbot
+from health_chatbot.conversations import MemoryConversationStore, conversation_store, encode_state
+from health_chatbot.users import get_demo_user
+
+
+# (question setting the context, follow-up, the follow-up asked in full)
+CONVERSATIONS = [
+    ("How many calories did I eat this week?", "What about protein?", "How much protein did I eat this week?"),
+    ("Show my meals today", "What about protein?", "How much protein did I eat today?"),
+    ("How many calories this month?", "And fat?", "How much fat did I eat this month?"),
+    ("Show my meals today", "And yesterday?", "Show my meals yesterday"),
+]
+
+
+class Command(BaseCommand):
+    help = 'Measure conversation state size per user and follow-up latency against full questions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000,
+                            help='Users whose states are stored for the memory measurement')
+        parser.add_argument('--iterations', type=int, default=200,
+                            help='Timed follow-ups (and full questions) per conversation')
+        add_output_argument(parser)
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['iterations'] < 1:
+            raise CommandError('--users and --iterations must be at least 1')
+
+        user = get_demo_user()
+        bot = HealthChatbot(user)
+        store = conversation_store()
+        results = {'memory': self._measure_memory(bot, options['users']), 'conversations': []}
+        self._print_memory(results['memory'])
+
+        for question, follow_up, full in CONVERSATIONS:
+            timings = {'follow_up': ([], []), 'full': ([], [])}
+            for _ in range(options['iterations']):
+                bot.process_message(question)
+                time_queries(lambda: bot.process_message(follow_up), *timings['follow_up'])
+                store.forget(user.pk)
+                time_queries(lambda: bot.process_message(full), *timings['full'])
+
+            row = {
+                'question': question,
+                'follow_up': follow_up,
+                'full': full,
+                'follow_up_stats': summarise(timings['follow_up'][0], sum(timings['follow_up'][0]),
+                                             timings['follow_up'][1]),
+                'full_stats': summarise(timings['full'][0], sum(timings['full'][0]), timings['full'][1]),
+            }
+            results['conversations'].append(row)
+            self._print_row(row)
+
+        write_results(self, options['output'], results)
+
+    def _measure_memory(self, bot, users):
+        """Fill a private store with real states for N users and measure what it holds"""
+        states = []
+        for question, _, _ in CONVERSATIONS:
+            bot.process_message(question)
+            states.append(encode_state(**conversation_store().load(bot.user.pk, generation(bot.user.pk, MEALS))))
+
+        store = MemoryConversationStore(users, settings.CONVERSATION_TTL)
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for user_id in range(users):
+            # Copy so every user holds its own bytes, as real traffic would
+            store._set(user_id, bytes(bytearray(states[user_id % len(states)])))
+        used = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+
+        per_user = used / users
+        return {
+            'users': users,
+            'state_bytes': [len(state) for state in states],
+            'max_state_bytes': settings.CONVERSATION_MAX_BYTES,
+            'store_bytes': used,
+            'bytes_per_user': round(per_user, 1),
+            'projected_bytes_at_max_users': round(per_user * settings.CONVERSATION_MAX_USERS),
+        }
+
+    def _print_memory(self, memory):
+        self.stdout.write(
+            f"  {memory['users']} states: {memory['store_bytes'] / 1024:.0f} KiB, "
+            f"{memory['bytes_per_user']:.0f} B/user (states {memory['state_bytes']} B, "
+            f"cap {memory['max_state_bytes']} B); at CONVERSATION_MAX_USERS "
+            f"{memory['projected_bytes_at_max_users'] / 1024 / 1024:.1f} MiB"
+        )
+
+    def _print_row(self, row):
+        follow_up, full = row['follow_up_stats'], row['full_stats']
+        self.stdout.write(
+            f"  {row['follow_up']!r:<24} p50 {follow_up['p50_ms']:>6.3f}ms ({follow_up['queries_per_request']} q)  "
+            f"vs {row['full']!r}: p50 {full['p50_ms']:>6.3f}ms ({full['queries_per_request']} q)"
+        )
@@ -0,0 +1,99 @@
+"""
+Management command to benchmark food catalog lookups
+Usage: python manage.py bench_foods [--foods 500000] [--lookups 2000] [--output foods.json]
+"""
+import random
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from health_chatbot import synthetic
+from health_chatbot.benchmarking import add_output_argument, summarise_us, time_calls, write_results
+from health_chatbot.foods import FoodIndex, match_portions, read_catalog
+
+
+# p99 budget for one lookup
+BUDGET_US = 1000
+
+
+class Command(BaseCommand):
+    help = 'Measure food name lookup latency (exact, prefix, misspelled, chat) against a large catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--foods', type=int, default=500000,
+                            help='Synthetic catalog size (indexed in memory; the database is not used)')
+        parser.add_argument('--lookups', type=int, default=2000,
+                            help='Timed lookups per kind')
+        parser.add_argument('--seed', type=int, default=42)
+        add_output_argument(parser)
+
+    def handle(self, *args, **options):
+        if options['foods'] < 1 or options['lookups'] < 1:
+            raise CommandError('--foods and --lookups must be at least 1')
+
+        self.stdout.write(f"Generating {options['foods']} foods...")
+        base = [row[0] for row in read_catalog(settings.FOOD_CATALOG_PATH)]
+        # The bundled catalog plus branded foods, as a deployment would load them
+        names = base + [row[0] for row in synthetic.food_rows(options['foods'], options['seed'])]
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        index = FoodIndex((food_id, name) for food_id, name in enumerate(names, start=1))
+        build_seconds = time.perf_counter() - t0
+        index_bytes = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        self.stdout.write(f'  Indexed in {build_seconds:.1f}s, {index_bytes / 1024 / 1024:.0f} MiB')
+
+        rng = random.Random(options['seed'])
+        queries = self._queries(rng, base, names, options['lookups'])
+        results = {
+            'exact': summarise_us(time_calls(index.match, queries['exact'])),
+            'prefix': summarise_us(time_calls(lambda query: index.search(query, 10), queries['prefix'])),
+            'misspelled': summarise_us(time_calls(lambda query: index.search(query, 10), queries['misspelled'])),
+            'multi_word': summarise_us(time_calls(lambda query: index.search(query, 10), queries['multi_word'])),
+            'chat': summarise_us(time_calls(lambda message: match_portions(message, index), queries['chat'])),
+        }
+
+        for name, stats in results.items():
+            verdict = 'ok' if stats['p99_us'] < BUDGET_US else f'over {BUDGET_US}µs'
+            self.stdout.write(
+                f"  {name:<12} p50 {stats['p50_us']:>8.1f}µs  p99 {stats['p99_us']:>8.1f}µs  ({verdict})"
+            )
+
+        write_results(self, options['output'], {
+            'foods': len(index),
+            'build_seconds': round(build_seconds, 2),
+            'index_bytes': index_bytes,
+            'examples': {kind: values[:5] for kind, values in queries.items()},
+            'results': results,
+        })
+
+    def _queries(self, rng, base, names, count):
+        """Lookups shaped like real traffic, drawn from the catalog's own words"""
+        base = [name.lower() for name in base]
+        words = [word for name in base for word in name.split() if len(word) > 3]
+        # Bundled catalog names can be a single word; only synthetic ones carry a brand
+        branded = [name.lower().split() for name in names if ' ' in name]
+
+        def misspell(word):
+            cut = rng.randrange(1, len(word))
+            return word[:cut] + word[cut + 1:]
+
+        def multi_word():
+            brand, *rest = rng.choice(branded)
+            return f'{brand} {rest[-1][:rng.randint(2, len(rest[-1]))]}'
+
+        def chat():
+            first, second = rng.sample(base, 2)
+            return f'log {rng.randint(1, 3)} {first} and {second} for lunch'
+
+        return {
+            'exact': [rng.choice(base) for _ in range(count)],
+            'prefix': [(lambda word: word[:rng.randint(2, len(word))])(rng.choice(words)) for _ in range(count)],
+            'misspelled': [misspell(rng.choice(words)) for _ in range(count)],
+            'multi_word': [multi_word() for _ in range(count)],
+            'chat': [chat() for _ in range(count)],
+        }
@@ -0,0 +1,71 @@
+"""
+Management command to micro-benchmark chat message parsing
+Usage: python manage.py bench_parsing [--iterations 20000] [--output parsing.json]
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from health_chatbot.benchmarking import add_output_argument, summarise_us, time_calls, write_results
+from health_chatbot.chatbot import HealthChatbot
+from health_chatbot.conversations import conversation_store
+from health_chatbot.dateranges import parse_range
+from health_chatbot.intents import classify
+from health_chatbot.users import get_demo_user
+
+
+MESSAGES = [
+    "What did I eat today?",
+    "How many calories have I consumed this week?",
+    "Show me my protein intake for the last 3 days",
+    "How much fiber did I eat since Monday?",
+    "What meals did I have on March 2nd?",
+    "Nutrition for the past 2 weeks",
+    "Show my meals from 3 days ago",
+    "Am I meeting my goals?",
+    "Show me my medications",
+    "Hello! Can you help me figure out what I should be eating to hit my protein target this month?",
+]
+
+
+class Command(BaseCommand):
+    help = 'Time intent classification and date range extraction per message against a whole chat reply'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000,
+                            help='Parses timed per message')
+        add_output_argument(parser)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        if iterations < 1:
+            raise CommandError('--iterations must be at least 1')
+
+        today = timezone.now().date()
+        lowered = [message.lower() for message in MESSAGES]
+        results = {
+            'classify': self._time(lambda message: classify(message), lowered, iterations),
+            'parse_range': self._time(lambda message: parse_range(message, today), lowered, iterations),
+        }
+
+        # Whole replies (read handlers warm in the response cache), for scale
+        user = get_demo_user()
+        bot = HealthChatbot(user)
+        for message in MESSAGES:
+            bot.process_message(message)
+
+        def reply(message):
+            conversation_store().forget(user.pk)
+            bot.process_message(message)
+
+        results['process_message'] = self._time(reply, MESSAGES, max(1, iterations // 100))
+
+        for name, stats in results.items():
+            self.stdout.write(f"  {name:<16} p50 {stats['p50_us']:>9.2f}µs  p99 {stats['p99_us']:>9.2f}µs")
+        share = results['parse_range']['p50_us'] / results['process_message']['p50_us'] * 100
+        self.stdout.write(f'  parse_range is {share:.2f}% of a reply (p50)')
+
+        write_results(self, options['output'], {'iterations': iterations, 'messages': MESSAGES, 'results': results})
+
+    def _time(self, func, messages, iterations):
+        """Per-call latencies, each message ``iterations`` times in turn"""
+        return summarise_us(time_calls(func, messages * iterations))
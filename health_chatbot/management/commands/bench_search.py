@@ -0,0 +1,82 @@
+"""
+Management command to benchmark meal search and autocomplete over synthetic users
+Usage: python manage.py bench_search [--users 200] [--queries 20] [--output search.json]
+"""
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, router
+
+from health_chatbot import search, synthetic
+from health_chatbot.benchmarking import add_output_argument, summarise, time_queries, write_results
+from health_chatbot.models import Meal, UserProfile
+
+
+def _search_terms(rng):
+    """A word from a synthetic meal name, sometimes with a typo"""
+    name = rng.choice(synthetic.MEAL_TEMPLATES)[0]
+    word = rng.choice([word for word in search.normalise(name).split() if len(word) > 3] or [name.lower()])
+    if rng.random() < 0.3:
+        # Drop one letter ("chiken")
+        cut = rng.randrange(1, len(word))
+        word = word[:cut] + word[cut + 1:]
+    return word
+
+
+class Command(BaseCommand):
+    help = 'Measure meal search and autocomplete latency (first query per user and repeat queries)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200,
+                            help='Synthetic users searched (load them first with load_demo_data --users N)')
+        parser.add_argument('--queries', type=int, default=20,
+                            help='Searches and autocompletes timed per user')
+        parser.add_argument('--limit', type=int, default=20, help='Results per search')
+        parser.add_argument('--seed', type=int, default=42)
+        add_output_argument(parser)
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['queries'] < 1:
+            raise CommandError('--users and --queries must be at least 1')
+
+        users = list(
+            UserProfile.objects.filter(email__endswith='@' + synthetic.SYNTHETIC_DOMAIN)
+            .order_by('id')[:options['users']]
+        )
+        if not users:
+            raise CommandError('No synthetic users; run load_demo_data --users N first')
+
+        rng = random.Random(options['seed'])
+        limit = options['limit']
+        timings = {name: ([], []) for name in ('search_first', 'search', 'autocomplete')}
+        search._indexes.clear()
+
+        for user in users:
+            time_queries(lambda: search.search_meals(user, _search_terms(rng), limit), *timings['search_first'])
+            for _ in range(options['queries']):
+                time_queries(lambda: search.search_meals(user, _search_terms(rng), limit), *timings['search'])
+                prefix = _search_terms(rng)[:rng.randint(1, 4)]
+                time_queries(lambda: search.suggest_meals(user, prefix, limit), *timings['autocomplete'])
+
+        results = {
+            'database': connection.vendor,
+            'trigram_indexes': search._uses_trigram_indexes(),
+            'users': len(users),
+            'meals': Meal.objects.using(router.db_for_read(Meal)).count(),
+            'results': {
+                name: summarise(latencies, sum(latencies), queries)
+                for name, (latencies, queries) in timings.items()
+            },
+        }
+
+        self.stdout.write(
+            f"  {results['meals']} meals, {results['users']} users searched "
+            f"({'pg_trgm indexes' if results['trigram_indexes'] else 'in-process index'})"
+        )
+        for name, stats in results['results'].items():
+            self.stdout.write(
+                f"  {name:<14} p50 {stats['p50_ms']:>7.3f}ms  p95 {stats['p95_ms']:>7.3f}ms  "
+                f"({stats['queries_per_request']} q)"
+            )
+
+        write_results(self, options['output'], results)
@@ -0,0 +1,94 @@
+"""
+Management command to load-test API key -> user resolution
+Usage: python manage.py bench_users [--users 50000] [--lookups 2000] [--output users.json]
+"""
+import random
+import secrets
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from health_chatbot import synthetic
+from health_chatbot.benchmarking import (
+    add_output_argument, summarise, summarise_us, time_calls, time_queries, write_results,
+)
+from health_chatbot.models import ApiKey
+from health_chatbot.users import API_KEY_PREFIX, get_key_user, hash_api_key, invalidate_user
+
+
+BENCH_KEY_NAME = 'bench_users'
+
+
+class Command(BaseCommand):
+    help = 'Measure per-request user lookup cost as the number of users with API keys grows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50000,
+                            help='Synthetic users (each gets one API key)')
+        parser.add_argument('--steps', default='',
+                            help='Comma-separated user counts to measure at (default: 1%%, 10%%, 100%%)')
+        parser.add_argument('--lookups', type=int, default=2000,
+                            help='Distinct keys resolved per step')
+        parser.add_argument('--seed', type=int, default=42)
+        add_output_argument(parser)
+
+    def handle(self, *args, **options):
+        total = options['users']
+        if total < 1:
+            raise CommandError('--users must be at least 1')
+        steps = sorted({int(step) for step in options['steps'].split(',') if step} or
+                       {max(1, total // 100), max(1, total // 10), total})
+        if steps[-1] > total:
+            raise CommandError('--steps must not exceed --users')
+
+        self.stdout.write(f'Issuing API keys for {total} synthetic users...')
+        keys = self._issue_keys(synthetic.ensure_users(total))
+        rng = random.Random(options['seed'])
+        client = Client()
+        results = {}
+
+        for step in steps:
+            sample = rng.sample(keys[:step], min(options['lookups'], step))
+
+            # Cold: every lookup misses the process cache and hits the index
+            invalidate_user()
+            cold, queries = [], []
+            for key in sample:
+                time_queries(lambda: get_key_user(key), cold, queries)
+
+            # Warm: the same keys again, now served from the LRU
+            warm = time_calls(get_key_user, sample)
+
+            # Whole request through the middleware stack, warm cache
+            request = time_calls(lambda key: client.get('/api/health/', HTTP_X_API_KEY=key), sample[:200])
+
+            results[step] = {
+                'cold': summarise(cold, sum(cold), queries),
+                'warm': summarise_us(warm),
+                'request': summarise(request, sum(request)),
+            }
+            self._print_row(step, results[step])
+
+        write_results(self, options['output'], {'users': total, 'lookups': options['lookups'], 'results': results})
+
+    def _issue_keys(self, user_ids):
+        """One fresh key per user, replacing keys from previous runs; returns the keys in user order"""
+        ApiKey.objects.filter(user_id__in=user_ids, name=BENCH_KEY_NAME).delete()
+        keys = [API_KEY_PREFIX + secrets.token_urlsafe(32) for _ in user_ids]
+        ApiKey.objects.bulk_create(
+            [
+                ApiKey(user_id=user_id, name=BENCH_KEY_NAME, prefix=key[:len(API_KEY_PREFIX) + 6],
+                       key_hash=hash_api_key(key))
+                for user_id, key in zip(user_ids, keys)
+            ],
+            batch_size=5000,
+        )
+        return keys
+
+    def _print_row(self, users, stats):
+        cold, warm, request = stats['cold'], stats['warm'], stats['request']
+        self.stdout.write(
+            f"  {users:>8} users  cold p50 {cold['p50_ms']:>6.3f}ms p99 {cold['p99_ms']:>6.3f}ms "
+            f"({cold['queries_per_request']} q)  warm p50 {warm['p50_us']:>5.1f}µs "
+            f"p99 {warm['p99_us']:>5.1f}µs  request p50 {request['p50_ms']:>6.3f}ms"
+        )
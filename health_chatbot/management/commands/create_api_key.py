@@ -0,0 +1,40 @@
+"""
+Management command to issue an API key
+Usage: python manage.py create_api_key user@example.com [--name "Custom GPT"] [--create-user]
+"""
+from django.core.management.base import BaseCommand, CommandError
+from health_chatbot.models import UserProfile
+from health_chatbot.users import create_api_key
+
+
+class Command(BaseCommand):
+    help = 'Issue an API key for a user (the key is shown once)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='Email of the user the key acts as')
+        parser.add_argument('--name', default='', help='Label to tell the key apart')
+        parser.add_argument('--create-user', action='store_true',
+                            help='Create the user if there is none with this email')
+
+    def handle(self, *args, **options):
+        email = options['email']
+        if options['create_user']:
+            user, created = UserProfile.objects.get_or_create(
+                email=email,
+                defaults={'name': email.split('@')[0]},
+            )
+            if created:
+                self.stdout.write(self.style.SUCCESS(f'✓ Created user {email}'))
+        else:
+            try:
+                user = UserProfile.objects.get(email=email)
+            except UserProfile.DoesNotExist:
+                raise CommandError(f'No user with email {email} (use --create-user)')
+
+        api_key, key = create_api_key(user, options['name'])
+        self.stdout.write(self.style.SUCCESS(f'✓ Created API key {api_key.prefix}… for {email}'))
+        self.stdout.write('')
+        self.stdout.write(key)
+        self.stdout.write('')
+        self.stdout.write('Send it as "Authorization: Bearer <key>" or "X-API-Key: <key>". '
+                          'It is not stored and cannot be shown again.')
@@ -0,0 +1,134 @@
+"""
+Management command to check that hot queries use the access-path indexes
+Usage: python manage.py explain_queries [--seed-meals 1000000] [--seed-users 1000]
+"""
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from health_chatbot.models import UserProfile, Meal, Medication, ChatMessage, DailyNutritionRollup
+from health_chatbot.rollups import rebuild_rollups
+
+
+SEED_DOMAIN = 'explain.biorhyme.health'
+
+
+class Command(BaseCommand):
+    help = 'Run EXPLAIN on the hot meal, medication and chat queries and check index usage'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed-meals', type=int, default=0,
+                            help='Seed this many synthetic meals before explaining')
+        parser.add_argument('--seed-users', type=int, default=1000,
+                            help='Spread seeded meals across this many users')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--drop-seed', action='store_true',
+                            help='Delete previously seeded users and exit')
+
+    def handle(self, *args, **options):
+        if options['drop_seed']:
+            deleted, _ = UserProfile.objects.filter(email__endswith='@' + SEED_DOMAIN).delete()
+            self.stdout.write(self.style.SUCCESS(f'✓ Deleted {deleted} seeded rows'))
+            return
+
+        if options['seed_meals']:
+            self._seed(options['seed_meals'], options['seed_users'], options['batch_size'])
+
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE meals; ANALYZE daily_nutrition_rollups; '
+                               'ANALYZE medications; ANALYZE chat_messages')
+
+        user = (
+            UserProfile.objects.filter(email__endswith='@' + SEED_DOMAIN).first()
+            or UserProfile.objects.first()
+        )
+        if user is None:
+            self.stdout.write(self.style.WARNING('No users found. Run with --seed-meals first.'))
+            return
+
+        week_ago = timezone.now().date() - timedelta(days=7)
+        checks = [
+            ('meals in date window', 'meals_user_date_idx',
+             Meal.objects.filter(user=user, date__gte=week_ago)),
+            # SQLite names a unique constraint's index itself
+            ('nutrition rollups in date window', ('unique_rollup_per_user_day', 'sqlite_autoindex_daily_nutrition_rollups'),
+             DailyNutritionRollup.objects.filter(user=user, date__gte=week_ago)),
+            ('active medications', 'medications_active_idx',
+             Medication.objects.filter(user=user, is_active=True)),
+            ('chat history', 'chat_user_created_idx',
+             ChatMessage.objects.filter(user=user)[:10]),
+        ]
+
+        failures = 0
+        for label, index_names, queryset in checks:
+            if isinstance(index_names, str):
+                index_names = (index_names,)
+            index_name = index_names[0]
+            plan = queryset.explain()
+            used = any(name in plan for name in index_names)
+            failures += not used
+            style = self.style.SUCCESS if used else self.style.ERROR
+            self.stdout.write(style(f"{'✓' if used else '✗'} {label}: {index_name}"))
+            self.stdout.write(plan)
+            self.stdout.write('')
+
+        if failures:
+            self.stdout.write(self.style.ERROR(f'{failures} queries did not use their index'))
+        else:
+            self.stdout.write(self.style.SUCCESS('All hot queries use their indexes'))
+
+    def _seed(self, total_meals, num_users, batch_size):
+        self.stdout.write(f'Seeding {total_meals} meals across {num_users} users...')
+        started = time.monotonic()
+        rng = random.Random(42)
+        today = timezone.now().date()
+
+        UserProfile.objects.bulk_create(
+            [UserProfile(email=f'user{i}@{SEED_DOMAIN}', name=f'Explain User {i}')
+             for i in range(num_users)],
+            ignore_conflicts=True,
+        )
+        user_ids = list(
+            UserProfile.objects.filter(email__endswith='@' + SEED_DOMAIN).values_list('id', flat=True)
+        )
+
+        meal_times = [choice for choice, _ in Meal.MEAL_TIMES]
+        created = 0
+        while created < total_meals:
+            size = min(batch_size, total_meals - created)
+            Meal.objects.bulk_create([
+                Meal(
+                    user_id=rng.choice(user_ids),
+                    meal_name='Seeded Meal',
+                    meal_time=rng.choice(meal_times),
+                    calories=rng.uniform(100, 900),
+                    protein=rng.uniform(0, 60),
+                    carbs=rng.uniform(0, 120),
+                    fat=rng.uniform(0, 40),
+                    fiber=rng.uniform(0, 15),
+                    date=today - timedelta(days=rng.randrange(3650)),
+                )
+                for _ in range(size)
+            ])
+            created += size
+
+        # Bulk-created meals skip the per-write rollup updates; summaries read the rollups
+        rollups = rebuild_rollups()
+
+        Medication.objects.bulk_create([
+            Medication(user_id=user_id, drug_name='Seeded Drug', dosage='10mg',
+                       frequency='once_daily', is_active=rng.random() < 0.5)
+            for user_id in user_ids for _ in range(3)
+        ])
+        ChatMessage.objects.bulk_create([
+            ChatMessage(user_id=user_id, user_message='hello', bot_response='hi')
+            for user_id in user_ids for _ in range(20)
+        ])
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'✓ Seeded {created} meals ({rollups} daily rollups) in {elapsed:.1f}s'))
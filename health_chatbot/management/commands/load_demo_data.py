@@ -1,17 +1,44 @@
 """
 Management command to load demo data
 Usage: python manage.py load_demo_data
+       python manage.py load_demo_data --users 10000 --days 365 --meals-per-day 4 --seed 42
 """
-from django.core.management.base import BaseCommand
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
 from django.utils import timezone
 from datetime import timedelta
 from health_chatbot.models import UserProfile, Meal, Medication
+from health_chatbot.rollups import rebuild_rollups
+from health_chatbot.cache import invalidate, MEALS, MEDICATIONS
+from health_chatbot import synthetic
 
 
 class Command(BaseCommand):
-    help = 'Load demo data for testing'
+    help = 'Load demo data for testing, or generate synthetic users for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=0,
+                            help='Generate this many synthetic users instead of the demo user')
+        parser.add_argument('--days', type=int, default=30,
+                            help='Days of history per synthetic user')
+        parser.add_argument('--meals-per-day', type=int, default=3)
+        parser.add_argument('--chats-per-day', type=int, default=1)
+        parser.add_argument('--seed', type=int, default=42,
+                            help='Random seed; the same seed reproduces the same data')
+        parser.add_argument('--batch-size', type=int, default=20000,
+                            help='Meals buffered per insert batch')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Worker processes (use 1 on SQLite)')
+        parser.add_argument('--no-copy', action='store_true',
+                            help='Use bulk_create even on PostgreSQL')
 
     def handle(self, *args, **options):
+        if options['users']:
+            return self._load_synthetic(options)
+
         self.stdout.write('Loading demo data...')
 
         # Create demo user
@@ -203,6 +230,8 @@ class Command(BaseCommand):
 
         self.stdout.write(self.style.SUCCESS(f'✓ Created {meals_created} meals'))
 
+        rebuild_rollups(user)
+
         # Create medications
         medications_data = [
             {
@@ -236,6 +265,8 @@ class Command(BaseCommand):
 
         self.stdout.write(self.style.SUCCESS(f'✓ Created {meds_created} medications'))
 
+        invalidate(user.pk, MEALS, MEDICATIONS)
+
         # Summary
         self.stdout.write('')
         self.stdout.write(self.style.SUCCESS('Demo data loaded successfully!'))
@@ -246,3 +277,67 @@ class Command(BaseCommand):
         self.stdout.write('')
         self.stdout.write('You can now test the chatbot!')
         self.stdout.write('Try: "What did I eat today?"')
+
+    def _load_synthetic(self, options):
+        """Generate reproducible synthetic users, meals, medications and chats"""
+        if options['days'] < 1 or options['workers'] < 1:
+            raise CommandError('--days and --workers must be at least 1')
+
+        workers = options['workers']
+        if connection.vendor == 'sqlite' and workers > 1:
+            self.stdout.write(self.style.WARNING('SQLite allows one writer at a time; using 1 worker'))
+            workers = 1
+
+        started = time.monotonic()
+        total_meals = options['users'] * options['days'] * options['meals_per_day']
+        self.stdout.write(
+            f"Generating {options['users']} users, {total_meals} meals "
+            f"with {workers} worker(s)..."
+        )
+
+        user_ids = synthetic.ensure_users(options['users'])
+        synthetic.clear_user_data(user_ids)
+
+        job_options = {
+            'seed': options['seed'],
+            'days': options['days'],
+            'meals_per_day': options['meals_per_day'],
+            'chats_per_day': options['chats_per_day'],
+            'batch_size': options['batch_size'],
+            'copy': not options['no_copy'],
+        }
+        per_job = max(1, -(-len(user_ids) // (workers * 4)))
+        jobs = [
+            (user_ids[start:start + per_job], start, job_options)
+            for start in range(0, len(user_ids), per_job)
+        ]
+
+        totals = {'meals': 0, 'medications': 0, 'chats': 0}
+        if workers == 1:
+            results = map(synthetic.generate_users, jobs)
+            pool = None
+        else:
+            # Forked workers must not share the parent's connection
+            connections.close_all()
+            pool = multiprocessing.get_context('fork').Pool(workers)
+            results = pool.imap_unordered(synthetic.generate_users, jobs)
+
+        try:
+            for done, counts in enumerate(results, 1):
+                for key in totals:
+                    totals[key] += counts[key]
+                self.stdout.write(f'  {done}/{len(jobs)} batches, {totals["meals"]} meals')
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        for user_id in user_ids:
+            invalidate(user_id, MEALS, MEDICATIONS)
+
+        elapsed = time.monotonic() - started
+        rate = totals['meals'] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ Created {totals['meals']} meals, {totals['medications']} medications, "
+            f"{totals['chats']} chat messages in {elapsed:.1f}s ({rate:.0f} meals/s)"
+        ))
@@ -0,0 +1,65 @@
+"""
+Management command to load the food catalog
+Usage: python manage.py load_foods [path/to/foods.csv|foods.json] [--replace]
+       python manage.py load_foods --synthetic 500000 --seed 42
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from health_chatbot import synthetic
+from health_chatbot.foods import catalog_changed, load_catalog, read_catalog
+from health_chatbot.models import Food
+
+
+class Command(BaseCommand):
+    help = 'Load (insert or update by name) foods from a CSV/JSON catalog, or a synthetic catalog for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=settings.FOOD_CATALOG_PATH,
+                            help='CSV (name,serving,calories,protein,carbs,fat,fiber) or JSON list '
+                                 '(default: FOOD_CATALOG_PATH, the bundled catalog)')
+        parser.add_argument('--synthetic', type=int, default=0,
+                            help='Load this many generated foods instead of a file')
+        parser.add_argument('--seed', type=int, default=42,
+                            help='Random seed for --synthetic')
+        parser.add_argument('--replace', action='store_true',
+                            help='Delete the current catalog first (logged meals are unaffected)')
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help='Foods per insert statement')
+        parser.add_argument('--no-copy', action='store_true',
+                            help='Use bulk_create even on PostgreSQL')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        if options['synthetic']:
+            rows = synthetic.food_rows(options['synthetic'], options['seed'])
+            source = f"{options['synthetic']} synthetic foods"
+        else:
+            rows = read_catalog(options['path'])
+            source = options['path']
+
+        try:
+            # Read (and validate) everything before touching the catalog
+            rows = list(rows)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        if options['replace']:
+            deleted, _ = Food.objects.all().delete()
+            catalog_changed()
+            self.stdout.write(f'  Deleted {deleted} foods')
+
+        copy = not options['no_copy'] and synthetic.use_copy()
+        started = time.perf_counter()
+        count = load_catalog(rows, options['batch_size'], copy)
+
+        elapsed = time.perf_counter() - started
+        rate = count / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Loaded {count} foods from {source} in {elapsed:.1f}s ({rate:.0f} foods/s, '
+            f"{'COPY' if copy else 'bulk_create'})"
+        ))
@@ -0,0 +1,26 @@
+"""
+Management command to rebuild daily nutrition rollups from raw meals
+Usage: python manage.py rebuild_nutrition_rollups [--email user@example.com]
+"""
+from django.core.management.base import BaseCommand, CommandError
+from health_chatbot.models import UserProfile
+from health_chatbot.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild daily nutrition rollups from meals'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', help='Only rebuild rollups for this user')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['email']:
+            try:
+                user = UserProfile.objects.get(email=options['email'])
+            except UserProfile.DoesNotExist:
+                raise CommandError(f"No user with email {options['email']}")
+
+        self.stdout.write('Rebuilding nutrition rollups...')
+        count = rebuild_rollups(user)
+        self.stdout.write(self.style.SUCCESS(f'✓ Wrote {count} daily rollups'))
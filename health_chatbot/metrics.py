@@ -0,0 +1,177 @@
+"""
+Request metrics
+Per-request timings (DB, serializer, chatbot) collected through a context
+variable, plus process-wide histograms rendered in Prometheus text format
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+# Histogram bucket upper bounds
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_current = ContextVar('health_request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Timings collected while handling one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings = {}
+        self.queries = 0
+        self.intent = None
+
+    def add(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def server_timing(self, total):
+        """Render a Server-Timing header value (durations in milliseconds)"""
+        parts = [f'total;dur={total * 1000:.1f}']
+        db = self.timings.get('db', 0.0)
+        parts.append(f'db;dur={db * 1000:.1f};desc="{self.queries} queries"')
+        for name in ('serializer', 'chatbot'):
+            if name in self.timings:
+                parts.append(f'{name};dur={self.timings[name] * 1000:.1f}')
+        return ', '.join(parts)
+
+
+def start_request():
+    """Begin collecting metrics for the current request; returns (metrics, token)"""
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+@contextmanager
+def timed(name):
+    """Add the block's duration to the current request's timings (no-op outside a request)"""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(name, time.perf_counter() - started)
+
+
+def record_intent(intent):
+    """Note which chatbot intent handled the current request"""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.intent = intent
+
+
+def db_execute_wrapper(execute, sql, params, many, context):
+    """connection.execute_wrapper hook counting and timing queries"""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add('db', time.perf_counter() - started)
+        metrics.queries += 1
+
+
+def _instrument(sender, connection, **kwargs):
+    if db_execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(db_execute_wrapper)
+
+
+def install_db_instrumentation():
+    """
+    Hook db_execute_wrapper into every database connection, including ones
+    opened later in other threads (the async ORM runs queries off the event
+    loop thread). It is a no-op outside an instrumented request.
+    """
+    connection_created.connect(_instrument, dispatch_uid='health_chatbot.metrics')
+    for conn in connections.all(initialized_only=True):
+        _instrument(None, conn)
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a label tuple"""
+
+    def __init__(self, name, help_text, label_names, buckets=SECONDS_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series['buckets'][i] += 1
+        series['sum'] += value
+        series['count'] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for labels, series in sorted(self.series.items()):
+            label_text = ','.join(
+                f'{key}="{_escape(value)}"' for key, value in zip(self.label_names, labels)
+            )
+            prefix = label_text + ',' if label_text else ''
+            suffix = f'{{{label_text}}}' if label_text else ''
+            for bound, count in zip(self.buckets, series['buckets']):
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {series["count"]}')
+            lines.append(f'{self.name}_sum{suffix} {series["sum"]:.6f}')
+            lines.append(f'{self.name}_count{suffix} {series["count"]}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+_lock = threading.Lock()
+REQUEST_DURATION = Histogram(
+    'health_request_duration_seconds', 'Request wall time by route', ('route', 'method'))
+REQUEST_DB_DURATION = Histogram(
+    'health_request_db_seconds', 'Time spent in database queries per request by route', ('route',))
+REQUEST_QUERIES = Histogram(
+    'health_request_queries', 'Database queries per request by route', ('route',), QUERY_BUCKETS)
+SERIALIZER_DURATION = Histogram(
+    'health_serializer_seconds', 'Serializer time per request by route', ('route',))
+CHATBOT_DURATION = Histogram(
+    'health_chatbot_handler_seconds', 'Chatbot handler time by intent', ('intent',))
+
+
+def observe_request(route, method, total, metrics):
+    """Fold one finished request into the process-wide histograms"""
+    with _lock:
+        REQUEST_DURATION.observe((route, method), total)
+        REQUEST_DB_DURATION.observe((route,), metrics.timings.get('db', 0.0))
+        REQUEST_QUERIES.observe((route,), metrics.queries)
+        if 'serializer' in metrics.timings:
+            SERIALIZER_DURATION.observe((route,), metrics.timings['serializer'])
+        if metrics.intent is not None:
+            CHATBOT_DURATION.observe((metrics.intent,), metrics.timings.get('chatbot', 0.0))
+
+
+def render_prometheus():
+    """All histograms in Prometheus text exposition format"""
+    with _lock:
+        lines = []
+        for histogram in (REQUEST_DURATION, REQUEST_DB_DURATION, REQUEST_QUERIES,
+                          SERIALIZER_DURATION, CHATBOT_DURATION):
+            lines.extend(histogram.render())
+    return '\n'.join(lines) + '\n'
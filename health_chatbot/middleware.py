@@ -0,0 +1,153 @@
+"""
+Middleware for Health Chatbot API
+All classes are sync and async capable, so async views run without a
+thread hop per middleware under ASGI
+"""
+import cProfile
+import os
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+from django.utils import timezone
+
+from . import metrics
+from .users import aget_key_user, get_key_user, request_api_key
+
+
+class ApiKeyMiddleware:
+    """
+    Serve a request carrying an API key as the key's owner; an unknown or
+    revoked key gets a 401. Requests without a key fall back to the demo user,
+    unless API_KEY_REQUIRED is set (paths in API_KEY_EXEMPT_PATHS excepted).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        key = request_api_key(request)
+        if key is None:
+            return self._anonymous(request) or self.get_response(request)
+
+        user = get_key_user(key)
+        if user is None:
+            return _unauthorized('Invalid API key')
+        request._cached_profile = user
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        key = request_api_key(request)
+        if key is None:
+            return self._anonymous(request) or await self.get_response(request)
+
+        user = await aget_key_user(key)
+        if user is None:
+            return _unauthorized('Invalid API key')
+        request._cached_profile = user
+        return await self.get_response(request)
+
+    def _anonymous(self, request):
+        """401 for a keyless request when keys are required, else None"""
+        if not settings.API_KEY_REQUIRED:
+            return None
+        if request.path.startswith(tuple(settings.API_KEY_EXEMPT_PATHS)):
+            return None
+        return _unauthorized('API key required')
+
+
+def _unauthorized(message):
+    response = JsonResponse({'error': message}, status=401)
+    response['WWW-Authenticate'] = 'Bearer'
+    return response
+
+
+class MetricsMiddleware:
+    """
+    Opt-in (METRICS_ENABLED) per-request instrumentation.
+
+    Records wall time, DB query count and time, serializer time and chatbot
+    handler time; returns them in a Server-Timing header and folds them into
+    the histograms served by /api/metrics/. A request carrying
+    ``X-Profile: <PROFILE_TOKEN>`` (or picked by PROFILE_SAMPLE_RATE) is also
+    run under cProfile and the stats written to PROFILE_DIR.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        metrics.install_db_instrumentation()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        request_metrics, token = metrics.start_request()
+        profiler = self._profiler(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            metrics.end_request(token)
+        return self._finish(request, response, request_metrics, profiler)
+
+    async def __acall__(self, request):
+        request_metrics, token = metrics.start_request()
+        profiler = self._profiler(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            metrics.end_request(token)
+        return self._finish(request, response, request_metrics, profiler)
+
+    def _profiler(self, request):
+        if not self._should_profile(request):
+            return None
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def _finish(self, request, response, request_metrics, profiler):
+        total = time.perf_counter() - request_metrics.started
+        match = getattr(request, 'resolver_match', None)
+        route = match.view_name if match else 'unmatched'
+        metrics.observe_request(route, request.method, total, request_metrics)
+        response['Server-Timing'] = request_metrics.server_timing(total)
+
+        if profiler is not None:
+            self._dump_profile(profiler, route)
+        return response
+
+    def _should_profile(self, request):
+        if not settings.PROFILE_DIR:
+            return False
+        token = settings.PROFILE_TOKEN
+        if token and request.headers.get('X-Profile') == token:
+            return True
+        return random.random() < settings.PROFILE_SAMPLE_RATE
+
+    def _dump_profile(self, profiler, route):
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        stamp = timezone.now().strftime('%Y%m%dT%H%M%S%f')
+        name = route.replace(':', '_').replace('/', '_')
+        profiler.dump_stats(os.path.join(settings.PROFILE_DIR, f'{stamp}-{name}.prof'))
@@ -0,0 +1,90 @@
+# Generated by Django 4.2.11 on 2026-10-17 05:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+import health_chatbot.models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=254, unique=True)),
+                ('name', models.CharField(default='Demo User', max_length=100)),
+                ('age', models.IntegerField(blank=True, null=True)),
+                ('daily_calorie_goal', models.FloatField(default=2000)),
+                ('daily_protein_goal', models.FloatField(default=150)),
+                ('daily_carbs_goal', models.FloatField(default=250)),
+                ('daily_fat_goal', models.FloatField(default=65)),
+                ('daily_fiber_goal', models.FloatField(default=30)),
+                ('health_conditions', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'user_profiles',
+            },
+        ),
+        migrations.CreateModel(
+            name='Medication',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('drug_name', models.CharField(max_length=200)),
+                ('dosage', models.CharField(max_length=100)),
+                ('frequency', models.CharField(choices=[('once_daily', 'Once Daily'), ('twice_daily', 'Twice Daily'), ('three_times_daily', 'Three Times Daily'), ('as_needed', 'As Needed')], max_length=50)),
+                ('started_date', models.DateField(default=health_chatbot.models.get_current_date)),
+                ('notes', models.TextField(blank=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='medications', to='health_chatbot.userprofile')),
+            ],
+            options={
+                'db_table': 'medications',
+                'ordering': ['-is_active', 'drug_name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Meal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('meal_name', models.CharField(max_length=200)),
+                ('meal_time', models.CharField(choices=[('breakfast', 'Breakfast'), ('lunch', 'Lunch'), ('dinner', 'Dinner'), ('snack', 'Snack')], default='breakfast', max_length=20)),
+                ('calories', models.FloatField(default=0)),
+                ('protein', models.FloatField(default=0)),
+                ('carbs', models.FloatField(default=0)),
+                ('fat', models.FloatField(default=0)),
+                ('fiber', models.FloatField(default=0)),
+                ('date', models.DateField(default=health_chatbot.models.get_current_date)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('notes', models.TextField(blank=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='meals', to='health_chatbot.userprofile')),
+            ],
+            options={
+                'db_table': 'meals',
+                'ordering': ['-date', '-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ChatMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_message', models.TextField()),
+                ('bot_response', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('query_type', models.CharField(blank=True, max_length=50)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_messages', to='health_chatbot.userprofile')),
+            ],
+            options={
+                'db_table': 'chat_messages',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 4.2.11 on 2026-10-17 05:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_rollups(apps, schema_editor):
+    """Populate rollups for meals logged before the table existed"""
+    Meal = apps.get_model('health_chatbot', 'Meal')
+    DailyNutritionRollup = apps.get_model('health_chatbot', 'DailyNutritionRollup')
+
+    days = (
+        Meal.objects.order_by()
+        .values('user_id', 'date')
+        .annotate(
+            calories_sum=models.Sum('calories'),
+            protein_sum=models.Sum('protein'),
+            carbs_sum=models.Sum('carbs'),
+            fat_sum=models.Sum('fat'),
+            fiber_sum=models.Sum('fiber'),
+            meals=models.Count('id'),
+        )
+    )
+    DailyNutritionRollup.objects.bulk_create(
+        [
+            DailyNutritionRollup(
+                user_id=day['user_id'],
+                date=day['date'],
+                calories=day['calories_sum'] or 0,
+                protein=day['protein_sum'] or 0,
+                carbs=day['carbs_sum'] or 0,
+                fat=day['fat_sum'] or 0,
+                fiber=day['fiber_sum'] or 0,
+                meal_count=day['meals'],
+            )
+            for day in days.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health_chatbot', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyNutritionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('calories', models.FloatField(default=0)),
+                ('protein', models.FloatField(default=0)),
+                ('carbs', models.FloatField(default=0)),
+                ('fat', models.FloatField(default=0)),
+                ('fiber', models.FloatField(default=0)),
+                ('meal_count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nutrition_rollups', to='health_chatbot.userprofile')),
+            ],
+            options={
+                'db_table': 'daily_nutrition_rollups',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailynutritionrollup',
+            constraint=models.UniqueConstraint(fields=('user', 'date'), name='unique_rollup_per_user_day'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
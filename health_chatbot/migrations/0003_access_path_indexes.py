@@ -0,0 +1,25 @@
+# Generated by Django 4.2.11 on 2026-10-17 05:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health_chatbot', '0002_daily_nutrition_rollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['user', '-created_at'], name='chat_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='meal',
+            index=models.Index(fields=['user', '-date', '-created_at'], name='meals_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medication',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['user', '-is_active', 'drug_name'], name='medications_active_idx'),
+        ),
+    ]
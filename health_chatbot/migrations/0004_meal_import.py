@@ -0,0 +1,33 @@
+# Generated by Django 4.2.11 on 2026-10-17 05:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health_chatbot', '0003_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MealImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idempotency_key', models.CharField(max_length=100)),
+                ('status_code', models.IntegerField()),
+                ('response', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='meal_imports', to='health_chatbot.userprofile')),
+            ],
+            options={
+                'db_table': 'meal_imports',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='mealimport',
+            constraint=models.UniqueConstraint(fields=('user', 'idempotency_key'), name='unique_meal_import_key'),
+        ),
+    ]
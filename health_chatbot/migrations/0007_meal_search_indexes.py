@@ -0,0 +1,42 @@
+from django.db import migrations
+
+
+# Per-user trigram indexes for meal search/autocomplete (btree_gin lets user_id
+# share the GIN index). PostgreSQL only: other databases search an in-process
+# index instead (see health_chatbot/search.py).
+INDEXES = [
+    ('meals_name_trgm_idx', 'meal_name'),
+    ('meals_notes_trgm_idx', 'notes'),
+]
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gin')
+    for name, column in INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} '
+            f'ON meals USING gin (user_id, {column} gin_trgm_ops)'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('health_chatbot', '0006_api_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
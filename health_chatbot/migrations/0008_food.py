@@ -0,0 +1,30 @@
+# Generated by Django 4.2.11 on 2026-10-17 06:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health_chatbot', '0007_meal_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Food',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, unique=True)),
+                ('serving', models.CharField(default='1 serving', help_text='e.g. "1 large egg (50 g)"', max_length=100)),
+                ('calories', models.FloatField(default=0)),
+                ('protein', models.FloatField(default=0)),
+                ('carbs', models.FloatField(default=0)),
+                ('fat', models.FloatField(default=0)),
+                ('fiber', models.FloatField(default=0)),
+            ],
+            options={
+                'db_table': 'foods',
+                'ordering': ['name'],
+            },
+        ),
+    ]
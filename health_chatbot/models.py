@@ -35,6 +35,27 @@ class UserProfile(models.Model):
         return f"{self.name} ({self.email})"
 
 
+class ApiKey(models.Model):
+    """
+    API key identifying a user. Only the SHA-256 of the key is stored; keys
+    are random 256-bit tokens, so a fast hash is enough and lookups go
+    through the unique index on key_hash.
+    """
+    user = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='api_keys')
+    name = models.CharField(max_length=100, blank=True)
+    prefix = models.CharField(max_length=12, help_text="First characters of the key, to tell keys apart")
+    key_hash = models.CharField(max_length=64, unique=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'api_keys'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.prefix}… ({self.user.email})"
+
+
 class Meal(models.Model):
     """Meal entries"""
     MEAL_TIMES = [
@@ -63,11 +84,56 @@ class Meal(models.Model):
     class Meta:
         db_table = 'meals'
         ordering = ['-date', '-created_at']
+        indexes = [
+            # Per-user date-window scans, already in display order
+            models.Index(fields=['user', '-date', '-created_at'], name='meals_user_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.meal_name} - {self.date}"
 
 
+class Food(models.Model):
+    """Food catalog entry with its macros per serving, for logging meals by name"""
+    name = models.CharField(max_length=200, unique=True)
+    serving = models.CharField(max_length=100, default="1 serving", help_text='e.g. "1 large egg (50 g)"')
+
+    # Nutrition per serving
+    calories = models.FloatField(default=0)
+    protein = models.FloatField(default=0)
+    carbs = models.FloatField(default=0)
+    fat = models.FloatField(default=0)
+    fiber = models.FloatField(default=0)
+
+    class Meta:
+        db_table = 'foods'
+        ordering = ['name']
+
+    def __str__(self):
+        return f"{self.name} ({self.serving})"
+
+
+class MealImport(models.Model):
+    """Result of a bulk meal upload, kept so retries with the same key are idempotent"""
+    user = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='meal_imports')
+    idempotency_key = models.CharField(max_length=100)
+
+    status_code = models.IntegerField()
+    response = models.JSONField()
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'meal_imports'
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'idempotency_key'], name='unique_meal_import_key'),
+        ]
+
+    def __str__(self):
+        return f"Import {self.idempotency_key} ({self.user_id})"
+
+
 class Medication(models.Model):
     """Medication tracking"""
     FREQUENCIES = [
@@ -92,6 +158,14 @@ class Medication(models.Model):
     class Meta:
         db_table = 'medications'
         ordering = ['-is_active', 'drug_name']
+        indexes = [
+            # Active medications are what the API and chatbot list
+            models.Index(
+                fields=['user', '-is_active', 'drug_name'],
+                name='medications_active_idx',
+                condition=models.Q(is_active=True),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.drug_name} {self.dosage}"
@@ -104,12 +178,42 @@ class ChatMessage(models.Model):
     bot_response = models.TextField()
 
     # Metadata
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set when the turn is answered, not when the row is inserted (history
+    # rows may be written later in batches)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     query_type = models.CharField(max_length=50, blank=True)  # e.g., 'nutrition_query', 'meal_log', etc.
 
     class Meta:
         db_table = 'chat_messages'
         ordering = ['-created_at']
+        indexes = [
+            # Latest-first chat history per user
+            models.Index(fields=['user', '-created_at'], name='chat_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"Chat at {self.created_at}"
+
+
+class DailyNutritionRollup(models.Model):
+    """Per-user daily nutrition totals, maintained on every meal write"""
+    user = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='nutrition_rollups')
+    date = models.DateField()
+
+    # Nutrition totals for the day
+    calories = models.FloatField(default=0)
+    protein = models.FloatField(default=0)
+    carbs = models.FloatField(default=0)
+    fat = models.FloatField(default=0)
+    fiber = models.FloatField(default=0)
+    meal_count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'daily_nutrition_rollups'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='unique_rollup_per_user_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.date} ({self.meal_count} meals)"
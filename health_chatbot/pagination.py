@@ -0,0 +1,134 @@
+"""
+Keyset (cursor) pagination
+Pages are addressed by the sort key of the last row seen, so page cost
+doesn't grow with history length and concurrent inserts don't shift pages
+"""
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_date, parse_datetime
+
+
+# Largest value of a (big)integer primary key
+MAX_ID = 2 ** 63 - 1
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def get_page_size(value, default=None):
+    """Parse a requested page size, falling back to the default and capping at the max"""
+    if default is None:
+        default = getattr(settings, 'API_PAGE_SIZE', 50)
+    maximum = getattr(settings, 'API_MAX_PAGE_SIZE', 200)
+    try:
+        size = int(value) if value is not None else default
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, maximum))
+
+
+def encode_cursor(values):
+    """Encode a row's sort key as an opaque URL-safe token"""
+    raw = json.dumps([str(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _row_id(value):
+    """A cursor's id, or None if no row could have it (the database would overflow)"""
+    pk = int(value)
+    return pk if 0 < pk <= MAX_ID else None
+
+
+def _decode(cursor, parsers):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor('Invalid cursor')
+
+    if not isinstance(values, list) or len(values) != len(parsers):
+        raise InvalidCursor('Invalid cursor')
+
+    try:
+        parsed = [parse(value) for parse, value in zip(parsers, values)]
+    except (TypeError, ValueError):
+        raise InvalidCursor('Invalid cursor')
+    if any(value is None for value in parsed):
+        raise InvalidCursor('Invalid cursor')
+    return parsed
+
+
+def _meals_page_query(meals, cursor, page_size):
+    """The page's rows plus one, to tell whether another page follows"""
+    meals = meals.order_by('-date', '-created_at', '-id')
+    if cursor:
+        date, created_at, pk = _decode(cursor, [parse_date, parse_datetime, _row_id])
+        meals = meals.filter(
+            Q(date__lt=date)
+            | Q(date=date, created_at__lt=created_at)
+            | Q(date=date, created_at=created_at, id__lt=pk)
+        )
+    return meals[:page_size + 1]
+
+
+def _meals_page(rows, page_size):
+    if len(rows) <= page_size:
+        return rows, None
+
+    rows = rows[:page_size]
+    last = rows[-1]
+    return rows, encode_cursor([last.date.isoformat(), last.created_at.isoformat(), last.id])
+
+
+def paginate_meals(meals, cursor, page_size):
+    """
+    Page a meal queryset newest first, keyed on (date, created_at, id).
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    return _meals_page(list(_meals_page_query(meals, cursor, page_size)), page_size)
+
+
+async def apaginate_meals(meals, cursor, page_size):
+    """Async paginate_meals"""
+    rows = [meal async for meal in _meals_page_query(meals, cursor, page_size)]
+    return _meals_page(rows, page_size)
+
+
+def _chat_page_query(messages, cursor, page_size):
+    """The page's rows plus one, to tell whether another page follows"""
+    messages = messages.order_by('-created_at', '-id')
+    if cursor:
+        created_at, pk = _decode(cursor, [parse_datetime, _row_id])
+        messages = messages.filter(
+            Q(created_at__lt=created_at)
+            | Q(created_at=created_at, id__lt=pk)
+        )
+    return messages[:page_size + 1]
+
+
+def _chat_page(rows, page_size):
+    if len(rows) <= page_size:
+        return rows, None
+
+    rows = rows[:page_size]
+    last = rows[-1]
+    return rows, encode_cursor([last.created_at.isoformat(), last.id])
+
+
+def paginate_chat(messages, cursor, page_size):
+    """
+    Page a chat message queryset newest first, keyed on (created_at, id).
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    return _chat_page(list(_chat_page_query(messages, cursor, page_size)), page_size)
+
+
+async def apaginate_chat(messages, cursor, page_size):
+    """Async paginate_chat"""
+    rows = [message async for message in _chat_page_query(messages, cursor, page_size)]
+    return _chat_page(rows, page_size)
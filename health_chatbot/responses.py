@@ -0,0 +1,99 @@
+"""
+Chatbot reply builder
+Handlers collect structured fields and rows plus the lines that present
+them; the reply is rendered to Markdown, plain text or JSON in a single join
+"""
+import json
+from functools import cached_property
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+FORMATS = ('markdown', 'text', 'json')
+
+
+class Bold(str):
+    """Span shown as **bold** in Markdown"""
+    __slots__ = ()
+
+    def markdown(self):
+        return f'**{self}**'
+
+
+class Code(str):
+    """Fenced code block; occupies a whole line"""
+
+    def __new__(cls, text, language=''):
+        code = super().__new__(cls, text)
+        code.language = language
+        return code
+
+    def markdown(self):
+        return f'```{self.language}\n{self}\n```'
+
+
+class ChatReply:
+    """
+    One chatbot answer.
+
+    ``kind`` names the answer ('meals', 'nutrition', 'medications', ...),
+    ``fields`` holds its summary values and ``items`` one dict per listed
+    row (pass ``items=[]`` for a list answer with no rows, so the structured
+    form still has the key). ``lines`` are tuples of spans (plain ``str``,
+    ``Bold`` or ``Code``) joined with newlines when rendered.
+    """
+
+    def __init__(self, kind, items=None, **fields):
+        self.kind = kind
+        self.fields = fields
+        self.items = items
+        self.lines = []
+
+    def line(self, *spans):
+        """Add a line (no spans = blank line)"""
+        self.lines.append(spans)
+        return self
+
+    def heading(self, title):
+        """Bold title followed by a blank line"""
+        self.lines.append((Bold(title),))
+        self.lines.append(())
+        return self
+
+    def item(self, row, *spans):
+        """Add a structured row, and the line showing it if spans are given"""
+        if self.items is None:
+            self.items = []
+        self.items.append(row)
+        if spans:
+            self.lines.append(spans)
+        return self
+
+    @cached_property
+    def markdown(self):
+        return '\n'.join(
+            ''.join(span.markdown() if isinstance(span, (Bold, Code)) else span for span in line)
+            for line in self.lines
+        )
+
+    @cached_property
+    def text(self):
+        return '\n'.join(''.join(line) for line in self.lines)
+
+    def as_dict(self):
+        data = {'type': self.kind, **self.fields}
+        if self.items is not None:
+            data['items'] = self.items
+        return data
+
+    def render(self, fmt='markdown'):
+        if fmt == 'markdown':
+            return self.markdown
+        if fmt == 'text':
+            return self.text
+        if fmt == 'json':
+            return json.dumps(self.as_dict(), cls=DjangoJSONEncoder)
+        raise ValueError(f'Unknown reply format: {fmt}')
+
+    def __str__(self):
+        return self.markdown
@@ -0,0 +1,255 @@
+"""
+Daily nutrition rollups
+Keeps DailyNutritionRollup in step with meal writes so summaries read one
+row per day instead of aggregating raw meals
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Sum, Count, F
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from .models import Meal, DailyNutritionRollup
+
+
+NUTRIENTS = ['calories', 'protein', 'carbs', 'fat', 'fiber']
+
+# Series bucket sizes; weeks start on Monday
+GRANULARITIES = ('day', 'week', 'month')
+
+
+def _apply_delta(user_id, date, delta, meal_count):
+    """Add a macro delta (and meal count change) to one (user, date) rollup"""
+    with transaction.atomic():
+        rollup, created = DailyNutritionRollup.objects.get_or_create(
+            user_id=user_id,
+            date=date,
+        )
+        updates = {name: F(name) + delta[name] for name in NUTRIENTS}
+        updates['meal_count'] = F('meal_count') + meal_count
+        DailyNutritionRollup.objects.filter(pk=rollup.pk).update(**updates)
+
+        # Drop days that no longer have any meals
+        DailyNutritionRollup.objects.filter(pk=rollup.pk, meal_count__lte=0).delete()
+
+
+def _macros(meal, sign=1):
+    return {name: sign * (getattr(meal, name) or 0) for name in NUTRIENTS}
+
+
+def record_meal(meal):
+    """Add a newly created meal to its day's rollup"""
+    _apply_delta(meal.user_id, meal.date, _macros(meal), 1)
+
+
+def _apply_meals(meals, sign):
+    """Add (or remove) a batch of meals, one rollup update per (user, date)"""
+    days = {}
+    for meal in meals:
+        key = (meal.user_id, meal.date)
+        delta, count = days.get(key, ({name: 0 for name in NUTRIENTS}, 0))
+        for name, value in _macros(meal, sign).items():
+            delta[name] += value
+        days[key] = (delta, count + sign)
+
+    for (user_id, date), (delta, count) in days.items():
+        _apply_delta(user_id, date, delta, count)
+
+
+def record_meals(meals):
+    """Add a batch of newly created meals, one rollup update per (user, date)"""
+    _apply_meals(meals, 1)
+
+
+def forget_meal(meal):
+    """Remove a meal (about to be deleted) from its day's rollup"""
+    _apply_delta(meal.user_id, meal.date, _macros(meal, -1), -1)
+
+
+def forget_meals(meals):
+    """Remove a batch of meals (about to be deleted), one rollup update per (user, date)"""
+    _apply_meals(meals, -1)
+
+
+def snapshot_meal(meal):
+    """Capture the rollup-relevant fields of a meal before it is updated"""
+    snapshot = {name: getattr(meal, name) or 0 for name in NUTRIENTS}
+    snapshot['date'] = meal.date
+    snapshot['user_id'] = meal.user_id
+    return snapshot
+
+
+def update_meal(snapshot, meal):
+    """Move an updated meal's contribution from its old values to its new ones"""
+    old = {name: -snapshot[name] for name in NUTRIENTS}
+
+    if snapshot['date'] == meal.date and snapshot['user_id'] == meal.user_id:
+        delta = {name: old[name] + (getattr(meal, name) or 0) for name in NUTRIENTS}
+        _apply_delta(meal.user_id, meal.date, delta, 0)
+    else:
+        # Meal moved to another day: take it out of the old one, add to the new one
+        _apply_delta(snapshot['user_id'], snapshot['date'], old, -1)
+        record_meal(meal)
+
+
+def rebuild_rollups(user=None):
+    """
+    Recompute rollups from raw meals.
+    Returns the number of rollup rows written.
+    """
+    meals = Meal.objects.all()
+    rollups = DailyNutritionRollup.objects.all()
+    if user is not None:
+        meals = meals.filter(user=user)
+        rollups = rollups.filter(user=user)
+
+    days = (
+        meals.order_by()
+        .values('user_id', 'date')
+        .annotate(
+            calories_sum=Sum('calories'),
+            protein_sum=Sum('protein'),
+            carbs_sum=Sum('carbs'),
+            fat_sum=Sum('fat'),
+            fiber_sum=Sum('fiber'),
+            meals=Count('id'),
+        )
+    )
+
+    with transaction.atomic():
+        rollups.delete()
+        objs = [
+            DailyNutritionRollup(
+                user_id=day['user_id'],
+                date=day['date'],
+                calories=day['calories_sum'] or 0,
+                protein=day['protein_sum'] or 0,
+                carbs=day['carbs_sum'] or 0,
+                fat=day['fat_sum'] or 0,
+                fiber=day['fiber_sum'] or 0,
+                meal_count=day['meals'],
+            )
+            for day in days.iterator()
+        ]
+        DailyNutritionRollup.objects.bulk_create(objs, batch_size=1000)
+
+    return len(objs)
+
+
+def _range(user, date_from, date_to):
+    rollups = DailyNutritionRollup.objects.filter(user=user, date__gte=date_from)
+    if date_to is not None:
+        rollups = rollups.filter(date__lte=date_to)
+    return rollups
+
+
+def _totals_aggregates():
+    return {
+        'calories': Sum('calories'),
+        'protein': Sum('protein'),
+        'carbs': Sum('carbs'),
+        'fat': Sum('fat'),
+        'fiber': Sum('fiber'),
+        'meals': Sum('meal_count'),
+        'days': Count('id'),
+    }
+
+
+def nutrition_totals(user, date_from, date_to=None):
+    """
+    Sum rollups for a date range (inclusive).
+    Returns a dict with the five macro totals plus 'meals' and 'days' (days with meals).
+    Totals are None when no meals were logged, matching Sum() over raw meals.
+    """
+    return _range(user, date_from, date_to).aggregate(**_totals_aggregates())
+
+
+async def anutrition_totals(user, date_from, date_to=None):
+    """Async nutrition_totals"""
+    return await _range(user, date_from, date_to).aaggregate(**_totals_aggregates())
+
+
+def daily_totals(user, date_from, date_to=None):
+    """
+    Per-day totals for a date range (inclusive), newest first.
+    A single query over the rollups; days without meals are absent.
+    """
+    return _range(user, date_from, date_to).order_by('-date').values('date', 'meal_count', *NUTRIENTS)
+
+
+def _bucket_expression(granularity):
+    if granularity == 'week':
+        return TruncWeek('date')
+    if granularity == 'month':
+        return TruncMonth('date')
+    return F('date')
+
+
+def _bucket_query(user, date_from, date_to, granularity):
+    """One GROUP BY over the range's rollups: totals per bucket start date"""
+    return (
+        _range(user, date_from, date_to)
+        .order_by()
+        .annotate(bucket=_bucket_expression(granularity))
+        .values('bucket')
+        .annotate(**_totals_aggregates())
+    )
+
+
+def _bucket_start(day, granularity):
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(start, granularity):
+    if granularity == 'week':
+        return start + timedelta(days=7)
+    if granularity == 'month':
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def _fill_buckets(rows, date_from, date_to, granularity):
+    """
+    Every bucket overlapping [date_from, date_to], oldest first, with zeros
+    where no meals were logged. 'start'/'end' are clipped to the range and
+    'days' counts the calendar days the bucket covers within it.
+    """
+    found = {row['bucket']: row for row in rows}
+    buckets = []
+    start = _bucket_start(date_from, granularity)
+    while start <= date_to:
+        following = _next_bucket(start, granularity)
+        first, last = max(start, date_from), min(following - timedelta(days=1), date_to)
+        row = found.get(start, {})
+        bucket = {
+            'start': first,
+            'end': last,
+            'days': (last - first).days + 1,
+            'meals': row.get('meals') or 0,
+            'days_logged': row.get('days') or 0,
+        }
+        for name in NUTRIENTS:
+            bucket[name] = row.get(name) or 0
+        buckets.append(bucket)
+        start = following
+    return buckets
+
+
+def bucket_totals(user, date_from, date_to, granularity='day'):
+    """
+    Totals per day, week or month across a date range (inclusive), including
+    empty buckets. A single grouped query over the rollups, so the cost is
+    bounded by the number of days in the range, not the number of meals.
+    """
+    rows = _bucket_query(user, date_from, date_to, granularity)
+    return _fill_buckets(rows, date_from, date_to, granularity)
+
+
+async def abucket_totals(user, date_from, date_to, granularity='day'):
+    """Async bucket_totals"""
+    rows = [row async for row in _bucket_query(user, date_from, date_to, granularity)]
+    return _fill_buckets(rows, date_from, date_to, granularity)
@@ -0,0 +1,158 @@
+"""
+Read-replica database routing
+Reads inside a ``replica_reads`` block (summaries, chat history, meal
+listings, chatbot answers) go to a healthy replica; everything else, and all
+writes, go to the primary. A user who has just written is pinned to the
+primary for REPLICA_STICKY_SECONDS so they always read their own writes.
+"""
+import functools
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from .users import aget_request_user, get_request_user
+
+
+_replica_reads = ContextVar('health_replica_reads', default=False)
+
+# alias -> (healthy, checked_at)
+_health = {}
+_health_lock = threading.Lock()
+_round_robin = itertools.count()
+
+# Seconds the replica is behind the primary; 0 when it has replayed everything
+_LAG_SQL = """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith('replica')]
+
+
+def _pin_key(user_id):
+    return f'health:pin:{user_id}'
+
+
+def _pin_cache():
+    return caches[settings.REPLICA_PIN_CACHE_ALIAS]
+
+
+def pin_to_primary(user_id):
+    """Send this user's reads to the primary for the next REPLICA_STICKY_SECONDS"""
+    if replica_aliases():
+        _pin_cache().set(_pin_key(user_id), 1, settings.REPLICA_STICKY_SECONDS)
+
+
+def is_pinned(user_id):
+    return _pin_cache().get(_pin_key(user_id)) is not None
+
+
+async def ais_pinned(user_id):
+    return await _pin_cache().aget(_pin_key(user_id)) is not None
+
+
+@contextmanager
+def _routing_reads(enabled):
+    if not enabled:
+        yield
+        return
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def replica_reads(user_id):
+    """Route reads in this block to a replica unless the user was just pinned"""
+    return _routing_reads(bool(replica_aliases()) and not is_pinned(user_id))
+
+
+def read_only_view(view):
+    """View decorator (sync or async): run GET requests' queries against a replica"""
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or not replica_aliases():
+                return await view(request, *args, **kwargs)
+            user = await aget_request_user(request)
+            with _routing_reads(not await ais_pinned(user.pk)):
+                return await view(request, *args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+        with replica_reads(get_request_user(request).pk):
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+def _check(alias):
+    """Is the replica reachable and within REPLICA_MAX_LAG seconds of the primary?"""
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(_LAG_SQL)
+                return float(cursor.fetchone()[0]) <= settings.REPLICA_MAX_LAG
+            cursor.execute('SELECT 1')
+            return True
+    except DatabaseError:
+        connection.close()
+        return False
+
+
+def is_healthy(alias):
+    """Cached health check, re-run at most every REPLICA_HEALTH_CHECK_INTERVAL seconds"""
+    now = time.monotonic()
+    with _health_lock:
+        healthy, checked_at = _health.get(alias, (None, 0))
+    if healthy is not None and now - checked_at < settings.REPLICA_HEALTH_CHECK_INTERVAL:
+        return healthy
+
+    healthy = _check(alias)
+    with _health_lock:
+        _health[alias] = (healthy, now)
+    return healthy
+
+
+def choose_replica():
+    """Next healthy replica in round-robin order, or the primary if none is"""
+    aliases = replica_aliases()
+    start = next(_round_robin)
+    for offset in range(len(aliases)):
+        alias = aliases[(start + offset) % len(aliases)]
+        if is_healthy(alias):
+            return alias
+    return DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    """Primary for writes and migrations; replicas for reads inside replica_reads()"""
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get():
+            return choose_replica()
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
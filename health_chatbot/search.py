@@ -0,0 +1,270 @@
+"""
+Meal search and autocomplete
+On PostgreSQL, queries run against per-user pg_trgm GIN indexes on meal names
+and notes (migration 0007). Other databases get a portable fallback: each
+user's meals are indexed in process (TrigramIndex) and the index is rebuilt
+when the user's meals change.
+"""
+import heapq
+import re
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import (
+    Avg, BooleanField, Case, Count, F, FloatField, Func, IntegerField, Max, Value, When,
+)
+
+from .cache import MEALS, generation
+from .models import Meal
+from .rollups import NUTRIENTS
+from .users import LRUCache
+
+
+# pg_trgm's default word similarity threshold (SHOW pg_trgm.word_similarity_threshold)
+SIMILARITY_THRESHOLD = 0.6
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+
+def normalise(text):
+    """Lowercase words separated by single spaces"""
+    return _NON_WORD.sub(' ', text.lower()).strip()
+
+
+def trigrams(text):
+    """Trigrams of normalised text, each word padded the way pg_trgm pads it"""
+    grams = set()
+    for word in text.split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """
+    In-memory substring, fuzzy and word-prefix index over short texts.
+
+    ``search()`` ranks entries containing the query first, then by the share
+    of the query's trigrams they contain (close to pg_trgm's word_similarity(),
+    so "chiken" finds "Grilled Chicken Salad"); ties keep insertion order.
+    ``prefix()`` finds entries with a word starting with the query.
+    """
+
+    def __init__(self):
+        self._keys = []
+        self._texts = []
+        self._postings = defaultdict(list)
+        self._word_starts = None
+
+    def add(self, key, text):
+        position = len(self._keys)
+        text = normalise(text)
+        grams = trigrams(text)
+        self._keys.append(key)
+        self._texts.append(text)
+        for gram in grams:
+            self._postings[gram].append(position)
+        self._word_starts = None
+
+    def __len__(self):
+        return len(self._keys)
+
+    def search(self, query, limit, threshold=SIMILARITY_THRESHOLD):
+        """Keys of the best ``limit`` matches"""
+        query = normalise(query)
+        grams = trigrams(query)
+        if not grams:
+            return []
+
+        shared = defaultdict(int)
+        for gram in grams:
+            for position in self._postings.get(gram, ()):
+                shared[position] += 1
+
+        ranked = []
+        for position, count in shared.items():
+            similarity = count / len(grams)
+            contains = query in self._texts[position]
+            if contains or similarity >= threshold:
+                ranked.append((not contains, -similarity, position))
+        return [self._keys[position] for _, _, position in heapq.nsmallest(limit, ranked)]
+
+    def prefix(self, query, limit):
+        """Keys of the first ``limit`` entries (in insertion order) with a word starting with the query"""
+        query = normalise(query)
+        if not query:
+            return []
+        if self._word_starts is None:
+            self._word_starts = sorted(
+                (text[start:], position)
+                for position, text in enumerate(self._texts)
+                for start in [0] + [i + 1 for i, char in enumerate(text) if char == ' ']
+            )
+
+        found = set()
+        index = bisect_left(self._word_starts, (query,))
+        while index < len(self._word_starts) and self._word_starts[index][0].startswith(query):
+            found.add(self._word_starts[index][1])
+            index += 1
+        return [self._keys[position] for position in sorted(found)[:limit]]
+
+
+class _UserMeals:
+    """One user's meals (newest first) and distinct meal names, indexed"""
+
+    def __init__(self, rows):
+        self.meals = TrigramIndex()
+        self.names = TrigramIndex()
+        self.dates = {}
+        suggestions = {}
+
+        for meal_id, meal_name, notes, date, *macros in rows:
+            self.meals.add(meal_id, f'{meal_name} {notes}')
+            self.dates[meal_id] = date
+            key = normalise(meal_name)
+            suggestion = suggestions.get(key)
+            if suggestion is None:
+                suggestion = suggestions[key] = {
+                    'meal_name': meal_name, 'times_logged': 0, 'last_logged': date,
+                    'totals': [0.0] * len(NUTRIENTS),
+                }
+                self.names.add(key, meal_name)
+            suggestion['times_logged'] += 1
+            for i, value in enumerate(macros):
+                suggestion['totals'][i] += value
+        self.suggestions = suggestions
+
+
+_indexes = LRUCache(settings.MEAL_SEARCH_INDEX_USERS)
+
+# Rebuilt on any meal write anyway (see _user_meals); the TTL only bounds idle memory
+_INDEX_TTL = 3600
+
+
+def _user_meals(user):
+    """The user's in-process index, rebuilt when their meals have changed"""
+    current = generation(user.pk, MEALS)
+    cached = _indexes.get(user.pk)
+    if cached is not None and cached[0] == current:
+        return cached[1]
+
+    rows = (
+        Meal.objects.filter(user=user)
+        .order_by('-date', '-created_at')
+        .values_list('id', 'meal_name', 'notes', 'date', *NUTRIENTS)
+    )
+    index = _UserMeals(rows.iterator(chunk_size=5000))
+    _indexes.set(user.pk, (current, index), _INDEX_TTL)
+    return index
+
+
+def _uses_trigram_indexes():
+    return connections[router.db_for_read(Meal)].vendor == 'postgresql'
+
+
+class ILike(Func):
+    """``expression ILIKE pattern`` (served by a gin_trgm_ops index)"""
+    arg_joiner = ' ILIKE '
+    template = '(%(expressions)s)'
+    output_field = BooleanField()
+
+
+class WordSimilar(Func):
+    """``query <% expression``: pg_trgm word similarity above the threshold (indexed)"""
+    arg_joiner = ' <%% '
+    template = '(%(expressions)s)'
+    output_field = BooleanField()
+
+
+class WordSimilarity(Func):
+    function = 'WORD_SIMILARITY'
+    output_field = FloatField()
+
+
+def _like_escape(query):
+    return query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _date_filter(queryset, date_from, date_to):
+    if date_from is not None:
+        queryset = queryset.filter(date__gte=date_from)
+    if date_to is not None:
+        queryset = queryset.filter(date__lte=date_to)
+    return queryset
+
+
+def search_meals(user, query, limit, date_from=None, date_to=None):
+    """
+    The user's meals whose name or notes contain the query (newest first),
+    followed by close fuzzy matches on the name
+    """
+    query = query.strip()
+    if not query:
+        return []
+
+    if _uses_trigram_indexes():
+        pattern = Value(f'%{_like_escape(query)}%')
+        contains = ILike(F('meal_name'), pattern) | ILike(F('notes'), pattern)
+        meals = (
+            _date_filter(Meal.objects.filter(user=user), date_from, date_to)
+            .filter(contains | WordSimilar(Value(query), F('meal_name')))
+            .annotate(
+                substring=Case(When(contains, then=0), default=1, output_field=IntegerField()),
+                similarity=WordSimilarity(Value(query), F('meal_name')),
+            )
+            .order_by('substring', '-similarity', '-date', '-created_at')
+        )
+        return list(meals[:limit])
+
+    index = _user_meals(user)
+    if date_from is None and date_to is None:
+        ids = index.meals.search(query, limit)
+    else:
+        ids = [
+            meal_id for meal_id in index.meals.search(query, len(index.meals))
+            if (date_from is None or index.dates[meal_id] >= date_from)
+            and (date_to is None or index.dates[meal_id] <= date_to)
+        ][:limit]
+    meals = Meal.objects.in_bulk(ids)
+    return [meals[meal_id] for meal_id in ids if meal_id in meals]
+
+
+def suggest_meals(user, query, limit):
+    """
+    Distinct meal names the user has logged with a word starting with the
+    query, most logged first, with their average macros
+    """
+    query = query.strip()
+    if not query:
+        return []
+
+    if _uses_trigram_indexes():
+        escaped = _like_escape(query)
+        rows = (
+            Meal.objects.filter(user=user)
+            .filter(ILike(F('meal_name'), Value(f'{escaped}%')) | ILike(F('meal_name'), Value(f'% {escaped}%')))
+            .values('meal_name')
+            .annotate(times_logged=Count('id'), last_logged=Max('date'),
+                      **{name: Avg(name) for name in NUTRIENTS})
+            .order_by('-times_logged', 'meal_name')[:limit]
+        )
+        return [
+            {**row, **{name: round(row[name], 1) for name in NUTRIENTS}}
+            for row in rows
+        ]
+
+    index = _user_meals(user)
+    matches = [index.suggestions[key] for key in index.names.prefix(query, len(index.names))]
+    matches.sort(key=lambda suggestion: -suggestion['times_logged'])
+    return [
+        {
+            'meal_name': suggestion['meal_name'],
+            'times_logged': suggestion['times_logged'],
+            'last_logged': suggestion['last_logged'],
+            **{name: round(total / suggestion['times_logged'], 1)
+               for name, total in zip(NUTRIENTS, suggestion['totals'])},
+        }
+        for suggestion in matches[:limit]
+    ]
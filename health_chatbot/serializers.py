@@ -1,12 +1,36 @@
 """
 Serializers for API responses
 """
+from django.db import transaction
 from rest_framework import serializers
-from .models import UserProfile, Meal, Medication, ChatMessage
+from .models import UserProfile, Food, Meal, Medication, ChatMessage
+from . import rollups
+from .cache import invalidate, MEALS, MEDICATIONS
+from .foods import MAX_SERVINGS, MIN_SERVINGS
+from .metrics import timed
 
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class TimedListSerializer(serializers.ListSerializer):
+    """ListSerializer that reports rendering time to the request metrics"""
+
+    @property
+    def data(self):
+        with timed('serializer'):
+            return super().data
+
+
+class TimedModelSerializer(serializers.ModelSerializer):
+    """ModelSerializer that reports rendering time to the request metrics"""
+
+    @property
+    def data(self):
+        with timed('serializer'):
+            return super().data
+
+
+class UserProfileSerializer(TimedModelSerializer):
     class Meta:
+        list_serializer_class = TimedListSerializer
         model = UserProfile
         fields = [
             'id', 'email', 'name', 'age',
@@ -16,8 +40,9 @@ class UserProfileSerializer(serializers.ModelSerializer):
         ]
 
 
-class MealSerializer(serializers.ModelSerializer):
+class MealSerializer(TimedModelSerializer):
     class Meta:
+        list_serializer_class = TimedListSerializer
         model = Meal
         fields = [
             'id', 'meal_name', 'meal_time', 'calories',
@@ -25,9 +50,49 @@ class MealSerializer(serializers.ModelSerializer):
             'date', 'notes', 'created_at'
         ]
 
+    def create(self, validated_data):
+        with transaction.atomic():
+            meal = super().create(validated_data)
+            rollups.record_meal(meal)
+            invalidate(meal.user_id, MEALS)
+        return meal
+
+    def update(self, instance, validated_data):
+        with transaction.atomic():
+            snapshot = rollups.snapshot_meal(instance)
+            meal = super().update(instance, validated_data)
+            rollups.update_meal(snapshot, meal)
+            invalidate(meal.user_id, MEALS)
+        return meal
+
+    @staticmethod
+    def delete(instance):
+        """Delete a meal and remove it from its day's rollup"""
+        with transaction.atomic():
+            rollups.forget_meal(instance)
+            invalidate(instance.user_id, MEALS)
+            instance.delete()
 
-class MedicationSerializer(serializers.ModelSerializer):
+
+class FoodSerializer(TimedModelSerializer):
     class Meta:
+        list_serializer_class = TimedListSerializer
+        model = Food
+        fields = [
+            'id', 'name', 'serving', 'calories',
+            'protein', 'carbs', 'fat', 'fiber'
+        ]
+
+
+class FoodPortionSerializer(serializers.Serializer):
+    """``{"food_id": ..., "servings": ...}`` in a meal request"""
+    food_id = serializers.PrimaryKeyRelatedField(queryset=Food.objects.all(), source='food')
+    servings = serializers.FloatField(default=1, min_value=MIN_SERVINGS, max_value=MAX_SERVINGS)
+
+
+class MedicationSerializer(TimedModelSerializer):
+    class Meta:
+        list_serializer_class = TimedListSerializer
         model = Medication
         fields = [
             'id', 'drug_name', 'dosage', 'frequency',
@@ -35,9 +100,29 @@ class MedicationSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
 
+    def create(self, validated_data):
+        with transaction.atomic():
+            medication = super().create(validated_data)
+            invalidate(medication.user_id, MEDICATIONS)
+        return medication
+
+    def update(self, instance, validated_data):
+        with transaction.atomic():
+            medication = super().update(instance, validated_data)
+            invalidate(medication.user_id, MEDICATIONS)
+        return medication
+
+    @staticmethod
+    def delete(instance):
+        """Delete a medication and invalidate cached medication answers"""
+        with transaction.atomic():
+            invalidate(instance.user_id, MEDICATIONS)
+            instance.delete()
+
 
-class ChatMessageSerializer(serializers.ModelSerializer):
+class ChatMessageSerializer(TimedModelSerializer):
     class Meta:
+        list_serializer_class = TimedListSerializer
         model = ChatMessage
         fields = [
             'id', 'user_message', 'bot_response',
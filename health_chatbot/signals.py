@@ -0,0 +1,32 @@
+"""
+Signal handlers for Health Chatbot
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import ApiKey, Food, UserProfile
+from .users import forget_api_key, invalidate_user
+from .cache import invalidate, CATALOG_USER, FOODS, PROFILE
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_cached_profile(sender, instance, **kwargs):
+    """Profile or goals changed: drop the cached copy and answers built from it"""
+    invalidate_user(instance.pk)
+    invalidate(instance.pk, PROFILE)
+
+
+@receiver(post_save, sender=ApiKey)
+@receiver(post_delete, sender=ApiKey)
+def forget_cached_api_key(sender, instance, created=False, **kwargs):
+    """Key revoked or deleted: stop resolving it from every process's cache"""
+    if not created:
+        forget_api_key(instance.key_hash)
+
+
+@receiver(post_save, sender=Food)
+@receiver(post_delete, sender=Food)
+def rebuild_food_index(sender, instance, **kwargs):
+    """Catalog edited (e.g. in the admin): processes rebuild their name index"""
+    invalidate(CATALOG_USER, FOODS)
@@ -0,0 +1,252 @@
+"""
+Synthetic data generation for load testing
+Every user's data is derived from (seed, user index) alone, so output is
+reproducible regardless of how users are split across worker processes
+"""
+import io
+import random
+from datetime import datetime, time as dt_time, timedelta
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from .foods import read_catalog
+from .models import UserProfile, Meal, Medication, ChatMessage, DailyNutritionRollup
+from .rollups import NUTRIENTS
+
+
+SYNTHETIC_DOMAIN = 'load.biorhyme.health'
+
+# (meal_name, meal_time, calories, protein, carbs, fat, fiber)
+MEAL_TEMPLATES = [
+    ('Oatmeal with Berries', 'breakfast', 350, 12, 58, 8, 8),
+    ('Scrambled Eggs with Toast', 'breakfast', 380, 22, 32, 16, 4),
+    ('Protein Smoothie', 'breakfast', 320, 28, 42, 6, 5),
+    ('Avocado Toast', 'breakfast', 340, 10, 36, 18, 12),
+    ('Pancakes with Fruit', 'breakfast', 420, 12, 68, 10, 4),
+    ('Grilled Chicken Salad', 'lunch', 420, 38, 25, 18, 6),
+    ('Salmon with Brown Rice', 'lunch', 520, 42, 45, 18, 5),
+    ('Turkey Sandwich', 'lunch', 450, 32, 48, 12, 6),
+    ('Chicken Burrito Bowl', 'lunch', 580, 42, 62, 16, 10),
+    ('Tuna Salad', 'lunch', 380, 35, 22, 16, 5),
+    ('Stir-Fry Vegetables with Tofu', 'dinner', 380, 24, 38, 14, 8),
+    ('Beef Stir-Fry', 'dinner', 480, 38, 32, 20, 4),
+    ('Pasta with Marinara', 'dinner', 520, 18, 82, 12, 6),
+    ('Greek Yogurt', 'snack', 150, 15, 18, 3, 1),
+    ('Apple with Peanut Butter', 'snack', 270, 7, 30, 16, 6),
+]
+
+# (drug_name, dosage, frequency, notes)
+MEDICATION_TEMPLATES = [
+    ('Metformin', '500mg', 'twice_daily', 'Take with meals'),
+    ('Lisinopril', '10mg', 'once_daily', 'For blood pressure'),
+    ('Vitamin D', '2000 IU', 'once_daily', 'Supplement'),
+    ('Atorvastatin', '20mg', 'once_daily', 'Take in the evening'),
+    ('Ibuprofen', '200mg', 'as_needed', 'For pain'),
+]
+
+CHAT_PROMPTS = [
+    'What did I eat today?',
+    'How much protein have I consumed this week?',
+    'Show me my medications',
+    'Am I meeting my goals?',
+    'calories this month',
+]
+
+
+# Synthetic catalog foods are "<brand> <style> <catalog food>"
+FOOD_BRAND_SYLLABLES = ['ka', 'lo', 'mi', 'ra', 've', 'to', 'su', 'na', 'pe', 'zo',
+                        'li', 'gra', 'bel', 'mon', 'dor', 'fi', 'ta', 'ro', 'vin', 'sa']
+FOOD_STYLES = ['Organic', 'Classic', 'Low fat', 'Lite', 'Homestyle', 'Roasted', 'Smoked',
+               'Spicy', 'Honey', 'Garlic', 'Original', 'Family size', 'Frozen', 'Fresh',
+               'Unsweetened', 'Whole grain', 'Reduced sodium', 'Extra crispy', 'Mini', '']
+
+
+def synthetic_email(index):
+    return f'user{index}@{SYNTHETIC_DOMAIN}'
+
+
+def ensure_users(count):
+    """Create (or reuse) the synthetic users; returns their ids ordered by index"""
+    UserProfile.objects.bulk_create(
+        [
+            UserProfile(email=synthetic_email(i), name=f'Load User {i}')
+            for i in range(count)
+        ],
+        batch_size=5000,
+        ignore_conflicts=True,
+    )
+    ids = dict(
+        UserProfile.objects.filter(email__endswith='@' + SYNTHETIC_DOMAIN)
+        .values_list('email', 'id')
+    )
+    return [ids[synthetic_email(i)] for i in range(count)]
+
+
+def clear_user_data(user_ids):
+    """Delete existing rows for these users so reruns start clean"""
+    for model in (Meal, Medication, ChatMessage, DailyNutritionRollup):
+        model.objects.filter(user_id__in=user_ids).delete()
+
+
+def _user_rows(user_id, index, options, today):
+    """Generate one user's meals, medications and chat messages"""
+    rng = random.Random(f"{options['seed']}:{index}")
+    meals, medications, chats = [], [], []
+
+    for offset in range(options['days']):
+        day = today - timedelta(days=offset)
+        day_start = timezone.make_aware(datetime.combine(day, dt_time(7)))
+        for n in range(options['meals_per_day']):
+            name, meal_time, *macros = rng.choice(MEAL_TEMPLATES)
+            scale = rng.uniform(0.8, 1.25)
+            meals.append((
+                user_id, name, meal_time,
+                *[round(value * scale, 1) for value in macros],
+                day, day_start + timedelta(hours=4 * n, minutes=rng.randrange(60)), '',
+            ))
+        for _ in range(options['chats_per_day']):
+            chats.append((
+                user_id, rng.choice(CHAT_PROMPTS), 'Synthetic response',
+                day_start + timedelta(hours=rng.randrange(14), minutes=rng.randrange(60)), '',
+            ))
+
+    for template in rng.sample(MEDICATION_TEMPLATES, rng.randint(0, 3)):
+        drug_name, dosage, frequency, notes = template
+        started = today - timedelta(days=rng.randrange(max(options['days'], 1)))
+        medications.append((user_id, drug_name, dosage, frequency, started, notes, True))
+
+    return meals, medications, chats
+
+
+MEAL_COLUMNS = ['user_id', 'meal_name', 'meal_time', *NUTRIENTS, 'date', 'created_at', 'notes']
+MEDICATION_COLUMNS = ['user_id', 'drug_name', 'dosage', 'frequency', 'started_date', 'notes', 'is_active']
+CHAT_COLUMNS = ['user_id', 'user_message', 'bot_response', 'created_at', 'query_type']
+ROLLUP_COLUMNS = ['user_id', 'date', *NUTRIENTS, 'meal_count']
+
+
+def _copy_rows(model, columns, rows):
+    """Load rows with PostgreSQL COPY (tab-separated text format)"""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(
+            value.isoformat() if hasattr(value, 'isoformat') else str(value)
+            for value in row
+        ))
+        buffer.write('\n')
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.cursor.copy_expert(
+            f"COPY {model._meta.db_table} ({', '.join(columns)}) FROM STDIN",
+            buffer,
+        )
+
+
+def _insert_rows(model, columns, rows, copy):
+    if not rows:
+        return
+    if copy:
+        _copy_rows(model, columns, rows)
+    else:
+        objs = [model(**dict(zip(columns, row))) for row in rows]
+        model.objects.bulk_create(objs, batch_size=len(objs))
+        _restore_timestamps(model, columns, objs, rows)
+
+
+def _restore_timestamps(model, columns, objs, rows):
+    """
+    bulk_create stamps auto_now/auto_now_add fields (Meal.created_at) with the
+    current time; put the generated values back with bulk_update
+    """
+    stamped = [
+        field for field in model._meta.concrete_fields
+        if (getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False))
+        and field.attname in columns
+    ]
+    if not stamped:
+        return
+    for obj, row in zip(objs, rows):
+        for field in stamped:
+            setattr(obj, field.attname, row[columns.index(field.attname)])
+    model.objects.bulk_update(objs, [field.name for field in stamped], batch_size=len(objs))
+
+
+def food_rows(count, seed):
+    """
+    ``count`` distinct catalog rows (name, serving, *macros) shaped like a
+    branded food database, built from the bundled catalog; the same seed
+    always gives the same rows
+    """
+    rng = random.Random(f'{seed}:foods')
+    base = list(read_catalog(settings.FOOD_CATALOG_PATH))
+    brands = sorted({
+        ''.join(rng.choice(FOOD_BRAND_SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+        for _ in range(max(1000, count // 100))
+    })
+
+    names = set()
+    while len(names) < count:
+        name, serving, *macros = rng.choice(base)
+        full = ' '.join(part for part in (rng.choice(brands), rng.choice(FOOD_STYLES), name) if part)
+        if full in names:
+            continue
+        names.add(full)
+        scale = rng.uniform(0.8, 1.25)
+        yield (full, serving, *[round(value * scale, 1) for value in macros])
+
+
+def use_copy():
+    """COPY is used on PostgreSQL through psycopg2"""
+    return connection.vendor == 'postgresql' and connection.Database.__name__ == 'psycopg2'
+
+
+def generate_users(job):
+    """
+    Generate and write data for a slice of users.
+    ``job`` is (user_ids, first_index, options); returns row counts.
+    Runs in a worker process, so it starts from a fresh DB connection.
+    """
+    user_ids, first_index, options = job
+    connections.close_all()
+
+    today = timezone.now().date()
+    copy = options['copy'] and use_copy()
+    batch_size = options['batch_size']
+    counts = {'meals': 0, 'medications': 0, 'chats': 0}
+    meals, medications, chats, rollups = [], [], [], []
+
+    def flush():
+        with transaction.atomic():
+            _insert_rows(Meal, MEAL_COLUMNS, meals, copy)
+            _insert_rows(Medication, MEDICATION_COLUMNS, medications, copy)
+            _insert_rows(ChatMessage, CHAT_COLUMNS, chats, copy)
+            _insert_rows(DailyNutritionRollup, ROLLUP_COLUMNS, rollups, copy)
+        counts['meals'] += len(meals)
+        counts['medications'] += len(medications)
+        counts['chats'] += len(chats)
+        for rows in (meals, medications, chats, rollups):
+            rows.clear()
+
+    for offset, user_id in enumerate(user_ids):
+        user_meals, user_meds, user_chats = _user_rows(user_id, first_index + offset, options, today)
+        meals.extend(user_meals)
+        medications.extend(user_meds)
+        chats.extend(user_chats)
+
+        # Rollups are computed here rather than re-aggregated afterwards
+        days = {}
+        for row in user_meals:
+            day = row[8]
+            totals = days.setdefault(day, [0.0] * (len(NUTRIENTS) + 1))
+            for i in range(len(NUTRIENTS)):
+                totals[i] += row[3 + i]
+            totals[-1] += 1
+        rollups.extend((user_id, day, *totals[:-1], int(totals[-1])) for day, totals in days.items())
+
+        if len(meals) >= batch_size:
+            flush()
+
+    flush()
+    connections.close_all()
+    return counts
@@ -0,0 +1,1068 @@
+"""
+Tests for the health chatbot API
+Run with: python manage.py test health_chatbot
+"""
+import base64
+import csv
+import io
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import date, datetime, time as dt_time, timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.contrib import admin
+from django.core.cache import caches
+from django.db import DatabaseError, IntegrityError, connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import async_views, checks, conversations, foods, metrics, routers, search, users, views
+from .chatbot import HealthChatbot
+from .cache import MEALS, invalidate
+from .conversations import conversation_store
+from .dateranges import DateRange, parse_range
+from .documents import StaticDocument
+from .foods import load_catalog, read_catalog
+from .history import ChatHistoryWriter
+from .responses import Bold, ChatReply, Code
+from .synthetic import MEAL_COLUMNS, _insert_rows
+from .pagination import encode_cursor
+from .models import ApiKey, ChatMessage, DailyNutritionRollup, Meal, MealImport, Medication, UserProfile
+from .rollups import rebuild_rollups, record_meals
+from .users import DEMO_USER_DEFAULTS, invalidate_user
+
+
+class ChatbotTestCase(TestCase):
+    """
+    Runs each test as a fresh demo user with empty per-process caches
+    (users, responses, conversations, search and food indexes)
+    """
+
+    def setUp(self):
+        caches['default'].clear()
+        invalidate_user()
+        search._indexes.clear()
+        foods._index = None
+        self.user = UserProfile.objects.create(email=settings.DEMO_USER_EMAIL, **DEMO_USER_DEFAULTS)
+        conversation_store().forget(self.user.pk)
+        self.today = timezone.now().date()
+
+    def log_meals(self, days, per_day=3, calories=500):
+        """``per_day`` meals on each of the last ``days`` days, rollups included"""
+        meals = Meal.objects.bulk_create([
+            Meal(user=self.user, meal_name=f'Meal {i}', meal_time='lunch', calories=calories,
+                 protein=30, carbs=50, fat=20, fiber=5, date=self.today - timedelta(days=day))
+            for day in range(days) for i in range(per_day)
+        ])
+        record_meals(meals)
+        return meals
+
+    def chat(self, message):
+        return HealthChatbot(self.user).process_message(message)
+
+    @contextmanager
+    def assertMaxQueries(self, limit):
+        """Fail if the block runs more than ``limit`` queries (e.g. one per day again)"""
+        with CaptureQueriesContext(connection) as captured:
+            yield captured
+        if len(captured) > limit:
+            queries = '\n'.join(query['sql'] for query in captured.captured_queries)
+            self.fail(f'{len(captured)} queries run, at most {limit} expected:\n{queries}')
+
+
+class QueryCountTests(ChatbotTestCase):
+    """Multi-day answers use a fixed number of queries, however many days they cover"""
+
+    def setUp(self):
+        super().setUp()
+        self.log_meals(days=30)
+        # Resolve (and cache) the demo user outside the measured requests
+        self.client.get('/api/profile/')
+
+    def test_meals_list(self):
+        # The page, and the window's count and totals
+        with self.assertMaxQueries(2):
+            response = self.client.get('/api/meals/?days=30')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 90)
+
+    def test_summary(self):
+        for period in ('today', 'week', 'month'):
+            with self.subTest(period=period), self.assertMaxQueries(1):
+                response = self.client.get(f'/api/summary/?period={period}')
+                self.assertEqual(response.status_code, 200)
+
+    def test_summary_series(self):
+        date_from = self.today - timedelta(days=29)
+        for granularity in ('day', 'week', 'month'):
+            with self.subTest(granularity=granularity), self.assertMaxQueries(1):
+                response = self.client.get(
+                    f'/api/summary/?from={date_from}&to={self.today}&granularity={granularity}')
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(sum(bucket['meals_logged'] for bucket in response.json()['series']), 90)
+
+    def test_chat_answers(self):
+        for message, kind in [
+            ('Show my meals today', 'meals'),
+            ('Show my meals this week', 'meal_days'),
+            ('Show my meals this month', 'meal_days'),
+            ('Show my recent meals', 'meals'),
+            ('How many calories this week?', 'nutrition'),
+            ('How much protein this month?', 'nutrition'),
+            ('Am I meeting my goals?', 'goals'),
+        ]:
+            with self.subTest(message=message), self.assertMaxQueries(1):
+                self.assertEqual(self.chat(message).kind, kind)
+
+
+class LogMealIntentTests(ChatbotTestCase):
+    """Only messages that name catalog foods log them; "I had ..." questions are answered"""
+
+    def setUp(self):
+        super().setUp()
+        load_catalog(read_catalog(settings.FOOD_CATALOG_PATH), batch_size=500, copy=False)
+
+    def assertNotLogged(self, message, kind):
+        reply = self.chat(message)
+        self.assertEqual(reply.kind, kind)
+        self.assertFalse(Meal.objects.filter(user=self.user).exists())
+
+    def test_logs_catalog_foods(self):
+        reply = self.chat('Log 2 eggs and toast for breakfast')
+        self.assertEqual(reply.kind, 'meal_logged')
+        self.assertEqual(reply.fields['meal_time'], 'breakfast')
+        self.assertEqual(Meal.objects.filter(user=self.user).count(), 2)
+
+    def test_logs_after_i_had(self):
+        self.assertEqual(self.chat('I had oatmeal for breakfast').kind, 'meal_logged')
+
+    def assertUnmatched(self, message, unmatched):
+        reply = self.chat(message)
+        self.assertEqual(reply.kind, 'log_meal_help')
+        self.assertEqual(reply.fields['unmatched'], unmatched)
+        self.assertFalse(Meal.objects.filter(user=self.user).exists())
+
+    def test_zero_servings(self):
+        self.assertUnmatched('Log 0 eggs', ['0 eggs'])
+
+    def test_zero_denominator(self):
+        self.assertUnmatched('Log 1/0 banana', ['1/0 banana'])
+
+    def test_too_many_servings(self):
+        self.assertUnmatched('Log 2 eggs and 60 bananas', ['60 bananas'])
+
+    def test_question_starting_with_had(self):
+        self.assertNotLogged('Had I eaten enough protein today?', 'meals')
+
+    def test_medication_after_i_had(self):
+        self.assertNotLogged('I had a headache after my pill', 'medications')
+
+    def test_i_ate_without_a_food(self):
+        self.assertNotLogged('I ate too much yesterday', 'meals')
+
+
+class MealSearchChatTests(ChatbotTestCase):
+    """Questions about a food eaten search the user's meals for that food"""
+
+    def setUp(self):
+        super().setUp()
+        yesterday = self.today - timedelta(days=1)
+        meals = Meal.objects.bulk_create([
+            Meal(user=self.user, meal_name=name, meal_time='dinner', calories=500, date=day)
+            for name, day in [('Grilled salmon', self.today), ('Salmon with rice', yesterday),
+                              ('Chicken fried rice', yesterday), ('Oatmeal', self.today)]
+        ])
+        record_meals(meals)
+
+    def assertSearch(self, message, query, names, period=None):
+        data = self.chat(message).as_dict()
+        self.assertEqual(data['type'], 'meal_search')
+        self.assertEqual(data['query'], query)
+        self.assertEqual(data.get('period'), period)
+        self.assertEqual(sorted(item['meal_name'] for item in data['items']), names)
+
+    def test_eaten_with(self):
+        self.assertSearch('What did I eat with salmon', 'salmon', ['Grilled salmon', 'Salmon with rice'])
+
+    def test_food_eaten_not_its_side(self):
+        self.assertSearch('I ate salmon with rice yesterday', 'salmon', ['Salmon with rice'], 'Yesterday')
+
+    def test_did_i_eat(self):
+        self.assertSearch('When did I eat salmon?', 'salmon', ['Grilled salmon', 'Salmon with rice'])
+
+    def test_meals_with(self):
+        self.assertSearch('Show meals with fried rice', 'fried rice', ['Chicken fried rice'])
+
+    def test_no_food_named(self):
+        self.assertEqual(self.chat('What have I eaten this week?').kind, 'meal_days')
+        self.assertEqual(self.chat('I ate too much yesterday').kind, 'meals')
+
+
+class CacheFreshnessTests(ChatbotTestCase):
+    """Cached summaries and chat answers never outlive a write to the data they show"""
+
+    def setUp(self):
+        super().setUp()
+        self.meal = self.log_meals(days=1, per_day=1, calories=500)[0]
+
+    def write(self, method, path, data=None):
+        # Invalidation runs on commit, which TestCase's transaction never reaches by itself
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(path, data, content_type='application/json')
+        self.assertLess(response.status_code, 300, response.content)
+        return response
+
+    def assertCalories(self, expected):
+        summary = self.client.get('/api/summary/?period=today').json()
+        # Totals are null for a period without meals
+        self.assertEqual(summary['totals']['total_calories'] or 0, expected)
+        reply = self.chat('How many calories today?')
+        self.assertEqual(reply.as_dict()['totals']['calories'], expected)
+
+    def test_meal_create(self):
+        self.assertCalories(500)
+        self.write('post', '/api/meals/', {'meal_name': 'Apple', 'meal_time': 'snack', 'calories': 95})
+        self.assertCalories(595)
+
+    def test_meal_update(self):
+        self.assertCalories(500)
+        self.write('put', f'/api/meals/{self.meal.pk}/', {'calories': 650})
+        self.assertCalories(650)
+
+    def test_meal_moved_to_another_day(self):
+        self.assertCalories(500)
+        self.write('put', f'/api/meals/{self.meal.pk}/', {'date': str(self.today - timedelta(days=1))})
+        self.assertCalories(0)
+
+    def test_meal_delete(self):
+        self.assertCalories(500)
+        self.write('delete', f'/api/meals/{self.meal.pk}/')
+        self.assertCalories(0)
+
+    def test_follow_up_after_write_in_another_worker(self):
+        self.assertEqual(self.chat('How many calories today?').as_dict()['totals']['protein'], 30)
+        with self.assertMaxQueries(0):
+            self.assertEqual(self.chat('What about protein?').as_dict()['total'], 30)
+
+        # That worker has its own conversation store; only the response cache is shared
+        with mock.patch.object(conversations, '_store', conversations.MemoryConversationStore(10, 60)):
+            self.write('post', '/api/meals/', {'meal_name': 'Shake', 'meal_time': 'snack', 'calories': 120,
+                                               'protein': 25})
+
+        reply = self.chat('What about protein?').as_dict()
+        self.assertEqual(reply['totals']['protein'], 55)
+
+    def test_medication_create(self):
+        self.assertEqual(self.chat('Show my medications').as_dict()['items'], [])
+        self.write('post', '/api/medications/', {'drug_name': 'Metformin', 'dosage': '500mg',
+                                                 'frequency': 'twice_daily'})
+        items = self.chat('Show my medications').as_dict()['items']
+        self.assertEqual([item['drug_name'] for item in items], ['Metformin'])
+
+    def test_medication_admin_edit(self):
+        medication = Medication.objects.create(user=self.user, drug_name='Metformin', dosage='500mg',
+                                               frequency='twice_daily')
+        self.assertEqual(len(self.chat('Show my medications').as_dict()['items']), 1)
+        medication.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            admin.site._registry[Medication].save_model(RequestFactory().post('/admin/'), medication, None, True)
+        self.assertEqual(self.chat('Show my medications').as_dict()['items'], [])
+
+
+class AsyncParityTests(ChatbotTestCase):
+    """/api/async/ views answer exactly as their synchronous counterparts do"""
+
+    PATHS = ['/api/meals/', '/api/summary/', '/api/chat/history/', '/api/profile/', '/api/chat/']
+
+    def setUp(self):
+        super().setUp()
+        self.log_meals(days=3)
+        # Chat history rows are queued for the background writer; keep them in this test
+        patcher = mock.patch.object(async_views.chat_writer, 'offer', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def both(self, method, path, data=None, **extra):
+        """(sync response, async response) to the same request"""
+        kwargs = dict(extra)
+        if data is not None:
+            kwargs.update(data=json.dumps(data), content_type='application/json')
+        request = getattr(self.client, method)
+        return request(path, **kwargs), request(path.replace('/api/', '/api/async/', 1), **kwargs)
+
+    def assertSame(self, method, path, data=None, status=None, **extra):
+        sync, async_ = self.both(method, path, data, **extra)
+        self.assertEqual(async_.status_code, sync.status_code, path)
+        if status is not None:
+            self.assertEqual(sync.status_code, status, path)
+        self.assertEqual(async_.content, sync.content, path)
+        return sync
+
+    def test_auth_failure(self):
+        with override_settings(API_KEY_REQUIRED=True):
+            for path in ('/api/meals/', '/api/summary/'):
+                self.assertSame('get', path, status=401)
+            self.assertSame('get', '/api/profile/', status=401, HTTP_AUTHORIZATION='Bearer bh_unknown')
+            self.assertSame('post', '/api/chat/', {'message': 'hi'}, status=401)
+
+    def test_bad_params(self):
+        self.assertSame('get', '/api/meals/?cursor=garbage', status=400)
+        self.assertSame('get', '/api/summary/?from=2024-02-01&to=2024-01-01', status=400)
+        self.assertSame('get', '/api/summary/?from=2024-01-01&to=nope', status=400)
+        self.assertSame('get', '/api/chat/history/?cursor=garbage', status=400)
+        self.assertSame('post', '/api/chat/', {'message': ''}, status=400)
+        self.assertSame('post', '/api/chat/', {'message': 'hi', 'format': 'xml'}, status=400)
+
+    def test_happy_path(self):
+        for path in ('/api/meals/?days=7', '/api/summary/?period=week', '/api/profile/',
+                     f'/api/summary/?from={self.today - timedelta(days=6)}&to={self.today}&granularity=day'):
+            self.assertSame('get', path, status=200)
+
+        sync, async_ = self.both('post', '/api/chat/', {'message': 'Show my meals today', 'format': 'structured'})
+        self.assertEqual((sync.status_code, async_.status_code), (200, 200))
+        # Each answer carries its own timestamp
+        sync_body, async_body = sync.json(), async_.json()
+        del sync_body['timestamp'], async_body['timestamp']
+        self.assertEqual(async_body, sync_body)
+
+    def test_other_methods(self):
+        for path in self.PATHS:
+            for method in ('head', 'delete', 'put'):
+                self.assertSame(method, path)
+            sync, async_ = self.both('options', path)
+            self.assertEqual((sync.status_code, async_.status_code), (200, 200))
+            self.assertEqual(async_.json().keys(), sync.json().keys())
+            self.assertEqual(async_.json()['name'], sync.json()['name'])
+            # The async meals endpoint only lists; logging stays on the sync view
+            read_only = {'POST'} if path == '/api/meals/' else set()
+            self.assertEqual(set(async_['Allow'].split(', ')), set(sync['Allow'].split(', ')) - read_only)
+
+
+class ChatHistoryWriterTests(TransactionTestCase):
+    """
+    Queue overflow and shutdown of the deferred history writer. The writer
+    thread uses its own connection, so rows must be committed to be seen.
+    """
+
+    def setUp(self):
+        self.user = UserProfile.objects.create(email=settings.DEMO_USER_EMAIL, **DEMO_USER_DEFAULTS)
+        self.writer = ChatHistoryWriter(max_queue=2, batch_size=10)
+
+    def message(self, text):
+        return ChatMessage(user=self.user, user_message=text, bot_response='ok', created_at=timezone.now())
+
+    def fill(self):
+        """Fill the queue with no writer thread draining it"""
+        with mock.patch.object(self.writer, '_ensure_started'):
+            self.assertTrue(self.writer.offer(self.message('one')))
+            self.assertTrue(self.writer.offer(self.message('two')))
+
+    def test_offer_refuses_when_full(self):
+        self.fill()
+        with mock.patch.object(self.writer, '_ensure_started'):
+            self.assertFalse(self.writer.offer(self.message('three')))
+        self.assertEqual(self.writer.snapshot()['queued'], 2)
+        self.assertFalse(ChatMessage.objects.exists())
+
+    def test_submit_writes_inline_when_full(self):
+        self.fill()
+        with mock.patch.object(self.writer, '_ensure_started'):
+            self.writer.submit(self.message('three'), timeout=0.01)
+        self.assertEqual(list(ChatMessage.objects.values_list('user_message', flat=True)), ['three'])
+        self.assertEqual(self.writer.snapshot(), {'queued': 2, 'written': 0, 'inline': 1, 'dropped': 0})
+
+    def test_close_writes_pending_rows(self):
+        self.fill()
+        self.writer._ensure_started()
+        self.writer.close()
+        self.assertFalse(self.writer._thread.is_alive())
+        self.assertEqual(ChatMessage.objects.count(), 2)
+        self.assertEqual(self.writer.snapshot(), {'queued': 0, 'written': 2, 'inline': 0, 'dropped': 0})
+
+
+class ChatReplyTests(ChatbotTestCase):
+    """Exact rendered and structured forms of chatbot replies"""
+
+    def test_rendering(self):
+        reply = ChatReply('example', total=3, when=date(2024, 1, 2))
+        reply.heading('Title').line('Plain ', Bold('bold'), ' end').line()
+        reply.item({'n': 1}, '• ', Bold('one'))
+        reply.item({'n': 2})
+        reply.line(Code('x = 1', 'python'))
+
+        self.assertEqual(reply.markdown, '**Title**\n\nPlain **bold** end\n\n• **one**\n```python\nx = 1\n```')
+        self.assertEqual(reply.text, 'Title\n\nPlain bold end\n\n• one\nx = 1')
+        self.assertEqual(reply.as_dict(), {
+            'type': 'example', 'total': 3, 'when': date(2024, 1, 2), 'items': [{'n': 1}, {'n': 2}],
+        })
+        self.assertEqual(
+            reply.render('json'),
+            '{"type": "example", "total": 3, "when": "2024-01-02", "items": [{"n": 1}, {"n": 2}]}'
+        )
+        self.assertEqual(str(reply), reply.markdown)
+        with self.assertRaises(ValueError):
+            reply.render('html')
+
+    def test_items_key_only_for_lists(self):
+        self.assertEqual(ChatReply('greeting').as_dict(), {'type': 'greeting'})
+        self.assertEqual(ChatReply('medications', items=[], count=0).as_dict(),
+                         {'type': 'medications', 'count': 0, 'items': []})
+
+    def test_meals_reply(self):
+        self.log_meals(days=1, per_day=1)
+        reply = self.chat('Show my meals today')
+
+        self.assertEqual(reply.as_dict(), {
+            'type': 'meals', 'date': self.today, 'period': 'Today', 'total_calories': 500.0,
+            'items': [{'meal_time': 'lunch', 'meal_name': 'Meal 0', 'calories': 500.0,
+                       'protein': 30.0, 'carbs': 50.0, 'fat': 20.0, 'fiber': 5.0}],
+        })
+        self.assertEqual(reply.markdown, '\n'.join([
+            f'**Meals: Today ({self.today})**', '',
+            '**Lunch**: Meal 0',
+            '  • Calories: 500 kcal',
+            '  • Protein: 30.0g, Carbs: 50.0g, Fat: 20.0g', '',
+            '**Total Calories**: 500 kcal',
+        ]))
+        self.assertEqual(reply.text, '\n'.join([
+            f'Meals: Today ({self.today})', '',
+            'Lunch: Meal 0',
+            '  • Calories: 500 kcal',
+            '  • Protein: 30.0g, Carbs: 50.0g, Fat: 20.0g', '',
+            'Total Calories: 500 kcal',
+        ]))
+
+    def test_structured_chat_response(self):
+        response = self.client.post('/api/chat/', {'message': 'What medications am I taking?', 'format': 'structured'},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['data'], {'type': 'medications', 'count': 0, 'items': []})
+        self.assertNotIn('response', body)
+
+
+class SummarySeriesTests(ChatbotTestCase):
+    """/api/summary/ with from/to/granularity: one entry per bucket, empty ones zero-filled"""
+
+    ZERO = {f'total_{name}': 0 for name in ('calories', 'protein', 'carbs', 'fat', 'fiber')}
+
+    def log_on(self, *days):
+        record_meals(Meal.objects.bulk_create([
+            Meal(user=self.user, meal_name='Meal', meal_time='lunch', calories=500,
+                 protein=30, carbs=50, fat=20, fiber=5, date=day)
+            for day in days
+        ]))
+
+    def series(self, date_from, date_to, granularity):
+        response = self.client.get('/api/summary/', {'from': date_from, 'to': date_to, 'granularity': granularity})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_days_without_meals_are_zero(self):
+        self.log_on(date(2024, 1, 1), date(2024, 1, 3), date(2024, 1, 3))
+        data = self.series('2024-01-01', '2024-01-04', 'day')
+
+        self.assertEqual([(entry['start'], entry['meals_logged']) for entry in data['series']], [
+            ('2024-01-01', 1), ('2024-01-02', 0), ('2024-01-03', 2), ('2024-01-04', 0),
+        ])
+        empty = data['series'][1]
+        self.assertEqual(empty, {
+            'start': '2024-01-02', 'end': '2024-01-02', 'days': 1, 'meals_logged': 0,
+            'totals': self.ZERO,
+            'progress_percentage': {'calories': 0.0, 'protein': 0.0, 'carbs': 0.0, 'fat': 0.0, 'fiber': 0.0},
+        })
+        self.assertEqual(data['series'][2]['totals']['total_calories'], 1000)
+        self.assertEqual(data['meals_logged'], 3)
+        self.assertEqual(data['totals']['total_calories'], 1500)
+        self.assertEqual(data['date_range'], {'from': '2024-01-01', 'to': '2024-01-04', 'days': 4})
+
+    def test_range_without_meals(self):
+        data = self.series('2024-01-01', '2024-01-03', 'day')
+        self.assertEqual(len(data['series']), 3)
+        self.assertTrue(all(entry['totals'] == self.ZERO for entry in data['series']))
+        self.assertEqual(data['meals_logged'], 0)
+        self.assertEqual(data['totals'], self.ZERO)
+
+    def test_weeks_are_clipped_and_zero_filled(self):
+        # 2024-01-01 is a Monday; the range ends mid-week
+        self.log_on(date(2024, 1, 3))
+        data = self.series('2024-01-02', '2024-01-17', 'week')
+
+        self.assertEqual(
+            [(entry['start'], entry['end'], entry['days'], entry['meals_logged']) for entry in data['series']],
+            [('2024-01-02', '2024-01-07', 6, 1), ('2024-01-08', '2024-01-14', 7, 0), ('2024-01-15', '2024-01-17', 3, 0)]
+        )
+        self.assertEqual(data['series'][1]['totals'], self.ZERO)
+
+
+class MetricsTests(ChatbotTestCase):
+    """Server-Timing, /api/metrics/ and request profiling (MetricsMiddleware)"""
+
+    def test_off_by_default(self):
+        self.assertFalse(settings.METRICS_ENABLED)
+        self.assertEqual(settings.PROFILE_DIR, '')
+        response = self.client.get('/api/meals/', HTTP_X_PROFILE='token')
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 404)
+
+    @override_settings(METRICS_ENABLED=True)
+    def test_server_timing(self):
+        self.log_meals(days=2)
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get('/api/meals/?days=7')
+        self.assertRegex(
+            response['Server-Timing'],
+            rf'^total;dur=[\d.]+, db;dur=[\d.]+;desc="{len(captured)} queries", serializer;dur=[\d.]+$'
+        )
+
+        response = self.client.post('/api/chat/', {'message': 'Show my meals today'}, content_type='application/json')
+        self.assertRegex(response['Server-Timing'], r', chatbot;dur=[\d.]+$')
+
+    @override_settings(METRICS_ENABLED=True)
+    def test_prometheus_output(self):
+        before = metrics.REQUEST_DURATION.series.get(('meals_list', 'GET'), {}).get('count', 0)
+        self.client.get('/api/meals/')
+        response = self.client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4')
+        lines = response.content.decode().splitlines()
+        self.assertIn('# TYPE health_request_duration_seconds histogram', lines)
+        self.assertIn(f'health_request_duration_seconds_count{{route="meals_list",method="GET"}} {before + 1}', lines)
+
+    def test_histogram_rendering(self):
+        histogram = metrics.Histogram('test_seconds', 'Test timings', ('route',), buckets=(0.1, 1.0))
+        histogram.observe(('a"b',), 0.05)
+        histogram.observe(('a"b',), 0.5)
+        self.assertEqual(histogram.render(), [
+            '# HELP test_seconds Test timings',
+            '# TYPE test_seconds histogram',
+            'test_seconds_bucket{route="a\\"b",le="0.1"} 1',
+            'test_seconds_bucket{route="a\\"b",le="1.0"} 2',
+            'test_seconds_bucket{route="a\\"b",le="+Inf"} 2',
+            'test_seconds_sum{route="a\\"b"} 0.550000',
+            'test_seconds_count{route="a\\"b"} 2',
+        ])
+
+    def test_profiling(self):
+        with tempfile.TemporaryDirectory() as profile_dir:
+            # Metrics on, but profiling stays off until PROFILE_DIR is set
+            with override_settings(METRICS_ENABLED=True, PROFILE_TOKEN='token'):
+                self.client.get('/api/meals/', HTTP_X_PROFILE='token')
+            self.assertEqual(os.listdir(profile_dir), [])
+
+            with override_settings(METRICS_ENABLED=True, PROFILE_DIR=profile_dir, PROFILE_TOKEN='token'):
+                self.client.get('/api/meals/')
+                self.client.get('/api/meals/', HTTP_X_PROFILE='wrong')
+                self.assertEqual(os.listdir(profile_dir), [])
+                self.client.get('/api/meals/', HTTP_X_PROFILE='token')
+            [name] = os.listdir(profile_dir)
+            self.assertTrue(name.endswith('-meals_list.prof'))
+
+
+class StaticDocumentTests(SimpleTestCase):
+    """ETags and conditional requests for the in-memory documents"""
+
+    def test_matching_etag_gets_304(self):
+        response = self.client.get('/api/openapi.yaml')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        for if_none_match in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+            with self.subTest(if_none_match=if_none_match):
+                response = self.client.get('/api/openapi.yaml', HTTP_IF_NONE_MATCH=if_none_match)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+                self.assertEqual(response.content, b'')
+
+        response = self.client.get('/api/openapi.yaml', HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_each_encoding_has_its_own_etag(self):
+        plain = self.client.get('/api/privacy/')
+        gzipped = self.client.get('/api/privacy/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(gzipped['Content-Encoding'], 'gzip')
+        self.assertNotEqual(gzipped['ETag'], plain['ETag'])
+        # Either encoding's ETag revalidates the document
+        response = self.client.get('/api/privacy/', HTTP_IF_NONE_MATCH=plain['ETag'], HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_after_write(self):
+        with tempfile.TemporaryDirectory() as base_dir, override_settings(BASE_DIR=base_dir, DEBUG=True):
+            path = os.path.join(base_dir, 'spec.yaml')
+            document = StaticDocument('spec.yaml', 'application/x-yaml')
+            request = RequestFactory().get('/')
+
+            with open(path, 'w') as f:
+                f.write('openapi: 3.0.0\n')
+            first = document.response(request)
+            self.assertEqual(first.content, b'openapi: 3.0.0\n')
+
+            with open(path, 'w') as f:
+                f.write('openapi: 3.1.0\n')
+            # Coarse filesystem clocks may not move the mtime within one test
+            os.utime(path, (time.time() + 1, time.time() + 1))
+            second = document.response(RequestFactory().get('/', HTTP_IF_NONE_MATCH=first['ETag']))
+            self.assertEqual(second.status_code, 200)
+            self.assertEqual(second.content, b'openapi: 3.1.0\n')
+            self.assertNotEqual(second['ETag'], first['ETag'])
+
+
+class PaginationTests(ChatbotTestCase):
+    """Keyset cursors for /api/meals/ and /api/chat/history/"""
+
+    def walk(self, path, key):
+        """Follow next_cursor to the end; every row's id, in page order"""
+        ids, cursor = [], None
+        while True:
+            response = self.client.get(path + (f'&cursor={cursor}' if cursor else ''))
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            ids += [row['id'] for row in body[key]]
+            cursor = body['next_cursor']
+            if cursor is None:
+                return ids
+
+    def test_meal_cursors_round_trip(self):
+        self.log_meals(days=4, per_day=3)
+        expected = list(Meal.objects.order_by('-date', '-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(self.walk('/api/meals/?days=7&page_size=2', 'meals'), expected)
+
+    def test_equal_timestamps_break_ties_on_id(self):
+        # Same day and same created_at: only the id orders them, and none may be skipped or repeated
+        meals = self.log_meals(days=1, per_day=5)
+        Meal.objects.update(created_at=timezone.now())
+        expected = sorted((meal.pk for meal in meals), reverse=True)
+        self.assertEqual(self.walk('/api/meals/?days=1&page_size=2', 'meals'), expected)
+
+        now = timezone.now()
+        messages = ChatMessage.objects.bulk_create([
+            ChatMessage(user=self.user, user_message=f'hi {i}', bot_response='ok', created_at=now)
+            for i in range(5)
+        ])
+        expected = sorted((message.pk for message in messages), reverse=True)
+        self.assertEqual(self.walk('/api/chat/history/?limit=2', 'messages'), expected)
+
+    def test_bad_cursors_are_rejected(self):
+        self.log_meals(days=1)
+        now = timezone.now().isoformat()
+        cursors = [
+            'garbage',
+            'é',
+            encode_cursor(['2024-01-01', now]),
+            encode_cursor(['2024-13-45', now, 1]),
+            encode_cursor(['2024-01-01', 'noon', 1]),
+            encode_cursor(['2024-01-01', now, 'one']),
+            encode_cursor(['2024-01-01', now, 10 ** 30]),
+            base64.urlsafe_b64encode(b'{"date": "2024-01-01"}').decode(),
+        ]
+        for cursor in cursors:
+            for path in ('/api/meals/', '/api/chat/history/'):
+                with self.subTest(cursor=cursor, path=path):
+                    response = self.client.get(path, {'cursor': cursor})
+                    self.assertEqual(response.status_code, 400)
+                    self.assertEqual(response.json(), {'error': 'Invalid cursor'})
+
+
+class RollupTests(ChatbotTestCase):
+    """Every meal write path keeps the daily rollups equal to a rebuild from raw meals"""
+
+    def setUp(self):
+        super().setUp()
+        self.meals = self.log_meals(days=2, per_day=2, calories=400)
+        self.yesterday = self.today - timedelta(days=1)
+        self.request = RequestFactory().post('/admin/')
+
+    def rollups(self):
+        return list(DailyNutritionRollup.objects.filter(user=self.user).order_by('date')
+                    .values_list('date', 'meal_count', 'calories', 'protein'))
+
+    def assertRollupsMatchMeals(self, expected):
+        self.assertEqual(self.rollups(), expected)
+        rebuild_rollups(self.user)
+        self.assertEqual(self.rollups(), expected)
+
+    def write(self, func):
+        with self.captureOnCommitCallbacks(execute=True):
+            return func()
+
+    def test_update_moves_date(self):
+        response = self.write(lambda: self.client.put(
+            f'/api/meals/{self.meals[0].pk}/', {'date': str(self.yesterday), 'calories': 300},
+            content_type='application/json'))
+        self.assertEqual(response.status_code, 200)
+        self.assertRollupsMatchMeals([(self.yesterday, 3, 1100, 90), (self.today, 1, 400, 30)])
+
+    def test_delete(self):
+        for meal in self.meals[:2]:
+            self.assertEqual(self.write(lambda: self.client.delete(f'/api/meals/{meal.pk}/')).status_code, 200)
+        # The day's last meal takes its rollup row with it
+        self.assertRollupsMatchMeals([(self.yesterday, 2, 800, 60)])
+
+    def test_bulk_create(self):
+        meals = [{'meal_name': 'Soup', 'meal_time': 'lunch', 'calories': 250, 'protein': 10, 'date': str(day)}
+                 for day in (self.today, self.yesterday, self.yesterday)]
+        response = self.write(lambda: self.client.post('/api/meals/bulk/', {'meals': meals},
+                                                       content_type='application/json'))
+        self.assertEqual(response.status_code, 201)
+        self.assertRollupsMatchMeals([(self.yesterday, 4, 1300, 80), (self.today, 3, 1050, 70)])
+
+    def test_admin_create(self):
+        meal = Meal(user=self.user, meal_name='Toast', meal_time='breakfast', calories=150, protein=5,
+                    date=self.today)
+        self.write(lambda: admin.site._registry[Meal].save_model(self.request, meal, None, False))
+        self.assertRollupsMatchMeals([(self.yesterday, 2, 800, 60), (self.today, 3, 950, 65)])
+
+    def test_admin_update_moves_date(self):
+        meal = Meal.objects.get(pk=self.meals[0].pk)
+        meal.date = self.yesterday
+        self.write(lambda: admin.site._registry[Meal].save_model(self.request, meal, None, True))
+        self.assertRollupsMatchMeals([(self.yesterday, 3, 1200, 90), (self.today, 1, 400, 30)])
+        # Cached answers see the admin edit too
+        self.assertEqual(self.client.get('/api/summary/?period=today').json()['totals']['total_calories'], 400)
+
+    def test_admin_delete(self):
+        self.write(lambda: admin.site._registry[Meal].delete_model(self.request, self.meals[0]))
+        self.assertRollupsMatchMeals([(self.yesterday, 2, 800, 60), (self.today, 1, 400, 30)])
+
+    def test_admin_delete_selected(self):
+        self.assertEqual(self.client.get('/api/summary/?period=today').json()['totals']['total_calories'], 800)
+        selected = Meal.objects.filter(pk__in=[self.meals[0].pk, self.meals[2].pk, self.meals[3].pk])
+        self.write(lambda: admin.site._registry[Meal].delete_queryset(self.request, selected))
+        self.assertRollupsMatchMeals([(self.today, 1, 400, 30)])
+        self.assertEqual(self.client.get('/api/summary/?period=today').json()['totals']['total_calories'], 400)
+
+    def test_rollup_admin_is_read_only(self):
+        rollup_admin = admin.site._registry[DailyNutritionRollup]
+        self.assertFalse(rollup_admin.has_add_permission(self.request))
+        self.assertFalse(rollup_admin.has_change_permission(self.request))
+        self.assertFalse(rollup_admin.has_delete_permission(self.request))
+
+
+class MealBulkTests(ChatbotTestCase):
+    """POST /api/meals/bulk/ with an Idempotency-Key logs an upload's meals at most once"""
+
+    VALID = {'meal_name': 'Oatmeal', 'meal_time': 'breakfast', 'calories': 350}
+    INVALID = {'meal_time': 'breakfast', 'calories': -5}
+
+    def post(self, meals, key='import-1'):
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+        return self.client.post('/api/meals/bulk/', {'meals': meals}, content_type='application/json',
+                                **headers)
+
+    def meal_count(self):
+        return Meal.objects.filter(user=self.user).count()
+
+    def test_replay(self):
+        first = self.post([self.VALID, self.VALID])
+        self.assertEqual(first.status_code, 201)
+        again = self.post([self.VALID, self.VALID])
+        self.assertEqual(again.status_code, 201)
+        self.assertEqual(again.json(), first.json())
+        self.assertEqual(self.meal_count(), 2)
+
+    def test_partial_failure(self):
+        response = self.post([self.VALID, self.INVALID])
+        self.assertEqual(response.status_code, 207)
+        data = response.json()
+        self.assertEqual((data['created'], data['failed']), (1, 1))
+        self.assertEqual([result['status'] for result in data['results']], ['created', 'error'])
+        self.assertIn('meal', data['results'][0])
+
+        # Fixing the failed item doesn't log the first one again
+        self.assertEqual(self.post([self.VALID, self.VALID]).json(), data)
+        self.assertEqual(self.meal_count(), 1)
+
+    def test_rejected_upload_can_be_retried(self):
+        self.assertEqual(self.post([self.INVALID]).status_code, 400)
+        self.assertFalse(MealImport.objects.exists())
+
+        response = self.post([self.VALID])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 1)
+        self.assertEqual(self.meal_count(), 1)
+
+    def test_concurrent_request_with_same_key(self):
+        # The other request stored its result after this one checked for it
+        winner = MealImport.objects.create(user=self.user, idempotency_key='import-1', status_code=201,
+                                           response={'created': 1})
+        with mock.patch.object(views, '_previous_import', side_effect=[None, winner]):
+            response = self.post([self.VALID])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {'created': 1})
+        self.assertEqual(self.meal_count(), 0)
+
+    def test_integrity_error_without_key(self):
+        with mock.patch.object(views, 'record_meals', side_effect=IntegrityError), \
+                self.assertRaises(IntegrityError):
+            self.post([self.VALID], key=None)
+        self.assertEqual(self.meal_count(), 0)
+
+
+@override_settings(EXPORT_CHUNK_SIZE=500)
+class ExportTests(ChatbotTestCase):
+    """GET /api/export/ streams rows in chunks instead of loading the whole history"""
+
+    ROWS = 10000
+
+    def setUp(self):
+        super().setUp()
+        Meal.objects.bulk_create(
+            [Meal(user=self.user, meal_name=f'Meal {i}', meal_time='lunch', calories=i, date=self.today)
+             for i in range(self.ROWS)],
+            batch_size=5000,
+        )
+
+    def traced_peak(self, func):
+        """(result, peak bytes allocated while it ran)"""
+        tracemalloc.start()
+        try:
+            result = func()
+            return result, tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def consume(self, export_format):
+        response = self.client.get(f'/api/export/?format={export_format}')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        # Count the rows without keeping them
+        return sum(chunk.count(b'\n') for chunk in response.streaming_content)
+
+    def test_memory_does_not_grow_with_history(self):
+        # What holding every exported meal row at once would take
+        _, materialised = self.traced_peak(
+            lambda: list(Meal.objects.filter(user=self.user).values_list().iterator(chunk_size=self.ROWS)))
+
+        for export_format, header_lines in (('ndjson', 0), ('csv', 1)):
+            with self.subTest(format=export_format):
+                lines, peak = self.traced_peak(lambda: self.consume(export_format))
+                self.assertEqual(lines, self.ROWS + header_lines)
+                self.assertLess(peak, materialised / 4)
+
+    def test_formats_agree_on_timestamps(self):
+        meal = Meal.objects.filter(user=self.user).order_by('id').first()
+        response = self.client.get('/api/export/?format=ndjson')
+        record = json.loads(next(iter(response.streaming_content)))
+
+        response = self.client.get('/api/export/?format=csv')
+        rows = csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode()))
+        row = next(rows)
+
+        self.assertEqual(record['created_at'], meal.created_at.isoformat())
+        self.assertEqual(row['created_at'], meal.created_at.isoformat())
+        self.assertEqual(record['date'], row['date'])
+
+
+class DateRangeTests(SimpleTestCase):
+    """Date phrases are whole words: "weekend" and "monthly" name no range"""
+
+    TODAY = date(2024, 3, 15)
+
+    def parse(self, message):
+        return parse_range(message, self.TODAY)
+
+    def test_this_week_and_month(self):
+        self.assertEqual(self.parse('how many calories this week?'),
+                         DateRange(date(2024, 3, 9), self.TODAY, 'This Week'))
+        self.assertEqual(self.parse('show my meals this month'),
+                         DateRange(date(2024, 2, 15), self.TODAY, 'This Month'))
+
+    def test_weekend(self):
+        self.assertIsNone(self.parse('what did i eat this weekend?'))
+        self.assertIsNone(self.parse('show my meals from last weekend'))
+
+    def test_monthly(self):
+        self.assertIsNone(self.parse('what is my monthly calorie average?'))
+
+    def test_range_after_longer_word(self):
+        self.assertEqual(self.parse('weekend meals in the past 3 days').title, 'Past 3 Days')
+
+    def test_days_inside_longer_words(self):
+        # "mondays" is no Monday, so the range is the week that follows it
+        self.assertEqual(self.parse('mondays last week'), self.parse('last week'))
+        self.assertIsNone(self.parse('since todays weigh-in'))
+        self.assertIsNone(self.parse('since yesterdayish'))
+        self.assertEqual(self.parse("yesterday's meals"), DateRange(date(2024, 3, 14), date(2024, 3, 14), 'Yesterday'))
+
+
+LOCMEM_CACHE = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+SHARED_CACHE = {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'cache'}
+
+
+class SyntheticInsertTests(ChatbotTestCase):
+    """Generated rows keep their generated timestamps"""
+
+    def test_meal_created_at_survives_bulk_create(self):
+        # The non-COPY path; auto_now_add would otherwise stamp every meal with now
+        days = [self.today - timedelta(days=n) for n in (1, 3)]
+        stamps = [timezone.make_aware(datetime.combine(day, dt_time(8))) for day in days]
+        rows = [
+            (self.user.pk, 'Oatmeal', 'breakfast', 350, 12, 58, 8, 8, day, stamp, '')
+            for day, stamp in zip(days, stamps)
+        ]
+        _insert_rows(Meal, MEAL_COLUMNS, rows, copy=False)
+        self.assertEqual(list(Meal.objects.order_by('-date').values_list('created_at', flat=True)), stamps)
+
+
+class ReplicaPinCacheTests(TestCase):
+    """With read replicas, primary pins must be visible to every worker"""
+
+    LOCMEM = LOCMEM_CACHE
+    SHARED = SHARED_CACHE
+
+    def check_ids(self, replicas, cache):
+        with mock.patch.object(checks, 'replica_aliases', return_value=replicas), \
+                override_settings(CACHES={'default': self.LOCMEM, 'pins': cache},
+                                  REPLICA_PIN_CACHE_ALIAS='pins'):
+            return [error.id for error in checks.check_pin_cache(None)]
+
+    def test_per_process_cache_rejected_with_replicas(self):
+        self.assertEqual(self.check_ids(['replica1'], self.LOCMEM), ['health_chatbot.E001'])
+
+    def test_shared_cache_accepted(self):
+        self.assertEqual(self.check_ids(['replica1'], self.SHARED), [])
+
+    def test_any_cache_accepted_without_replicas(self):
+        self.assertEqual(self.check_ids([], self.LOCMEM), [])
+
+
+@override_settings(REPLICA_MAX_LAG=5, REPLICA_HEALTH_CHECK_INTERVAL=10, REPLICA_STICKY_SECONDS=10)
+class ReplicaRoutingTests(ChatbotTestCase):
+    """Reads go to a healthy, caught-up replica, else the primary; writers read their own writes"""
+
+    REPLICAS = ['replica1', 'replica2']
+
+    def setUp(self):
+        super().setUp()
+        routers._health.clear()
+        patcher = mock.patch.object(routers, 'replica_aliases', return_value=self.REPLICAS)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(routers._health.clear)
+
+    def replica_connection(self, lag=0.0, error=False):
+        """A PostgreSQL replica connection whose lag probe returns ``lag`` seconds (or fails)"""
+        replica = mock.MagicMock(vendor='postgresql')
+        cursor = replica.cursor.return_value.__enter__.return_value
+        cursor.fetchone.return_value = (lag,)
+        if error:
+            cursor.execute.side_effect = DatabaseError('connection refused')
+        return replica
+
+    def chosen(self, count=4):
+        return [routers.choose_replica() for _ in range(count)]
+
+    def test_round_robin_over_healthy_replicas(self):
+        with mock.patch.object(routers, '_check', return_value=True):
+            self.assertEqual(set(self.chosen()), set(self.REPLICAS))
+
+    def test_lagging_replica_excluded(self):
+        probes = {'replica1': self.replica_connection(lag=30), 'replica2': self.replica_connection(lag=1)}
+        with mock.patch.object(routers, 'connections', probes):
+            self.assertEqual(self.chosen(), ['replica2'] * 4)
+
+    def test_failover_to_primary(self):
+        probes = {'replica1': self.replica_connection(error=True), 'replica2': self.replica_connection(lag=30)}
+        with mock.patch.object(routers, 'connections', probes):
+            self.assertEqual(self.chosen(), ['default'] * 4)
+        # A failed connection is closed so the next check reconnects
+        probes['replica1'].close.assert_called_once()
+
+    def test_health_cached_between_checks(self):
+        with mock.patch.object(routers, '_check', return_value=False) as check:
+            self.chosen()
+            self.assertEqual(check.call_count, 2)
+            with override_settings(REPLICA_HEALTH_CHECK_INTERVAL=0):
+                self.chosen(1)
+            self.assertEqual(check.call_count, 4)
+
+    def test_reads_routed_to_replica(self):
+        router = routers.ReplicaRouter()
+        with mock.patch.object(routers, '_check', return_value=True):
+            self.assertEqual(router.db_for_read(Meal), 'default')
+            with routers.replica_reads(self.user.pk):
+                self.assertIn(router.db_for_read(Meal), self.REPLICAS)
+                self.assertEqual(router.db_for_write(Meal), 'default')
+
+    def test_writer_reads_own_writes(self):
+        router = routers.ReplicaRouter()
+        with mock.patch.object(routers, '_check', return_value=True):
+            invalidate(self.user.pk, MEALS)
+            with routers.replica_reads(self.user.pk):
+                self.assertEqual(router.db_for_read(Meal), 'default')
+
+            # Users who haven't written still read from replicas
+            with routers.replica_reads(self.user.pk + 1):
+                self.assertIn(router.db_for_read(Meal), self.REPLICAS)
+
+            with override_settings(REPLICA_STICKY_SECONDS=0.01):
+                invalidate(self.user.pk, MEALS)
+            time.sleep(0.05)
+            with routers.replica_reads(self.user.pk):
+                self.assertIn(router.db_for_read(Meal), self.REPLICAS)
+
+
+class ApiKeyCacheCheckTests(TestCase):
+    """With API keys required, revocations must be visible to every worker"""
+
+    def check_ids(self, required, cache):
+        with override_settings(CACHES={'default': LOCMEM_CACHE, 'keys': cache},
+                               API_KEY_CACHE_ALIAS='keys', API_KEY_REQUIRED=required):
+            return [error.id for error in checks.check_api_key_cache(None)]
+
+    def test_per_process_cache_rejected(self):
+        self.assertEqual(self.check_ids(True, LOCMEM_CACHE), ['health_chatbot.E002'])
+
+    def test_shared_cache_accepted(self):
+        self.assertEqual(self.check_ids(True, SHARED_CACHE), [])
+
+    def test_any_cache_accepted_without_keys_required(self):
+        self.assertEqual(self.check_ids(False, LOCMEM_CACHE), [])
+
+
+class ApiKeyRevocationTests(ChatbotTestCase):
+    """A revoked key stops working at once, including in processes that had it cached"""
+
+    def setUp(self):
+        super().setUp()
+        self.api_key, key = users.create_api_key(self.user)
+        self.headers = {'HTTP_AUTHORIZATION': f'Bearer {key}'}
+        self.assertEqual(self.client.get('/api/profile/', **self.headers).status_code, 200)
+
+    def test_revoked_key_rejected(self):
+        self.api_key.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.api_key.save()
+        self.assertEqual(self.client.get('/api/profile/', **self.headers).status_code, 401)
+
+    def test_revoked_in_another_process(self):
+        # This process still has the key cached; another revokes it: the row
+        # changes, and that process's signal bumps the shared revocation counter
+        ApiKey.objects.filter(pk=self.api_key.pk).update(is_active=False)
+        self.assertEqual(self.client.get('/api/profile/', **self.headers).status_code, 200)
+        users._bump_revocations()
+        self.assertEqual(self.client.get('/api/profile/', **self.headers).status_code, 401)
+
+    def test_revoked_key_rejected_by_another_resolver(self):
+        key = self.headers['HTTP_AUTHORIZATION'].split()[1]
+        # Another worker: its own profile and key caches, the same shared cache
+        other_worker = mock.patch.multiple(users, _profiles=users.LRUCache(10), _lookups=users.LRUCache(10))
+        with other_worker:
+            self.assertEqual(users.get_key_user(key), self.user)
+
+        self.api_key.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.api_key.save()
+
+        with other_worker, self.assertMaxQueries(1):
+            self.assertIsNone(users.get_key_user(key))
+
+    def test_cached_key_costs_no_query(self):
+        with self.assertMaxQueries(0):
+            self.assertEqual(self.client.get('/api/profile/', **self.headers).status_code, 200)
@@ -2,11 +2,12 @@
 URL configuration for Health Chatbot API
 """
 from django.urls import path
-from . import views
+from . import views, async_views
 
 urlpatterns = [
     # Health check
     path('health/', views.health_check, name='health_check'),
+    path('metrics/', views.metrics, name='metrics'),
 
     # OpenAPI specification
     path('openapi.yaml', views.openapi_spec, name='openapi_spec'),
@@ -15,10 +16,23 @@ urlpatterns = [
     path('chat/', views.chat, name='chat'),
     path('chat/history/', views.chat_history, name='chat_history'),
 
+    # Async (ASGI) endpoints
+    path('async/chat/', async_views.chat, name='async_chat'),
+    path('async/chat/history/', async_views.chat_history, name='async_chat_history'),
+    path('async/meals/', async_views.meals_list, name='async_meals_list'),
+    path('async/summary/', async_views.summary, name='async_summary'),
+    path('async/profile/', async_views.user_profile, name='async_user_profile'),
+
     # Meal endpoints
     path('meals/', views.meals_list, name='meals_list'),
+    path('meals/bulk/', views.meals_bulk, name='meals_bulk'),
+    path('meals/search/', views.meals_search, name='meals_search'),
+    path('meals/autocomplete/', views.meals_autocomplete, name='meals_autocomplete'),
     path('meals/<int:meal_id>/', views.meal_detail, name='meal_detail'),
 
+    # Food catalog
+    path('foods/', views.foods_list, name='foods_list'),
+
     # Medication endpoints
     path('medications/', views.medications_list, name='medications_list'),
     path('medications/<int:med_id>/', views.medication_detail, name='medication_detail'),
@@ -26,6 +40,9 @@ urlpatterns = [
     # Summary endpoints
     path('summary/', views.summary, name='summary'),
 
+    # Data export
+    path('export/', views.export_data, name='export_data'),
+
     # User profile
     path('profile/', views.user_profile, name='user_profile'),
 
@@ -0,0 +1,243 @@
+"""
+User resolution
+A request is served as the user owning its API key (``Authorization: Bearer
+<key>`` or ``X-API-Key: <key>``), or as the demo user when it carries none.
+Resolved profiles are kept in a bounded per-process LRU (with a TTL), so a
+returning user costs no query and a new one costs one indexed lookup.
+Key lookups are filed under a revocation generation kept in a shared cache,
+so revoking a key takes effect in every process at once.
+"""
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import ApiKey, UserProfile
+
+
+DEMO_USER_DEFAULTS = {
+    'name': 'Demo User',
+    'age': 30,
+    'daily_calorie_goal': 2000,
+    'daily_protein_goal': 150,
+    'daily_carbs_goal': 250,
+    'daily_fat_goal': 65,
+    'daily_fiber_goal': 30,
+}
+
+API_KEY_PREFIX = 'bh_'
+
+
+class LRUCache:
+    """Thread-safe least-recently-used mapping whose entries expire after a TTL"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _cache_ttl():
+    return getattr(settings, 'USER_CACHE_TTL', 300)
+
+
+def _cache_size():
+    return getattr(settings, 'USER_CACHE_SIZE', 10000)
+
+
+# user id -> profile, and ('email', email) / ('key', key_hash) -> user id.
+# Profiles are invalidated by id, whichever way they were looked up.
+_profiles = LRUCache(_cache_size())
+_lookups = LRUCache(_cache_size())
+
+
+def _cached(lookup):
+    user_id = _lookups.get(lookup)
+    if user_id is None:
+        return None
+    return _profiles.get(user_id)
+
+
+def _remember(lookup, user):
+    ttl = _cache_ttl()
+    _profiles.set(user.pk, user, ttl)
+    _lookups.set(lookup, user.pk, ttl)
+
+
+def get_demo_user():
+    """Get or create demo user (cached per process)"""
+    email = settings.DEMO_USER_EMAIL
+    user = _cached(('email', email))
+    if user is None:
+        user, created = UserProfile.objects.get_or_create(
+            email=email,
+            defaults=DEMO_USER_DEFAULTS,
+        )
+        _remember(('email', email), user)
+    return user
+
+
+async def aget_demo_user():
+    """Async get_demo_user"""
+    email = settings.DEMO_USER_EMAIL
+    user = _cached(('email', email))
+    if user is None:
+        user, created = await UserProfile.objects.aget_or_create(
+            email=email,
+            defaults=DEMO_USER_DEFAULTS,
+        )
+        _remember(('email', email), user)
+    return user
+
+
+_REVOCATIONS_KEY = 'health:apikeys:revocations'
+
+
+def _revocation_cache():
+    return caches[getattr(settings, 'API_KEY_CACHE_ALIAS', 'default')]
+
+
+def _revocations():
+    """How many keys have ever been revoked or deleted (as far as the cache knows)"""
+    return _revocation_cache().get(_REVOCATIONS_KEY, 0)
+
+
+async def _arevocations():
+    return await _revocation_cache().aget(_REVOCATIONS_KEY, 0)
+
+
+def _bump_revocations():
+    cache = _revocation_cache()
+    if not cache.add(_REVOCATIONS_KEY, 1, None):
+        try:
+            cache.incr(_REVOCATIONS_KEY)
+        except ValueError:
+            cache.set(_REVOCATIONS_KEY, 1, None)
+
+
+def hash_api_key(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def create_api_key(user, name=''):
+    """Issue a new key for a user; returns (ApiKey, key). The key is not stored."""
+    key = API_KEY_PREFIX + secrets.token_urlsafe(32)
+    api_key = ApiKey.objects.create(
+        user=user,
+        name=name,
+        prefix=key[:len(API_KEY_PREFIX) + 6],
+        key_hash=hash_api_key(key),
+    )
+    return api_key, key
+
+
+def _active_key(key_hash):
+    return ApiKey.objects.select_related('user').filter(key_hash=key_hash, is_active=True)
+
+
+def get_key_user(key):
+    """Profile owning an active API key, or None"""
+    lookup = ('key', hash_api_key(key), _revocations())
+    user = _cached(lookup)
+    if user is None:
+        api_key = _active_key(lookup[1]).first()
+        if api_key is None:
+            return None
+        user = api_key.user
+        _remember(lookup, user)
+    return user
+
+
+async def aget_key_user(key):
+    """Async get_key_user"""
+    lookup = ('key', hash_api_key(key), await _arevocations())
+    user = _cached(lookup)
+    if user is None:
+        api_key = await _active_key(lookup[1]).afirst()
+        if api_key is None:
+            return None
+        user = api_key.user
+        _remember(lookup, user)
+    return user
+
+
+def request_api_key(request):
+    """The API key sent with a request (Bearer token or X-API-Key), or None"""
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() == 'bearer' and token.strip():
+        return token.strip()
+    return request.headers.get('X-API-Key', '').strip() or None
+
+
+def invalidate_user(user_id=None):
+    """Drop a cached profile (or all of them when no id is given)"""
+    if user_id is None:
+        _profiles.clear()
+        _lookups.clear()
+    else:
+        _profiles.pop(user_id)
+
+
+def forget_api_key(key_hash):
+    """
+    Stop serving a revoked or deleted key from any process's cache. Bumping
+    the revocation generation makes every cached key lookup miss (each key
+    then costs one indexed query again); it waits for the commit so no
+    process can re-cache the key as still active.
+    """
+    transaction.on_commit(_bump_revocations)
+
+
+def get_request_user(request):
+    """
+    Resolve the profile for a request, at most once per request.
+    Accepts either a Django HttpRequest or a DRF Request. ApiKeyMiddleware
+    sets the profile for requests carrying an API key; others get the demo user.
+    """
+    request = getattr(request, '_request', request)
+    if not hasattr(request, '_cached_profile'):
+        request._cached_profile = get_demo_user()
+    return request._cached_profile
+
+
+async def aget_request_user(request):
+    """Async get_request_user"""
+    request = getattr(request, '_request', request)
+    if not hasattr(request, '_cached_profile'):
+        request._cached_profile = await aget_demo_user()
+    return request._cached_profile
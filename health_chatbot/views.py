@@ -3,35 +3,39 @@ API Views for Health Chatbot Demo
 """
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from rest_framework import status
+from rest_framework import serializers, status
+from rest_framework.renderers import JSONRenderer
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET, require_safe
 from django.utils import timezone
-from django.db.models import Sum
+from django.utils.dateparse import parse_date
 from datetime import timedelta
+import csv
+import json
 
-from .models import UserProfile, Meal, Medication, ChatMessage
+from .models import Meal, MealImport, Medication, ChatMessage, DailyNutritionRollup
 from .chatbot import HealthChatbot
+from .rollups import GRANULARITIES, NUTRIENTS, bucket_totals, nutrition_totals, record_meals
+from .pagination import InvalidCursor, get_page_size, paginate_meals, paginate_chat
+from .cache import get_or_build, invalidate, cache_stats, MEALS, MEDICATIONS, PROFILE
+from .users import get_request_user
+from .metrics import render_prometheus
+from .history import chat_writer
+from .documents import OPENAPI_SPEC, PRIVACY_POLICY
+from .routers import pin_to_primary, read_only_view
+from .search import search_meals, suggest_meals
+from .foods import meal_fields, search_foods
 from .serializers import (
-    MealSerializer, MedicationSerializer,
+    FoodPortionSerializer, FoodSerializer, MealSerializer, MedicationSerializer,
     ChatMessageSerializer, UserProfileSerializer
 )
 
 
-def get_demo_user():
-    """Get or create demo user"""
-    user, created = UserProfile.objects.get_or_create(
-        email='demo@biorhyme.health',
-        defaults={
-            'name': 'Demo User',
-            'age': 30,
-            'daily_calorie_goal': 2000,
-            'daily_protein_goal': 150,
-            'daily_carbs_goal': 250,
-            'daily_fat_goal': 65,
-            'daily_fiber_goal': 30,
-        }
-    )
-    return user
+# POST /api/chat/ "format" values (the body field; DRF reserves ?format=)
+CHAT_FORMATS = ('markdown', 'structured')
 
 
 @api_view(['GET'])
@@ -40,25 +44,33 @@ def health_check(request):
     return Response({
         'status': 'ok',
         'message': 'Biorhyme Health Chatbot Demo is running',
-        'timestamp': timezone.now().isoformat()
+        'timestamp': timezone.now().isoformat(),
+        'cache': cache_stats(),
+        'chat_writer': chat_writer.snapshot()
     })
 
 
-@api_view(['GET'])
-def openapi_spec(request):
+@require_GET
+def metrics(request):
     """
-    Serve OpenAPI specification
+    GET /api/metrics/
+    Request histograms in Prometheus text format (requires METRICS_ENABLED)
     """
-    import os
-    from django.http import FileResponse, Http404
-    from django.conf import settings
+    if not settings.METRICS_ENABLED:
+        raise Http404("Metrics are disabled")
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4')
 
-    spec_path = os.path.join(settings.BASE_DIR, 'openapi.yaml')
 
-    if os.path.exists(spec_path):
-        return FileResponse(open(spec_path, 'rb'), content_type='application/x-yaml')
-    else:
-        raise Http404("OpenAPI spec not found")
+@require_safe
+def openapi_spec(request):
+    """
+    GET /api/openapi.yaml
+    Serve OpenAPI specification (from memory, with ETag and gzip/brotli)
+    """
+    response = OPENAPI_SPEC.response(request)
+    if response is None:
+        return JsonResponse({'detail': 'Not found.'}, status=404)
+    return response
 
 
 @api_view(['POST'])
@@ -67,77 +79,101 @@ def chat(request):
     Main chat endpoint
     POST /api/chat/
     {
-        "message": "What did I eat today?"
+        "message": "What did I eat today?",
+        "format": "markdown" | "structured"    (optional, default markdown)
     }
     """
     user_message = request.data.get('message', '').strip()
+    reply_format = request.data.get('format', 'markdown')
 
     if not user_message:
         return Response({
             'error': 'Message is required'
         }, status=status.HTTP_400_BAD_REQUEST)
 
+    if reply_format not in CHAT_FORMATS:
+        return Response({
+            'error': f'format must be one of: {", ".join(CHAT_FORMATS)}'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
     # Get demo user
-    user = get_demo_user()
+    user = get_request_user(request)
 
     # Process message with chatbot
     chatbot = HealthChatbot(user)
-    bot_response = chatbot.process_message(user_message)
+    reply = chatbot.process_message(user_message)
 
     # Save to chat history
     chat_msg = ChatMessage.objects.create(
         user=user,
         user_message=user_message,
-        bot_response=bot_response
+        bot_response=reply.markdown
     )
+    pin_to_primary(user.pk)
 
-    return Response({
+    return Response(_chat_payload(user_message, reply, reply_format, chat_msg.created_at))
+
+
+def _chat_payload(user_message, reply, reply_format, created_at):
+    """Chat response body: the Markdown reply, or its typed data in structured mode"""
+    if reply_format == 'structured':
+        return {
+            'message': user_message,
+            'data': reply.as_dict(),
+            'timestamp': created_at.isoformat()
+        }
+    return {
         'message': user_message,
-        'response': bot_response,
-        'timestamp': chat_msg.created_at.isoformat()
-    })
+        'response': reply.markdown,
+        'timestamp': created_at.isoformat()
+    }
 
 
 @api_view(['GET', 'POST'])
+@read_only_view
 def meals_list(request):
     """
-    GET /api/meals/ - List all meals
-    POST /api/meals/ - Create a new meal
+    GET /api/meals/?days=7&page_size=50&cursor=... - List meals (newest first, paginated)
+    POST /api/meals/ - Create a new meal (or {"food_id": 12, "servings": 2}
+                       to log a catalog food, with macros computed here)
     """
-    user = get_demo_user()
+    user = get_request_user(request)
 
     if request.method == 'GET':
-        # Query parameters
-        days = request.GET.get('days', 7)
-        try:
-            days = int(days)
-        except ValueError:
-            days = 7
-
-        date_from = timezone.now().date() - timedelta(days=days)
+        date_from = _meals_since(request)
         meals = Meal.objects.filter(user=user, date__gte=date_from)
 
-        serializer = MealSerializer(meals, many=True)
-
-        # Calculate totals
-        totals = meals.aggregate(
-            total_calories=Sum('calories'),
-            total_protein=Sum('protein'),
-            total_carbs=Sum('carbs'),
-            total_fat=Sum('fat'),
-            total_fiber=Sum('fiber')
-        )
+        try:
+            page, next_cursor = paginate_meals(
+                meals,
+                request.GET.get('cursor'),
+                get_page_size(request.GET.get('page_size'))
+            )
+        except InvalidCursor as e:
+            return Response({
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response({
-            'count': meals.count(),
-            'meals': serializer.data,
-            'totals': totals
-        })
+        # Calculate totals from daily rollups
+        nutrition = nutrition_totals(user, date_from)
+        return Response(_meals_payload(page, next_cursor, nutrition))
 
     elif request.method == 'POST':
         # Add user to data
         data = request.data.copy()
 
+        if 'food_id' in data:
+            portion = FoodPortionSerializer(data=data)
+            if not portion.is_valid():
+                return Response({
+                    'error': portion.errors
+                }, status=status.HTTP_400_BAD_REQUEST)
+            food = portion.validated_data['food']
+            for field, value in meal_fields(food, portion.validated_data['servings']).items():
+                # A name or note sent with the food is kept; macros always come from the catalog
+                if field in NUTRIENTS or not data.get(field):
+                    data[field] = value
+
         serializer = MealSerializer(data=data)
         if serializer.is_valid():
             serializer.save(user=user)
@@ -152,6 +188,198 @@ def meals_list(request):
         }, status=status.HTTP_400_BAD_REQUEST)
 
 
+def _meals_since(request):
+    """First date covered by ?days= (default 7)"""
+    days = request.GET.get('days', 7)
+    try:
+        days = int(days)
+    except ValueError:
+        days = 7
+    return timezone.now().date() - timedelta(days=days)
+
+
+def _meals_payload(page, next_cursor, nutrition):
+    serializer = MealSerializer(page, many=True)
+    totals = {f'total_{name}': nutrition[name] for name in NUTRIENTS}
+
+    return {
+        'count': nutrition['meals'] or 0,
+        'meals': serializer.data,
+        'totals': totals,
+        'next_cursor': next_cursor
+    }
+
+
+@api_view(['POST'])
+def meals_bulk(request):
+    """
+    POST /api/meals/bulk/
+    {
+        "meals": [{"meal_name": "Oatmeal", "calories": 350, ...}, ...]
+    }
+    Optional header: Idempotency-Key: <client-generated key>
+
+    Valid meals are inserted in one transaction; invalid ones are reported
+    per item. Retrying with the same key returns the original result once
+    any meal was logged; an upload that logged none can be retried as is.
+    """
+    user = get_request_user(request)
+
+    items = request.data.get('meals') if isinstance(request.data, dict) else request.data
+    if not isinstance(items, list) or not items:
+        return Response({
+            'error': 'Provide a non-empty "meals" list'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    max_items = settings.MEAL_BULK_MAX_ITEMS
+    if len(items) > max_items:
+        return Response({
+            'error': f'At most {max_items} meals per request'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    key = request.headers.get('Idempotency-Key', '').strip()[:100]
+    if key:
+        previous = _previous_import(user, key)
+        if previous is not None:
+            return Response(previous.response, status=previous.status_code)
+
+    # Validate every item with the list serializer's child, keeping per-item errors
+    child = MealSerializer(many=True).child
+    results = []
+    valid = []
+    for index, item in enumerate(items):
+        try:
+            data = child.run_validation(item)
+        except serializers.ValidationError as e:
+            results.append({'index': index, 'status': 'error', 'errors': e.detail})
+        else:
+            results.append({'index': index, 'status': 'created'})
+            valid.append((index, Meal(user=user, **data)))
+
+    created = len(valid)
+    failed = len(items) - created
+    payload = {
+        'success': failed == 0,
+        'message': f'Logged {created} of {len(items)} meals',
+        'created': created,
+        'failed': failed,
+        'results': results
+    }
+    if not created:
+        # Nothing was logged, so a corrected retry with the same key must run, not replay this
+        return Response(payload, status=status.HTTP_400_BAD_REQUEST)
+    code = status.HTTP_207_MULTI_STATUS if failed else status.HTTP_201_CREATED
+
+    try:
+        with transaction.atomic():
+            meals = Meal.objects.bulk_create([meal for _, meal in valid])
+            record_meals(meals)
+            invalidate(user.pk, MEALS)
+
+            for (index, _), meal in zip(valid, meals):
+                results[index]['meal'] = MealSerializer(meal).data
+
+            if key:
+                MealImport.objects.create(
+                    user=user,
+                    idempotency_key=key,
+                    status_code=code,
+                    # Round-trip through JSON so dates/decimals are stored as rendered
+                    response=json.loads(JSONRenderer().render(payload)),
+                )
+    except IntegrityError:
+        # A concurrent request with the same key won; return its result
+        previous = _previous_import(user, key) if key else None
+        if previous is None:
+            raise
+        return Response(previous.response, status=previous.status_code)
+
+    return Response(payload, status=code)
+
+
+def _previous_import(user, key):
+    """The stored result of a bulk upload with this Idempotency-Key, or None"""
+    return MealImport.objects.filter(user=user, idempotency_key=key).first()
+
+
+@api_view(['GET'])
+@read_only_view
+def meals_search(request):
+    """
+    GET /api/meals/search/?q=salmon&limit=20&from=2024-01-01&to=2024-01-31
+    Meals whose name or notes contain the query (newest first), then close
+    fuzzy matches on the name
+    """
+    user = get_request_user(request)
+
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return Response({
+            'error': 'q is required'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        date_from = _parse_day(request.GET['from'], 'from') if 'from' in request.GET else None
+        date_to = _parse_day(request.GET['to'], 'to') if 'to' in request.GET else None
+    except ValueError as e:
+        return Response({
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    limit = get_page_size(request.GET.get('limit'), default=settings.MEAL_SEARCH_LIMIT)
+    meals = search_meals(user, query, limit, date_from, date_to)
+    return Response({
+        'query': query,
+        'count': len(meals),
+        'meals': MealSerializer(meals, many=True).data
+    })
+
+
+@api_view(['GET'])
+@read_only_view
+def meals_autocomplete(request):
+    """
+    GET /api/meals/autocomplete/?q=sal&limit=10
+    Meal names the user has logged before, most logged first, with their
+    average macros (to prefill a new meal)
+    """
+    user = get_request_user(request)
+
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return Response({
+            'error': 'q is required'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    limit = get_page_size(request.GET.get('limit'), default=settings.MEAL_AUTOCOMPLETE_LIMIT)
+    return Response({
+        'query': query,
+        'suggestions': suggest_meals(user, query, limit)
+    })
+
+
+@api_view(['GET'])
+def foods_list(request):
+    """
+    GET /api/foods/?q=greek yog&limit=10
+    Catalog foods matching a name (the last word may be partial), with
+    macros per serving; log one with POST /api/meals/ {"food_id": ...}
+    """
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return Response({
+            'error': 'q is required'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    limit = get_page_size(request.GET.get('limit'), default=settings.FOOD_SEARCH_LIMIT)
+    foods = search_foods(query, limit)
+    return Response({
+        'query': query,
+        'count': len(foods),
+        'foods': FoodSerializer(foods, many=True).data
+    })
+
+
 @api_view(['GET', 'PUT', 'DELETE'])
 def meal_detail(request, meal_id):
     """
@@ -159,7 +387,7 @@ def meal_detail(request, meal_id):
     PUT /api/meals/<id>/ - Update meal
     DELETE /api/meals/<id>/ - Delete meal
     """
-    user = get_demo_user()
+    user = get_request_user(request)
     meal = get_object_or_404(Meal, id=meal_id, user=user)
 
     if request.method == 'GET':
@@ -181,7 +409,7 @@ def meal_detail(request, meal_id):
 
     elif request.method == 'DELETE':
         meal_name = meal.meal_name
-        meal.delete()
+        MealSerializer.delete(meal)
         return Response({
             'success': True,
             'message': f'Deleted {meal_name}'
@@ -194,7 +422,7 @@ def medications_list(request):
     GET /api/medications/ - List all medications
     POST /api/medications/ - Add a new medication
     """
-    user = get_demo_user()
+    user = get_request_user(request)
 
     if request.method == 'GET':
         # Filter by active status
@@ -229,7 +457,7 @@ def medication_detail(request, med_id):
     PUT /api/medications/<id>/ - Update medication
     DELETE /api/medications/<id>/ - Delete medication
     """
-    user = get_demo_user()
+    user = get_request_user(request)
     medication = get_object_or_404(Medication, id=med_id, user=user)
 
     if request.method == 'GET':
@@ -251,22 +479,67 @@ def medication_detail(request, med_id):
 
     elif request.method == 'DELETE':
         drug_name = medication.drug_name
-        medication.delete()
+        MedicationSerializer.delete(medication)
         return Response({
             'success': True,
             'message': f'Deleted {drug_name}'
         })
 
 
+SUMMARY_PERIODS = ('today', 'week', 'month')
+
+
 @api_view(['GET'])
+@read_only_view
 def summary(request):
     """
     GET /api/summary/?period=today|week|month
-    Get nutrition summary for a period
+    GET /api/summary/?from=YYYY-MM-DD&to=YYYY-MM-DD&granularity=day|week|month
+    Get nutrition summary for a period, or for a date range with a
+    per-day/week/month series
     """
-    user = get_demo_user()
+    user = get_request_user(request)
+
+    if _wants_series(request):
+        try:
+            period, date_from, date_to, granularity = _series_params(request)
+        except ValueError as e:
+            return Response({
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        data = get_or_build(
+            user, (MEALS, PROFILE), 'summary_series', (period, date_from, date_to, granularity),
+            lambda: _series_payload(
+                user, period, date_from, date_to, granularity,
+                bucket_totals(user, date_from, date_to, granularity)
+            )
+        )
+        return Response(data)
+
     period = request.GET.get('period', 'today')
 
+    if period not in SUMMARY_PERIODS:
+        return Response(_build_summary(user, period))
+
+    data = get_or_build(
+        user, (MEALS, PROFILE), 'summary', (period,),
+        lambda: _build_summary(user, period)
+    )
+    return Response(data)
+
+
+def _build_summary(user, period):
+    """Build the summary payload for a period"""
+    today, date_from = _summary_range(period)
+
+    # Calculate totals from daily rollups (one row per day)
+    nutrition = nutrition_totals(user, date_from)
+    return _summary_payload(user, period, today, date_from, nutrition)
+
+
+def _summary_range(period):
+    """(today, first day) for a summary period"""
     # Determine date range
     today = timezone.now().date()
     if period == 'today':
@@ -277,33 +550,11 @@ def summary(request):
         date_from = today - timedelta(days=30)
     else:
         date_from = today
+    return today, date_from
 
-    # Get meals
-    meals = Meal.objects.filter(user=user, date__gte=date_from)
-
-    # Calculate totals
-    totals = meals.aggregate(
-        total_calories=Sum('calories'),
-        total_protein=Sum('protein'),
-        total_carbs=Sum('carbs'),
-        total_fat=Sum('fat'),
-        total_fiber=Sum('fiber')
-    )
-
-    # Calculate days
-    num_days = (today - date_from).days + 1
-
-    # Daily averages
-    averages = {
-        'avg_calories': (totals['total_calories'] or 0) / num_days,
-        'avg_protein': (totals['total_protein'] or 0) / num_days,
-        'avg_carbs': (totals['total_carbs'] or 0) / num_days,
-        'avg_fat': (totals['total_fat'] or 0) / num_days,
-        'avg_fiber': (totals['total_fiber'] or 0) / num_days,
-    }
 
-    # Goals
-    goals = {
+def _goals(user):
+    return {
         'calories': user.daily_calorie_goal,
         'protein': user.daily_protein_goal,
         'carbs': user.daily_carbs_goal,
@@ -311,7 +562,9 @@ def summary(request):
         'fiber': user.daily_fiber_goal,
     }
 
-    # Progress
+
+def _progress(averages, goals):
+    """Percentage of each daily goal met by the daily averages"""
     progress = {}
     for nutrient in ['calories', 'protein', 'carbs', 'fat', 'fiber']:
         avg_key = f'avg_{nutrient}'
@@ -319,38 +572,228 @@ def summary(request):
             progress[nutrient] = round((averages[avg_key] / goals[nutrient]) * 100, 1)
         else:
             progress[nutrient] = 0
+    return progress
 
-    return Response({
+
+def _summary_payload(user, period, today, date_from, nutrition):
+    """Summary response from the period's rollup totals"""
+    totals = {f'total_{name}': nutrition[name] for name in NUTRIENTS}
+
+    # Calculate days
+    num_days = (today - date_from).days + 1
+
+    # Daily averages
+    averages = {
+        'avg_calories': (totals['total_calories'] or 0) / num_days,
+        'avg_protein': (totals['total_protein'] or 0) / num_days,
+        'avg_carbs': (totals['total_carbs'] or 0) / num_days,
+        'avg_fat': (totals['total_fat'] or 0) / num_days,
+        'avg_fiber': (totals['total_fiber'] or 0) / num_days,
+    }
+
+    goals = _goals(user)
+
+    return {
         'period': period,
         'date_range': {
             'from': date_from.isoformat(),
             'to': today.isoformat(),
             'days': num_days
         },
-        'meals_logged': meals.count(),
+        'meals_logged': nutrition['meals'] or 0,
         'totals': totals,
         'daily_averages': averages,
         'goals': goals,
-        'progress_percentage': progress
-    })
+        'progress_percentage': _progress(averages, goals)
+    }
+
+
+def _wants_series(request):
+    return any(name in request.GET for name in ('from', 'to', 'granularity'))
+
+
+def _parse_day(value, name):
+    try:
+        day = parse_date(value)
+    except ValueError:
+        day = None
+    if day is None:
+        raise ValueError(f'{name} must be a date (YYYY-MM-DD)')
+    return day
+
+
+def _series_params(request):
+    """
+    (period, from, to, granularity) for a series summary.
+    Missing 'from'/'to' fall back to ?period's range; raises ValueError.
+    """
+    period = request.GET.get('period', 'today')
+    today, date_from = _summary_range(period)
+    date_to = today
+
+    if 'from' in request.GET or 'to' in request.GET:
+        period = 'custom'
+        if 'from' in request.GET:
+            date_from = _parse_day(request.GET['from'], 'from')
+        if 'to' in request.GET:
+            date_to = _parse_day(request.GET['to'], 'to')
+
+    granularity = request.GET.get('granularity', 'day')
+    if granularity not in GRANULARITIES:
+        raise ValueError(f'granularity must be one of: {", ".join(GRANULARITIES)}')
+    if date_from > date_to:
+        raise ValueError('from must not be after to')
+    if (date_to - date_from).days + 1 > settings.SUMMARY_MAX_DAYS:
+        raise ValueError(f'Date range is limited to {settings.SUMMARY_MAX_DAYS} days')
+
+    return period, date_from, date_to, granularity
+
+
+def _series_payload(user, period, date_from, date_to, granularity, buckets):
+    """Range summary plus one entry per bucket (see rollups.bucket_totals)"""
+    nutrition = {name: sum(bucket[name] for bucket in buckets) for name in NUTRIENTS}
+    nutrition['meals'] = sum(bucket['meals'] for bucket in buckets)
+
+    data = _summary_payload(user, period, date_to, date_from, nutrition)
+    goals = data['goals']
+    data['granularity'] = granularity
+    data['series'] = [
+        {
+            'start': bucket['start'].isoformat(),
+            'end': bucket['end'].isoformat(),
+            'days': bucket['days'],
+            'meals_logged': bucket['meals'],
+            'totals': {f'total_{name}': bucket[name] for name in NUTRIENTS},
+            'progress_percentage': _progress(
+                {f'avg_{name}': bucket[name] / bucket['days'] for name in NUTRIENTS}, goals
+            ),
+        }
+        for bucket in buckets
+    ]
+    return data
 
 
 @api_view(['GET'])
+@read_only_view
 def chat_history(request):
     """
-    GET /api/chat/history/?limit=10
-    Get chat history
+    GET /api/chat/history/?limit=10&cursor=...
+    Get chat history (newest first, paginated)
     """
-    user = get_demo_user()
-    limit = int(request.GET.get('limit', 10))
+    user = get_request_user(request)
+    limit = get_page_size(request.GET.get('limit'), default=10)
+
+    try:
+        messages, next_cursor = paginate_chat(
+            ChatMessage.objects.filter(user=user),
+            request.GET.get('cursor'),
+            limit
+        )
+    except InvalidCursor as e:
+        return Response({
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(_history_payload(messages, next_cursor))
 
-    messages = ChatMessage.objects.filter(user=user)[:limit]
+
+def _history_payload(messages, next_cursor):
     serializer = ChatMessageSerializer(messages, many=True)
 
-    return Response({
-        'count': messages.count(),
-        'messages': serializer.data
-    })
+    return {
+        'count': len(messages),
+        'messages': serializer.data,
+        'next_cursor': next_cursor
+    }
+
+
+EXPORT_FIELDS = [
+    ('meal', Meal, [
+        'id', 'meal_name', 'meal_time', 'calories', 'protein', 'carbs',
+        'fat', 'fiber', 'date', 'notes', 'created_at'
+    ]),
+    ('medication', Medication, [
+        'id', 'drug_name', 'dosage', 'frequency', 'started_date',
+        'notes', 'is_active', 'created_at', 'updated_at'
+    ]),
+    ('chat', ChatMessage, [
+        'id', 'user_message', 'bot_response', 'query_type', 'created_at'
+    ]),
+]
+
+
+class _Echo:
+    """File-like object whose write() just returns the value, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def _export_rows(user):
+    """Yield (record_type, fields, row) for every exported row, one DB chunk at a time"""
+    chunk_size = settings.EXPORT_CHUNK_SIZE
+    for record_type, model, fields in EXPORT_FIELDS:
+        rows = (
+            model.objects.filter(user=user)
+            .order_by('id')
+            .values_list(*fields)
+            .iterator(chunk_size=chunk_size)
+        )
+        for row in rows:
+            yield record_type, fields, row
+
+
+def _export_value(value):
+    """Dates and datetimes as full ISO 8601 (microseconds kept), in both formats"""
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def _stream_ndjson(user):
+    encoder = json.JSONEncoder(ensure_ascii=False)
+    for record_type, fields, row in _export_rows(user):
+        record = {'type': record_type}
+        record.update((field, _export_value(value)) for field, value in zip(fields, row))
+        yield encoder.encode(record) + '\n'
+
+
+def _stream_csv(user):
+    # One header covering every record type; columns a type lacks are left empty
+    columns = ['record_type']
+    for _, _, fields in EXPORT_FIELDS:
+        columns += [field for field in fields if field not in columns]
+    positions = {column: i for i, column in enumerate(columns)}
+
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for record_type, fields, row in _export_rows(user):
+        line = [''] * len(columns)
+        line[0] = record_type
+        for field, value in zip(fields, row):
+            line[positions[field]] = _export_value(value)
+        yield writer.writerow(line)
+
+
+@require_GET
+def export_data(request):
+    """
+    GET /api/export/?format=ndjson|csv
+    Stream all of the user's meals, medications and chat history
+    """
+    export_format = request.GET.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return JsonResponse({
+            'error': 'format must be ndjson or csv'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    user = get_request_user(request)
+    if export_format == 'csv':
+        response = StreamingHttpResponse(_stream_csv(user), content_type='text/csv')
+    else:
+        response = StreamingHttpResponse(_stream_ndjson(user), content_type='application/x-ndjson')
+
+    filename = f"health-export-{timezone.now().date().isoformat()}.{export_format}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
 
 
 @api_view(['GET'])
@@ -359,7 +802,7 @@ def user_profile(request):
     GET /api/profile/
     Get user profile
     """
-    user = get_demo_user()
+    user = get_request_user(request)
     serializer = UserProfileSerializer(user)
 
     return Response(serializer.data)
@@ -371,12 +814,14 @@ def reset_demo(request):
     POST /api/reset/
     Reset demo data
     """
-    user = get_demo_user()
+    user = get_request_user(request)
 
     # Delete all data
     Meal.objects.filter(user=user).delete()
+    DailyNutritionRollup.objects.filter(user=user).delete()
     Medication.objects.filter(user=user).delete()
     ChatMessage.objects.filter(user=user).delete()
+    invalidate(user.pk, MEALS, MEDICATIONS)
 
     return Response({
         'success': True,
@@ -384,26 +829,13 @@ def reset_demo(request):
     })
 
 
-@api_view(['GET'])
+@require_safe
 def privacy_policy(request):
     """
     GET /api/privacy/
-    Serve privacy policy
-    """
-    import os
-    from django.conf import settings
-    from django.http import HttpResponse
-    import markdown
-
-    privacy_path = os.path.join(settings.BASE_DIR, 'PRIVACY.md')
-
-    if os.path.exists(privacy_path):
-        with open(privacy_path, 'r') as f:
-            content = f.read()
-            html = markdown.markdown(content)
-            return HttpResponse(
-                f'<html><head><style>body{{max-width:800px;margin:40px auto;font-family:system-ui;line-height:1.6;padding:0 20px}}h1{{color:#2563eb}}h2{{color:#4b5563;margin-top:2em}}code{{background:#f3f4f6;padding:2px 6px;border-radius:3px}}</style></head><body>{html}</body></html>',
-                content_type='text/html'
-            )
-    else:
+    Serve privacy policy (rendered once, from memory)
+    """
+    response = PRIVACY_POLICY.response(request)
+    if response is None:
         return HttpResponse('Privacy policy not found', status=404)
+    return response